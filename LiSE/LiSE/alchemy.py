@@ -497,7 +497,7 @@ def tables_for_meta(meta):
 
 
 def indices_for_table_dict(table):
-    return {}
+    return allegedb.alchemy.indices_for_table_dict(table)
 
 
 def queries(table):
@@ -0,0 +1,381 @@
+# This file is part of LiSE, a framework for life simulation games.
+# Copyright (c) Zachary Spector, public@zacharyspector.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""Move old history out of a SQLite world database into archive files.
+
+Long-running worlds pile up history that's only needed for time travel.
+:func:`archive` moves every row older than some turn out of the
+history tables and into compressed files in a directory, one file per
+table, branch, and range of turns. The rows are stored a column at a
+time, with repeated values, like entity names, stored only once per
+file.
+
+To use the archived history, pass the directory to the engine::
+
+    Engine('world.db', archive='world_archive')
+
+When loading, it reads the archived rows before the ones still in the
+database, so time travel works the same as if they'd never moved.
+
+From the command line::
+
+    python -m LiSE.archive world.db world_archive --keep 100
+
+Only archive turns you're done with. Rows stay archived even if you
+change the turns they're in, so do that in a new branch instead.
+
+"""
+import json
+import mmap
+import os
+import sqlite3
+import struct
+import sys
+import zlib
+from array import array
+
+import msgpack
+
+ARCHIVE_TABLES = (
+    'nodes',
+    'edges',
+    'graph_val',
+    'node_val',
+    'edge_val',
+    'things',
+    'universals',
+    'character_rules_handled',
+    'avatar_rules_handled',
+    'character_thing_rules_handled',
+    'character_place_rules_handled',
+    'character_portal_rules_handled',
+    'node_rules_handled',
+    'portal_rules_handled'
+)
+"""The history tables that may be archived"""
+
+MAGIC = b'LiSEarc1'
+INDEX = 'index.json'
+_header_len = struct.Struct('<I')
+
+
+def _pack_column(values):
+    if all(type(v) is int for v in values):
+        return 'int', zlib.compress(array('q', values).tobytes())
+    # keyed by type too, so that 1, 1.0, and True stay different
+    distinct = {}
+    indices = [
+        distinct.setdefault((type(v), v), len(distinct)) for v in values
+    ]
+    typecode = next(
+        code for code in ('B', 'H', 'I', 'L', 'Q')
+        if len(distinct) < 1 << (8 * array(code).itemsize)
+    )
+    return 'dict', zlib.compress(msgpack.packb(
+        [[v for (_, v) in distinct], typecode,
+         array(typecode, indices).tobytes()],
+        use_bin_type=True
+    ))
+
+
+def _unpack_column(kind, data, byteorder):
+    data = zlib.decompress(data)
+    if kind == 'int':
+        values = array('q')
+        values.frombytes(data)
+        if byteorder != sys.byteorder:
+            values.byteswap()
+        return values
+    distinct, typecode, indices = msgpack.unpackb(
+        data, raw=False, strict_map_key=False
+    )
+    arr = array(typecode)
+    arr.frombytes(indices)
+    if byteorder != sys.byteorder:
+        arr.byteswap()
+    return [distinct[i] for i in arr]
+
+
+def write_file(path, table, branch, columns, rows):
+    """Write ``rows`` of ``table`` to an archive file at ``path``
+
+    ``columns`` are the names of the columns, in the same order as the
+    fields of each row. Return the index entry for the file.
+
+    """
+    turni = columns.index('turn')
+    blobs = []
+    header = {
+        'table': table,
+        'branch': branch,
+        'turn_from': rows[0][turni],
+        'turn_to': rows[-1][turni],
+        'rows': len(rows),
+        'byteorder': sys.byteorder,
+        'columns': []
+    }
+    offset = 0
+    for name, values in zip(columns, zip(*rows)):
+        kind, blob = _pack_column(values)
+        header['columns'].append({
+            'name': name, 'kind': kind, 'offset': offset, 'length': len(blob)
+        })
+        blobs.append(blob)
+        offset += len(blob)
+    headerb = json.dumps(header).encode()
+    with open(path, 'wb') as outf:
+        outf.write(MAGIC)
+        outf.write(_header_len.pack(len(headerb)))
+        outf.write(headerb)
+        for blob in blobs:
+            outf.write(blob)
+    entry = dict(header)
+    del entry['columns'], entry['byteorder']
+    entry['file'] = os.path.basename(path)
+    return entry
+
+
+def read_file(path, columns=None):
+    """Return a dictionary of the columns in the archive file at ``path``
+
+    With ``columns``, only decompress the columns by those names.
+
+    """
+    with open(path, 'rb') as inf, \
+            mmap.mmap(inf.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if mm[:len(MAGIC)] != MAGIC:
+            raise ValueError("Not a LiSE archive file: {}".format(path))
+        start = len(MAGIC) + _header_len.size
+        (headerlen,) = _header_len.unpack_from(mm, len(MAGIC))
+        header = json.loads(mm[start:start+headerlen].decode())
+        start += headerlen
+        return {
+            col['name']: _unpack_column(
+                col['kind'],
+                mm[start+col['offset']:start+col['offset']+col['length']],
+                header['byteorder']
+            )
+            for col in header['columns']
+            if columns is None or col['name'] in columns
+        }
+
+
+def _entry_order(entry):
+    return entry['table'], entry['branch'], entry['turn_from']
+
+
+class Archive(object):
+    """Reader for a directory of archived history
+
+    Each file is described in ``entries`` by its ``table``, ``branch``,
+    ``turn_from`` and ``turn_to`` (inclusive), and number of ``rows``.
+    ``horizons`` maps table names to dictionaries mapping each branch
+    to the first turn that wasn't archived.
+
+    """
+    def __init__(self, path):
+        self.path = path
+        index = os.path.join(path, INDEX)
+        if os.path.exists(index):
+            with open(index) as inf:
+                data = json.load(inf)
+        else:
+            data = {'entries': [], 'horizons': {}}
+        self.entries = data['entries']
+        self.entries.sort(key=_entry_order)
+        self.horizons = data['horizons']
+        self.tables = frozenset(e['table'] for e in self.entries)
+
+    def save(self):
+        """Write my index to disk, replacing the old one all at once"""
+        index = os.path.join(self.path, INDEX)
+        self.entries.sort(key=_entry_order)
+        with open(index + '.tmp', 'w') as outf:
+            json.dump(
+                {'entries': self.entries, 'horizons': self.horizons},
+                outf, indent=1
+            )
+        os.replace(index + '.tmp', index)
+        self.tables = frozenset(e['table'] for e in self.entries)
+
+    def iter_entries(self, table, branch=None, turn_from=None, turn_to=None):
+        """Iterate over the entries for files that might have rows of
+        ``table`` in the given branch and range of turns, inclusive
+
+        """
+        for entry in self.entries:
+            if entry['table'] != table or (
+                branch is not None and entry['branch'] != branch
+            ) or (
+                turn_from is not None and entry['turn_to'] < turn_from
+            ) or (
+                turn_to is not None and entry['turn_from'] > turn_to
+            ):
+                continue
+            yield entry
+
+    def rows(self, table, branch=None, turn_from=None, turn_to=None):
+        """Iterate over the archived rows of ``table``
+
+        Rows are in the same form as in the database, and in
+        chronological order within each branch. Optionally, only get
+        rows from the given branch and range of turns, inclusive.
+
+        """
+        for entry in self.iter_entries(table, branch, turn_from, turn_to):
+            cols = read_file(os.path.join(self.path, entry['file']))
+            rows = zip(*cols.values())
+            if (
+                turn_from is None or entry['turn_from'] >= turn_from
+            ) and (
+                turn_to is None or entry['turn_to'] <= turn_to
+            ):
+                yield from rows
+                continue
+            turni = list(cols).index('turn')
+            low = entry['turn_from'] if turn_from is None else turn_from
+            high = entry['turn_to'] if turn_to is None else turn_to
+            for row in rows:
+                if low <= row[turni] <= high:
+                    yield row
+
+
+def archive(
+        dbpath, path, before=None, keep=None, turns_per_file=100,
+        vacuum=False
+):
+    """Move history older than some turn from the database at ``dbpath``
+    into the archive directory at ``path``
+
+    Give either ``before``, the first turn to leave in the database,
+    or ``keep``, how many of the latest turns of each branch to leave.
+
+    Each file holds at most ``turns_per_file`` turns of one table in one
+    branch. Return a dictionary of how many rows were archived from
+    each table.
+
+    It's safe to run this again on the same database and directory,
+    to archive more, or if it was interrupted.
+
+    """
+    if (before is None) == (keep is None):
+        raise TypeError("Need exactly one of before or keep")
+    if not os.path.exists(path):
+        os.mkdir(path)
+    arc = Archive(path)
+    conn = sqlite3.connect(dbpath)
+    tables = {
+        name for (name,) in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table'"
+        )
+    }
+    latest = dict(conn.execute(
+        "SELECT branch, MAX(turn) FROM turns GROUP BY branch"
+    )) if 'turns' in tables else {}
+    archived = {}
+    todelete = []
+    for table in ARCHIVE_TABLES:
+        if table not in tables:
+            continue
+        columns = [
+            row[1] for row in conn.execute(
+                'PRAGMA table_info("{}")'.format(table)
+            )
+        ]
+        horizons = arc.horizons.setdefault(table, {})
+        archived[table] = 0
+        for (branch, last) in conn.execute(
+                'SELECT branch, MAX(turn) FROM "{}" GROUP BY branch'.format(
+                    table)
+        ).fetchall():
+            if before is None:
+                horizon = max((latest.get(branch, last), last)) - keep + 1
+            else:
+                horizon = before
+            old = horizons.get(branch)
+            if old is not None and horizon <= old:
+                # maybe left over from an interrupted run
+                todelete.append((table, branch, old))
+                continue
+            rows = conn.execute(
+                'SELECT * FROM "{}" WHERE branch=? AND turn>=? AND turn<? '
+                'ORDER BY turn, tick'.format(table),
+                (branch, -1 if old is None else old, horizon)
+            ).fetchall()
+            chunk = []
+            for row in rows:
+                turn = row[columns.index('turn')]
+                if chunk and (
+                        turn // turns_per_file
+                        != chunk[0][columns.index('turn')] // turns_per_file
+                ):
+                    arc.entries.append(_write_chunk(
+                        path, table, branch, columns, chunk, len(arc.entries)
+                    ))
+                    chunk = []
+                chunk.append(row)
+            if chunk:
+                arc.entries.append(_write_chunk(
+                    path, table, branch, columns, chunk, len(arc.entries)
+                ))
+            archived[table] += len(rows)
+            horizons[branch] = horizon
+            todelete.append((table, branch, horizon))
+    arc.save()
+    for (table, branch, horizon) in todelete:
+        conn.execute(
+            'DELETE FROM "{}" WHERE branch=? AND turn<?'.format(table),
+            (branch, horizon)
+        )
+    conn.commit()
+    if vacuum:
+        conn.execute('VACUUM')
+    conn.close()
+    return archived
+
+
+def _write_chunk(path, table, branch, columns, rows, n):
+    fn = '{}_{}_{}.arc'.format(table, n, rows[0][columns.index('turn')])
+    return write_file(os.path.join(path, fn), table, branch, columns, rows)
+
+
+if __name__ == '__main__':
+    from argparse import ArgumentParser
+    parser = ArgumentParser(
+        description="Move old history out of a LiSE world database"
+    )
+    parser.add_argument('world', help="path to the SQLite world database")
+    parser.add_argument('archive', help="directory to put the archive in")
+    when = parser.add_mutually_exclusive_group(required=True)
+    when.add_argument(
+        '--before', type=int, help="archive every turn before this one"
+    )
+    when.add_argument(
+        '--keep', type=int,
+        help="archive all but this many of each branch's latest turns"
+    )
+    parser.add_argument('--turns-per-file', type=int, default=100)
+    parser.add_argument(
+        '--vacuum', action='store_true',
+        help="shrink the database file afterward"
+    )
+    args = parser.parse_args()
+    counts = archive(
+        args.world, args.archive, before=args.before, keep=args.keep,
+        turns_per_file=args.turns_per_file, vacuum=args.vacuum
+    )
+    for (table, n) in sorted(counts.items()):
+        if n:
+            print('{}: {} rows'.format(table, n))
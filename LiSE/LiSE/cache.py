@@ -21,7 +21,10 @@ from allegedb.cache import (
     HistoryError
 )
 from .util import singleton_get, sort_set
-from collections import OrderedDict
+from array import array
+from collections import Counter, OrderedDict, defaultdict
+from heapq import heappop, heappush
+from networkx import NetworkXNoPath, NodeNotFound
 
 
 class InitializedCache(Cache):
@@ -47,6 +50,22 @@ class InitializedCache(Cache):
             settings_turns[turn] = {tick: parent + (entity, key, value)}
 
 
+class EntityRulebooksCache(InitializedCache):
+    """A cache of the rulebooks that nodes or portals use
+
+    Also remembers every entity that has ever used each rulebook,
+    so that the rules engine can skip the ones without any rules.
+
+    """
+    def __init__(self, db):
+        super().__init__(db)
+        self.users = defaultdict(set)
+
+    def _store(self, *args, planning, loading=False, contra=True):
+        super()._store(*args, planning=planning, loading=loading, contra=contra)
+        self.users[args[-1]].add(args[:-4])
+
+
 class EntitylessCache(Cache):
     def store(self, key, branch, turn, tick, value, *, planning=None):
         super().store(None, key, branch, turn, tick, value, planning=planning)
@@ -191,26 +210,31 @@ class AvatarnessCache(Cache):
             uniqgraph[turn] = uniqgraph.cls({tick: graph})
 
     def get_char_graph_avs(self, char, graph, branch, turn, tick):
+        self._record_read((char, graph))
         return self._valcache_lookup(
             self.graphavs[(char, graph)], branch, turn, tick
         ) or set()
 
     def get_char_graph_solo_av(self, char, graph, branch, turn, tick):
+        self._record_read((char, graph))
         return self._valcache_lookup(
             self.soloav[(char, graph)], branch, turn, tick
         )
 
     def get_char_only_av(self, char, branch, turn, tick):
+        self._record_read((char,))
         return self._valcache_lookup(
             self.uniqav[char], branch, turn, tick
         )
 
     def get_char_only_graph(self, char, branch, turn, tick):
+        self._record_read((char,))
         return self._valcache_lookup(
             self.uniqgraph[char], branch, turn, tick
         )
 
     def get_char_graphs(self, char, branch, turn, tick):
+        self._record_read((char,))
         return self._valcache_lookup(
             self.graphs[char], branch, turn, tick
         ) or set()
@@ -244,6 +268,7 @@ class RulesHandledCache(object):
     def __init__(self, engine):
         self.engine = engine
         self.handled = {}
+        """Ticks when rules were handled, keyed by entity, rulebook, branch, and turn"""
         self.unhandled = {}
 
     def get_rulebook(self, *args):
@@ -255,39 +280,75 @@ class RulesHandledCache(object):
     def store(self, *args, loading=False):
         entity = args[:-5]
         rulebook, rule, branch, turn, tick = args[-5:]
-        self.handled.setdefault(entity + (rulebook, branch, turn), set()).add(rule)
+        self._get_handled(entity, rulebook, branch, turn)[rule] = tick
         unhandl = self.unhandled.setdefault(entity, {}).setdefault(rulebook, {}).setdefault(branch, {})
         if turn not in unhandl:
-            unhandl[turn] = list(self.unhandled_rulebook_rules(entity, rulebook, branch, turn, tick))
+            unhandl[turn] = list(self.unhandled_rulebook_rules(*entity + (rulebook, branch, turn, tick)))
         try:
             unhandl[turn].remove(rule)
         except ValueError:
             if not loading:
                 raise
 
-    def fork(self, branch, turn, tick):
-        parent_branch, parent_turn, parent_tick, end_turn, end_tick = self.engine._branches[branch]
-        unhandl = self.unhandled
+    def _get_handled(self, entity, rulebook, branch, turn):
+        """Return a dict of rules handled in the turn, and the ticks they were handled at"""
+        key = entity + (rulebook, branch, turn)
         handl = self.handled
+        if key not in handl:
+            handl[key] = self._inherit_handled(entity, rulebook, branch, turn)
+        return handl[key]
+
+    def _inherit_handled(self, entity, rulebook, branch, turn):
+        """Return the rules handled in the parent branch before this one forked
+
+        That's only worked out the first time each entity is looked up
+        in a branch, rather than for every entity when the branch is made.
+
+        """
+        branches = self.engine._branches
+        if branch not in branches:
+            return {}
+        parent, turn_start, tick_start, _, _ = branches[branch]
+        if parent is None or turn != turn_start:
+            return {}
+        parent_key = entity + (rulebook, parent, turn)
+        if parent_key in self.handled:
+            parent_handled = self.handled[parent_key]
+        else:
+            parent_handled = self._inherit_handled(entity, rulebook, parent, turn)
+        return {
+            rule: tick for rule, tick in parent_handled.items()
+            if tick <= tick_start
+        }
+
+    def _rulebook_has_rules(self, rulebook, branch, turn, tick):
+        try:
+            return bool(self.engine._rulebooks_cache.retrieve(rulebook, branch, turn, tick))
+        except KeyError:
+            return False
+
+    def _iter_rulebook_users(self, rbusers, branch, turn, tick):
+        """Iterate over entities that may have rules to follow
+
+        That's any entity that ever used a nonempty rulebook, or whose
+        default rulebook, named for the entity itself, is nonempty.
+        You still need to check that they exist now.
+
+        """
         rbcache = self.engine._rulebooks_cache
-        unhandrr = self.unhandled_rulebook_rules
-        getrb = self.get_rulebook
-        for entity in unhandl:
-            rulebook = getrb(*entity + (branch, turn, tick))
-            if entity + (rulebook, branch, turn) in handl:
-                raise HistoryError(
-                    "Tried to fork history in a RulesHandledCache, "
-                    "but it seems like rules have already been run where we're "
-                    "forking to"
-                )
-            rules = set(rbcache.retrieve(rulebook, branch, turn, tick))
-            unhandled_rules = unhandrr(entity, rulebook, parent_branch, parent_turn, tick)
-            unhandled_rules_set = set(unhandled_rules)
-            handl[entity + (rulebook, branch, turn)] = rules.difference(unhandled_rules_set)
-            unhandl[entity][rulebook][branch][turn] = unhandled_rules
+        users = rbusers.users
+        for rulebook in rbcache.iter_entities(branch, turn, tick):
+            if not self._rulebook_has_rules(rulebook, branch, turn, tick):
+                continue
+            if rulebook in users:
+                yield from users[rulebook]
+            if isinstance(rulebook, tuple):
+                yield rulebook
 
     def retrieve(self, *args):
-        return self.handled[args]
+        entity = args[:-3]
+        rulebook, branch, turn = args[-3:]
+        return self._get_handled(entity, rulebook, branch, turn)
 
     def unhandled_rulebook_rules(self, *args):
         entity = args[:-4]
@@ -305,7 +366,7 @@ class RulesHandledCache(object):
             rulebook_rules = self.engine._rulebooks_cache.retrieve(rulebook, branch, turn, tick)
         except KeyError:
             return []
-        handled_rules = self.handled.setdefault(entity + (rulebook, branch, turn), set())
+        handled_rules = self._get_handled(entity, rulebook, branch, turn)
         return [
             rule for rule in rulebook_rules
             if rule not in handled_rules
@@ -339,6 +400,8 @@ class AvatarRulesHandledCache(RulesHandledCache):
         charm = self.engine.character
         for character in sort_set(charm.keys()):
             rulebook = self.get_rulebook(character, branch, turn, tick)
+            if not self._rulebook_has_rules(rulebook, branch, turn, tick):
+                continue
             charavm = charm[character].avatar
             for graph in sort_set(charavm.keys()):
                 for avatar in sort_set(charavm[graph].keys()):
@@ -361,9 +424,9 @@ class CharacterThingRulesHandledCache(RulesHandledCache):
         charm = self.engine.character
         for character in sort_set(charm.keys()):
             rulebook = self.get_rulebook(character, branch, turn, tick)
-            things = sort_set(charm[character].thing.keys())
-            pass
-            for thing in things:
+            if not self._rulebook_has_rules(rulebook, branch, turn, tick):
+                continue
+            for thing in sort_set(charm[character].thing.keys()):
                 try:
                     rules = self.unhandled_rulebook_rules(character, thing, rulebook, branch, turn, tick)
                 except KeyError:
@@ -383,6 +446,8 @@ class CharacterPlaceRulesHandledCache(RulesHandledCache):
         charm = self.engine.character
         for character in sort_set(charm.keys()):
             rulebook = self.get_rulebook(character, branch, turn, tick)
+            if not self._rulebook_has_rules(rulebook, branch, turn, tick):
+                continue
             for place in sort_set(charm[character].place.keys()):
                 try:
                     rules = self.unhandled_rulebook_rules(character, place, rulebook, branch, turn, tick)
@@ -406,6 +471,8 @@ class CharacterPortalRulesHandledCache(RulesHandledCache):
                 rulebook = self.get_rulebook(character, branch, turn, tick)
             except KeyError:
                 continue
+            if not self._rulebook_has_rules(rulebook, branch, turn, tick):
+                continue
             charp = charm[character].portal
             for orig in sort_set(charp.keys()):
                 for dest in sort_set(charp[orig].keys()):
@@ -426,8 +493,16 @@ class NodeRulesHandledCache(RulesHandledCache):
 
     def iter_unhandled_rules(self, branch, turn, tick):
         charm = self.engine.character
-        for character in sort_set(charm.keys()):
-            for node in sort_set(charm[character].node.keys()):
+        todo = defaultdict(set)
+        for entity in self._iter_rulebook_users(self.engine._nodes_rulebooks_cache, branch, turn, tick):
+            if len(entity) == 2:
+                character, node = entity
+                todo[character].add(node)
+        for character in sort_set(todo.keys() & charm.keys()):
+            charn = charm[character].node
+            for node in sort_set(todo[character]):
+                if node not in charn:
+                    continue
                 try:
                     rulebook = self.get_rulebook(character, node, branch, turn, tick)
                     rules = self.unhandled_rulebook_rules(character, node, rulebook, branch, turn, tick)
@@ -446,11 +521,21 @@ class PortalRulesHandledCache(RulesHandledCache):
 
     def iter_unhandled_rules(self, branch, turn, tick):
         charm = self.engine.character
-        for character in sort_set(charm.keys()):
+        todo = defaultdict(lambda: defaultdict(set))
+        for entity in self._iter_rulebook_users(self.engine._portals_rulebooks_cache, branch, turn, tick):
+            if len(entity) == 3:
+                character, orig, dest = entity
+                todo[character][orig].add(dest)
+        for character in sort_set(todo.keys() & charm.keys()):
             charp = charm[character].portal
-            for orig in sort_set(charp.keys()):
+            origs = todo[character]
+            for orig in sort_set(origs.keys()):
+                if orig not in charp:
+                    continue
                 dests = charp[orig]
-                for dest in sort_set(dests.keys()):
+                for dest in sort_set(origs[orig]):
+                    if dest not in dests:
+                        continue
                     try:
                         rulebook = self.get_rulebook(character, orig, dest, branch, turn, tick)
                         rules = self.unhandled_rulebook_rules(character, orig, dest, rulebook, branch, turn, tick)
@@ -460,6 +545,305 @@ class PortalRulesHandledCache(RulesHandledCache):
                         yield character, orig, dest, rulebook, rule
 
 
+class TriggerResultsCache(object):
+    """Results of memoized triggers, kept until something they read changes
+
+    While a memoized trigger runs, the caches it reads from get recorded.
+    The result is reused at later times in the same branch, until one of
+    those caches stores a new value for something that was read.
+
+    """
+    def __init__(self, engine):
+        self.engine = engine
+        self.triggers = set()
+        """Names of triggers to memoize"""
+        self.results = {}
+        self.reads = {}
+        self.readers = defaultdict(set)
+        self._watching = False
+
+    def add(self, name):
+        """Start memoizing the trigger by this name"""
+        self.triggers.add(name)
+        if not self._watching:
+            for cache in vars(self.engine).values():
+                if isinstance(cache, Cache):
+                    cache.connect(self._invalidate)
+            self._watching = True
+
+    @staticmethod
+    def _entity_key(entity):
+        from .node import Node
+        from .portal import Portal
+        if isinstance(entity, Portal):
+            return 'portal', entity.character.name, entity.orig, entity.dest
+        elif isinstance(entity, Node):
+            return 'node', entity.character.name, entity.name
+        return 'character', entity.name
+
+    def call(self, trigger, entity):
+        """Return the result of ``trigger(entity)``, reusing it if possible"""
+        engine = self.engine
+        branch, turn, tick = engine._btt()
+        key = (trigger.__name__,) + self._entity_key(entity)
+        if key in self.results:
+            b, r, t, result = self.results[key]
+            if b == branch and (r, t) <= (turn, tick):
+                return result
+            self._forget(key)
+        outer_reads = engine._reads
+        reads = engine._reads = set()
+        try:
+            result = trigger(entity)
+        finally:
+            engine._reads = outer_reads
+        if outer_reads is not None:
+            outer_reads.update(reads)
+        if not self._reads_planned(reads, branch):
+            self.results[key] = branch, turn, tick, result
+            self.reads[key] = reads
+            readers = self.readers
+            for read in reads:
+                readers[read].add(key)
+        return result
+
+    @staticmethod
+    def _reads_planned(reads, branch):
+        """Return whether any of these reads have planned changes in the branch
+
+        The planned changes won't be announced when they come to pass,
+        so results that depend on them can't be kept.
+
+        """
+        for cache, entity in reads:
+            if branch not in cache.planned:
+                continue
+            n = len(entity)
+            for planned in cache.planned[branch]:
+                if planned[:n] == entity:
+                    return True
+        return False
+
+    def _forget(self, key):
+        del self.results[key]
+        readers = self.readers
+        for read in self.reads.pop(key):
+            if read in readers:
+                read_by = readers[read]
+                read_by.discard(key)
+                if not read_by:
+                    del readers[read]
+
+    def _invalidate(self, cache, *, action, entity=None, key=None, **kwargs):
+        if action != 'store':
+            self.results = {}
+            self.reads = {}
+            self.readers = defaultdict(set)
+            return
+        readers = self.readers
+        read = entity + (key,)
+        for i in range(len(read) + 1):
+            if (cache, read[:i]) in readers:
+                for reader in list(readers[cache, read[:i]]):
+                    if reader in self.results:
+                        self._forget(reader)
+
+
+PATH_TREES_MAXSIZE = 256
+
+
+class _PathTrees(object):
+    """Shortest path trees over one snapshot of a character"""
+    def __init__(self, snap, weight):
+        self.snap = snap
+        indptr = [int(i) for i in snap.indptr]
+        indices = [int(i) for i in snap.indices]
+        n = len(snap.nodes)
+        if weight is None:
+            costs = [1] * len(indices)
+        else:
+            costs = []
+            column = snap.edge_stats[weight]
+            if hasattr(column, 'tolist'):
+                column = column.tolist()
+            for w, present in zip(column, snap.edge_present[weight]):
+                if not present or w != w:  # missing, or NaN
+                    costs.append(1)
+                elif isinstance(w, float) and w.is_integer():
+                    costs.append(int(w))
+                else:
+                    costs.append(w)
+        self.succ = succ = []
+        self.succ_costs = succ_costs = []
+        pred = [[] for _ in range(n)]
+        pred_costs = [[] for _ in range(n)]
+        for i in range(n):
+            start, end = indptr[i], indptr[i+1]
+            dests = indices[start:end]
+            dest_costs = costs[start:end]
+            succ.append(dests)
+            succ_costs.append(dest_costs)
+            for j, cost in zip(dests, dest_costs):
+                pred[j].append(i)
+                pred_costs[j].append(cost)
+        self.pred = pred
+        self.pred_costs = pred_costs
+        self.trees_from = OrderedDict()
+        self.trees_to = OrderedDict()
+        self.demand = Counter()
+
+    @staticmethod
+    def _dijkstra(adj, adj_costs, root, target=None):
+        """Return lists of distances from ``root``, and the previous hop of each
+
+        Unreached nodes have distance ``None`` and previous hop -1.
+        Stop early when ``target`` is reached, if given.
+
+        """
+        n = len(adj)
+        dist = [None] * n
+        prev = [-1] * n
+        dist[root] = 0
+        done = [False] * n
+        heap = [(0, root)]
+        while heap:
+            d, i = heappop(heap)
+            if done[i]:
+                continue
+            done[i] = True
+            if i == target:
+                break
+            for j, cost in zip(adj[i], adj_costs[i]):
+                nd = d + cost
+                if dist[j] is None or nd < dist[j]:
+                    dist[j] = nd
+                    prev[j] = i
+                    heappush(heap, (nd, j))
+        return dist, prev
+
+    def _tree(self, trees, adj, adj_costs, root):
+        if root in trees:
+            trees.move_to_end(root)
+            return trees[root]
+        dist, prev = self._dijkstra(adj, adj_costs, root)
+        tree = trees[root] = dist, array('l', prev)
+        while len(trees) > PATH_TREES_MAXSIZE:
+            trees.popitem(False)
+        return tree
+
+    def path(self, orig, dest):
+        """Return a list of node indices leading from ``orig`` to ``dest``,
+        and the path's length
+
+        """
+        if orig in self.trees_from:
+            dist, prev = self.trees_from[orig]
+            return self._walk_back(dist, prev, orig, dest)
+        if dest in self.trees_to:
+            dist, nxt = self.trees_to[dest]
+            return self._walk_forward(dist, nxt, orig, dest)
+        demand = self.demand
+        demand['from', orig] += 1
+        demand['to', dest] += 1
+        from_demand = demand['from', orig]
+        to_demand = demand['to', dest]
+        if max(from_demand, to_demand) < 2:
+            dist, prev = self._dijkstra(
+                self.succ, self.succ_costs, orig, dest)
+            return self._walk_back(dist, prev, orig, dest)
+        if from_demand > to_demand:
+            dist, prev = self._tree(
+                self.trees_from, self.succ, self.succ_costs, orig)
+            return self._walk_back(dist, prev, orig, dest)
+        dist, nxt = self._tree(
+            self.trees_to, self.pred, self.pred_costs, dest)
+        return self._walk_forward(dist, nxt, orig, dest)
+
+    @staticmethod
+    def _walk_back(dist, prev, orig, dest):
+        if dist[dest] is None:
+            raise NetworkXNoPath
+        path = [dest]
+        i = dest
+        while i != orig:
+            i = prev[i]
+            path.append(i)
+        path.reverse()
+        return path, dist[dest]
+
+    @staticmethod
+    def _walk_forward(dist, nxt, orig, dest):
+        if dist[orig] is None:
+            raise NetworkXNoPath
+        path = [orig]
+        i = orig
+        while i != dest:
+            i = nxt[i]
+            path.append(i)
+        return path, dist[orig]
+
+
+class ShortestPathCache(object):
+    """Shortest paths between nodes of characters, computed over snapshots
+
+    For each character and weight stat, I keep shortest path trees rooted
+    at the origins and destinations that get asked about more than once.
+    They're thrown out when the character's portals, or their weights,
+    change.
+
+    Weights are taken from the named stat of each portal, or 1 if the
+    portal hasn't got it, as in NetworkX.
+
+    """
+    def __init__(self, engine):
+        self.engine = engine
+        self.trees = {}
+
+    def _get_trees(self, character, weight):
+        engine = self.engine
+        if engine._reads is not None:
+            # memoized triggers need to know that I depend on everything
+            # in the character
+            for cache in (
+                    engine._nodes_cache, engine._edges_cache,
+                    engine._edge_val_cache
+            ):
+                cache._record_read((character.name,))
+        snap = character.snapshot(
+            edge_stats=() if weight is None else (weight,))
+        key = (character.name, weight)
+        trees = self.trees.get(key)
+        if trees is None or trees.snap is not snap:
+            trees = self.trees[key] = _PathTrees(snap, weight)
+        return trees
+
+    def path_and_length(self, character, orig, dest, weight=None):
+        """Return the shortest path from ``orig`` to ``dest``, and its length
+
+        The path is a list of node names. Raise ``NodeNotFound`` if either
+        node isn't in ``character``, or ``NetworkXNoPath`` if there's no
+        path.
+
+        """
+        trees = self._get_trees(character, weight)
+        index = trees.snap.index
+        for node in (orig, dest):
+            if node not in index:
+                raise NodeNotFound("{} not in {}".format(
+                    node, character.name))
+        path, length = trees.path(index[orig], index[dest])
+        nodes = trees.snap.nodes
+        return [nodes[i] for i in path], length
+
+    def path(self, character, orig, dest, weight=None):
+        """Return a list of node names leading from ``orig`` to ``dest``"""
+        return self.path_and_length(character, orig, dest, weight)[0]
+
+    def length(self, character, orig, dest, weight=None):
+        """Return the length of the shortest path from ``orig`` to ``dest``"""
+        return self.path_and_length(character, orig, dest, weight)[1]
+
+
 class ThingsCache(Cache):
     def __init__(self, db):
         Cache.__init__(self, db)
@@ -474,7 +858,7 @@ class ThingsCache(Cache):
         super()._store(*args, planning=planning, loading=loading, contra=contra)
         node_contents_cache = self.db._node_contents_cache
         setsbranch = self.settings[branch]
-        future_location_data = setsbranch.future(turn) or (turn in setsbranch and setsbranch[turn].future(tick))
+        future_location_data = setsbranch.future(turn) or (turn in setsbranch and setsbranch[turn].future(tick)) or {}
         # Cache the contents of nodes
         if oldloc is not None:
             oldconts_orig = node_contents_cache.retrieve(character, oldloc, branch, turn, tick)
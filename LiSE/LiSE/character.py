@@ -36,6 +36,9 @@ and their node in the physical world is an avatar of it.
 """
 
 from abc import abstractmethod
+from contextlib import ExitStack
+from copy import deepcopy
+from itertools import chain
 from collections import (
     Mapping,
     MutableMapping
@@ -60,7 +63,10 @@ from .node import Node
 from .thing import Thing
 from .place import Place
 from .portal import Portal
-from .util import getatt, singleton_get
+from .util import (
+    getatt, singleton_get, perlin_noise, perlin_noise_array,
+    PERLIN_PERMUTATION, numpy
+)
 from .exc import AmbiguousAvatarError, WorldIntegrityError
 from .query import StatusAlias
 
@@ -281,131 +287,92 @@ class AbstractCharacter(MutableMapping):
         Supply the name of another stat to use it instead.
 
         """
-        from math import floor
-        p = self.engine.shuffle([
-            151, 160, 137, 91, 90, 15, 131, 13, 201, 95, 96, 53, 194, 233, 7,
-            225, 140, 36, 103, 30, 69, 142, 8, 99, 37, 240, 21, 10, 23, 190,
-            6, 148, 247, 120, 234, 75, 0, 26, 197, 62, 94, 252, 219, 203, 117,
-            35, 11, 32, 57, 177, 33, 88, 237, 149, 56, 87, 174, 20, 125, 136,
-            171, 168, 68, 175, 74, 165, 71, 134, 139, 48, 27, 166, 77, 146,
-            158, 231, 83, 111, 229, 122, 60, 211, 133, 230, 220, 105, 92, 41,
-            55, 46, 245, 40, 244, 102, 143, 54, 65, 25, 63, 161, 1, 216, 80,
-            73, 209, 76, 132, 187, 208, 89, 18, 169, 200, 196, 135, 130, 116,
-            188, 159, 86, 164, 100, 109, 198, 173, 186, 3, 64, 52, 217, 226,
-            250, 124, 123, 5, 202, 38, 147, 118, 126, 255, 82, 85, 212, 207,
-            206, 59, 227, 47, 16, 58, 17, 182, 189, 28, 42, 223, 183, 170, 213,
-            119, 248, 152, 2, 44, 154, 163, 70, 221, 153, 101, 155, 167, 43,
-            172, 9, 129, 22, 39, 253, 19, 98, 108, 110, 79, 113, 224, 232, 178,
-            185, 112, 104, 218, 246, 97, 228, 251, 34, 242, 193, 238, 210, 144,
-            12, 191, 179, 162, 241, 81, 51, 145, 235, 249, 14, 239, 107, 49,
-            192, 214, 31, 181, 199, 106, 157, 184, 84, 204, 176, 115, 121, 50,
-            45, 127, 4, 150, 254, 138, 236, 205, 93, 222, 114, 67, 29, 24, 72,
-            243, 141, 128, 195, 78, 66, 215, 61, 156, 180
-        ]) * 2
-
-        def fade(t):
-            return t * t * t * (t * (t * 6 - 15) + 10)
-
-        def lerp(t, a, b):
-            return a + t * (b - a)
-
-        def grad(hsh, x, y, z):
-            """CONVERT LO 4 BITS OF HASH CODE INTO 12 GRADIENT DIRECTIONS."""
-            h = hsh & 15
-            u = x if h < 8 else y
-            v = y if h < 4 else x if h == 12 or h == 14 else z
-            return (u if h & 1 == 0 else -u) + (v if h & 2 == 0 else -v)
-
-        def noise(x, y, z):
-            # FIND UNIT CUBE THAT CONTAINS POINT.
-            X = int(x) & 255
-            Y = int(y) & 255
-            Z = int(z) & 255
-            # FIND RELATIVE X, Y, Z OF POINT IN CUBE.
-            x -= floor(x)
-            y -= floor(y)
-            z -= floor(z)
-            # COMPUTE FADE CURVES FOR EACH OF X, Y, Z.
-            u = fade(x)
-            v = fade(y)
-            w = fade(z)
-            # HASH COORDINATES OF THE 8 CUBE CORNERS,
-            A = p[X] + Y
-            AA = p[A] + Z
-            AB = p[A+1] + Z
-            B = p[X+1] + y
-            BA = p[B] + Z
-            BB = p[B+1] + Z
-            # AND ADD BLENDED RESULTS FROM 8 CORNERS OF CUBE
-            return lerp(
-                w,
-                lerp(
-                    v,
-                    lerp(
-                        u,
-                        grad(p[AA], x, y, z),
-                        grad(p[BA], x-1, y, z)
-                    ),
-                    lerp(
-                        u,
-                        grad(p[AB], x, y-1, z),
-                        grad(p[BB], x-1, y-1, z)
-                    )
-                ),
-                lerp(
-                    v,
-                    lerp(
-                        u,
-                        grad(p[AA+1], x, y, z-1),
-                        grad(p[BA+1], x-1, y, z-1)
-                    ),
-                    lerp(
-                        u,
-                        grad(p[AB+1], x, y-1, z-1),
-                        grad(p[BB+1], x-1, y-1, z-1)
-                    )
-                )
-            )
-
-        for node in self.node.values():
+        p = list(PERLIN_PERMUTATION)
+        self.engine.shuffle(p)
+        p *= 2
+        names = []
+        xs = []
+        ys = []
+        zs = []
+        for name in self.node:
             try:
-                (x, y, z) = node.name
-            except ValueError:
+                (x, y, z) = name
+            except (TypeError, ValueError):
                 try:
-                    (x, y) = node.name
+                    (x, y) = name
                     z = 0.0
-                except ValueError:
+                except (TypeError, ValueError):
+                    node = self.node[name]
                     try:
                         x = node['x']
                         y = node['y']
                         z = node.get('z', 0.0)
                     except KeyError:
                         continue
-            x, y, z = map(float, (x, y, z))
-            node[stat] = noise(x, y, z)
-
+            names.append(name)
+            xs.append(float(x))
+            ys.append(float(y))
+            zs.append(float(z))
+        if numpy is None:
+            values = [perlin_noise(p, x, y, z) for (x, y, z) in zip(xs, ys, zs)]
+        else:
+            values = perlin_noise_array(p, xs, ys, zs)
+        self.set_node_stat_column(stat, names, values)
         return self
 
+    def set_node_stat_column(self, stat, nodes, values):
+        """Set ``stat`` on each of the ``nodes`` to the matching item of
+        ``values``
+
+        """
+        nodes = list(nodes)
+        if hasattr(values, 'tolist'):
+            values = values.tolist()
+        else:
+            values = list(values)
+        if len(nodes) != len(values):
+            raise ValueError("Got {} nodes but {} values".format(
+                len(nodes), len(values)))
+        for node, value in zip(nodes, values):
+            self.node[node][stat] = value
+
+    def _facade_state(self):
+        """Return a :class:`FacadeState` of how I look now"""
+        def unwrapped(mapping):
+            return {k: _facade_value(v) for (k, v) in mapping.items()}
+        return FacadeState(
+            unwrapped(self.stat),
+            {k: unwrapped(v) for (k, v) in self.place.items()},
+            {k: unwrapped(v) for (k, v) in self.thing.items()},
+            {
+                orig: {dest: unwrapped(port) for (dest, port) in dests.items()}
+                for (orig, dests) in self.portal.items() if dests
+            }
+        )
+
+    def what_if(self, candidates, score, processes=None):
+        """Score what would happen to me after each of the ``candidates``
+
+        Each candidate is a sequence of functions that take a facade
+        of me. Return pairs of ``(score, candidate)``, best first.
+        Nothing is changed in the world.
+
+        See :func:`LiSE.whatif.what_if`.
+
+        """
+        from .whatif import what_if
+        return what_if(self, candidates, score, processes)
+
     def copy_from(self, g):
         """Copy all nodes and edges from the given graph into this.
 
         Return myself.
 
         """
-        renamed = {}
-        for k in g.nodes:
-            ok = k
-            if k in self.place:
-                n = 0
-                while k in self.place:
-                    k = ok + (n,) if isinstance(ok, tuple) else (ok, n)
-                    n += 1
-            renamed[ok] = k
-            self.place[k] = g.nodes[k]
-        if type(g) is nx.MultiDiGraph:
-            g = nx.DiGraph(g)
-        elif type(g) is nx.MultiGraph:
-            g = nx.Graph(g)
+        renamed = self._names_for_copy(g)
+        for k, v in renamed.items():
+            self.place[v] = g.nodes[k]
+        g = self._simple_for_copy(g)
         if type(g) is nx.DiGraph:
             for u, v in g.edges:
                 self.edge[renamed[u]][renamed[v]] = g.adj[u][v]
@@ -415,6 +382,33 @@ class AbstractCharacter(MutableMapping):
                 self.add_portal(renamed[u], renamed[v], symmetrical=True, **d)
         return self
 
+    def _names_for_copy(self, g):
+        """Return a dict mapping the nodes of ``g`` to the names they'll
+        have when copied into me
+
+        Names I already use get a number added to them.
+
+        """
+        renamed = {}
+        taken = set()
+        for k in g.nodes:
+            ok = k
+            n = 0
+            while k in self.node or k in taken:
+                k = ok + (n,) if isinstance(ok, tuple) else (ok, n)
+                n += 1
+            renamed[ok] = k
+            taken.add(k)
+        return renamed
+
+    @staticmethod
+    def _simple_for_copy(g):
+        if type(g) is nx.MultiDiGraph:
+            return nx.DiGraph(g)
+        elif type(g) is nx.MultiGraph:
+            return nx.Graph(g)
+        return g
+
     def become(self, g):
         """Erase all my nodes and edges. Replace them with a copy of the graph
         provided.
@@ -830,6 +824,69 @@ class RuleFollower(BaseRuleFollower):
         )
 
 
+def _masked(column, present):
+    """Mask the values in a snapshot's ``column`` that aren't ``present``"""
+    if numpy is None:
+        return column
+    return numpy.ma.masked_array(column, mask=~present)
+
+
+def _entity_ref(v):
+    """Return a reference to ``v``, if it's a character, node, or portal
+
+    References are the same as :mod:`LiSE.shared` gives: a character's
+    name, ``(character, node)``, or ``(character, orig, dest)``.
+
+    """
+    if isinstance(v, AbstractCharacter):
+        return v.name
+    if isinstance(v, Portal):
+        return v.character.name, v.orig, v.dest
+    if isinstance(v, Node):
+        return v.character.name, v.name
+    return v
+
+
+def _facade_value(v):
+    """Return a stat's value the way a :class:`FacadeState` keeps it
+
+    Nodes and portals become dictionaries of their stats, with any
+    entities in those as references, so facades can be pickled.
+
+    """
+    if isinstance(v, (Node, Portal)):
+        return {k: _entity_ref(x) for (k, x) in v.unwrap().items()}
+    if hasattr(v, 'unwrap') and not hasattr(v, 'no_unwrap'):
+        return v.unwrap()
+    return _entity_ref(v)
+
+
+class FacadeState(object):
+    """How a character looks at one moment, in plain dictionaries
+
+    :class:`Facade` objects read from this, and keep their changes to
+    themselves, so any number of them can share one. Don't change it.
+
+    """
+    __slots__ = ('stat', 'place', 'thing', 'portal', 'preportal')
+
+    def __init__(self, stat=None, place=None, thing=None, portal=None):
+        self.stat = stat or {}
+        self.place = place or {}
+        self.thing = thing or {}
+        self.portal = portal or {}
+        self.preportal = preportal = {}
+        for orig, dests in self.portal.items():
+            for dest, stats in dests.items():
+                preportal.setdefault(dest, {})[orig] = stats
+
+    def __getstate__(self):
+        return self.stat, self.place, self.thing, self.portal
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+
 class FacadeEntity(MutableMapping, Signal):
     exists = True
 
@@ -842,10 +899,24 @@ class FacadeEntity(MutableMapping, Signal):
             for (k, v) in kwargs.items()
         }
 
+    @classmethod
+    def _with_real(cls, mapping, key, real, patch=None):
+        """Make one of me that reads from ``real``, keeping changes in
+        ``patch``
+
+        """
+        self = cls.__new__(cls)
+        FacadeEntity.__init__(self, mapping)
+        self._real = real
+        if patch is not None:
+            self._patch = patch
+        return self
+
     def __contains__(self, item):
         patch = self._patch
-        return item in self._real or (
-                item in patch and patch[item] is not None)
+        if item in patch:
+            return patch[item] is not None
+        return item in self._real
 
     def __iter__(self):
         seen = set()
@@ -877,6 +948,9 @@ class FacadeEntity(MutableMapping, Signal):
             ret = ret.unwrap()
             self._patch[k] = ret  # changes will be reflected in the
                                   # facade but not the original
+        elif isinstance(ret, (dict, list, set)):
+            # likewise for mutable objects in a FacadeState
+            ret = self._patch[k] = deepcopy(ret)
         return ret
 
     def __setitem__(self, k, v):
@@ -951,16 +1025,25 @@ class FacadePortal(FacadeEntity):
 
     def __init__(self, mapping, other, **kwargs):
         super().__init__(mapping, **kwargs)
+        self._set_ends(mapping, other)
+        try:
+            self._real = self.facade._state.portal[self.orig][self.dest]
+        except KeyError:
+            self._real = {}
+
+    @classmethod
+    def _with_real(cls, mapping, key, real, patch=None):
+        self = super()._with_real(mapping, key, real, patch)
+        self._set_ends(mapping, key)
+        return self
+
+    def _set_ends(self, mapping, other):
         if hasattr(mapping, 'orig'):
             self.orig = mapping.orig
             self.dest = other
         else:
             self.dest = mapping.dest
             self.orig = other
-        try:
-            self._real = self.facade.character.portal[self.orig][self.dest]
-        except (KeyError, AttributeError):
-            self._real = {}
 
     def __getitem__(self, item):
         if item == 'origin':
@@ -990,6 +1073,9 @@ class FacadeEntityMapping(MutableMappingUnwrapper, Signal):
     All the entities are of the same type, ``facadecls``, possibly
     being distorted views of entities of the type ``innercls``.
 
+    Entities that are in the facade's :class:`FacadeState` read from
+    there until they're changed.
+
     """
     def _make(self, k, v):
         return self.facadecls(self, k, **v)
@@ -1027,11 +1113,19 @@ class FacadeEntityMapping(MutableMappingUnwrapper, Signal):
         if k not in self:
             raise KeyError
         if k not in self._patch:
-            self._patch[k] = self._make(k, self._get_inner_map()[k])
+            self._patch[k] = self.facadecls._with_real(
+                self, k, self._get_inner_map()[k])
         ret = self._patch[k]
         if ret is None:
             raise KeyError
-        if type(ret) is not self.facadecls:
+        if type(ret) is tuple:
+            # dumped by _dump_patch
+            real, patch = ret
+            if real is None:
+                real = self._get_inner_map()[k]
+            ret = self._patch[k] = self.facadecls._with_real(
+                self, k, real, patch)
+        elif type(ret) is not self.facadecls:
             ret = self._patch[k] = self._make(k, ret)
         return ret
 
@@ -1047,6 +1141,27 @@ class FacadeEntityMapping(MutableMappingUnwrapper, Signal):
         self._patch[k] = None
         self.send(self, key=k, val=None)
 
+    def _dump_patch(self):
+        """Return my changes as plain data
+
+        Entities are ``(real, patch)`` pairs, where ``real`` is ``None``
+        if it's the one in the :class:`FacadeState`. Unchanged entities
+        are left out.
+
+        """
+        inner = self._get_inner_map()
+        ret = {}
+        for k, v in self._patch.items():
+            if isinstance(v, FacadeEntity):
+                if inner.get(k) is v._real:
+                    if not v._patch:
+                        continue
+                    v = (None, v._patch)
+                else:
+                    v = (dict(v._real), v._patch)
+            ret[k] = v
+        return ret
+
 
 class FacadePortalSuccessors(FacadeEntityMapping):
     facadecls = FacadePortal
@@ -1060,13 +1175,16 @@ class FacadePortalSuccessors(FacadeEntityMapping):
         return self.facadecls(self, k, **v)
 
     def _get_inner_map(self):
-        try:
-            return self.facade.character.portal[self.orig]
-        except AttributeError:
-            return {}
+        return self.facade._state.portal.get(self.orig, {})
 
 
 class FacadePortalPredecessors(FacadeEntityMapping):
+    """The portals leading to one node in a Facade
+
+    These are the same :class:`FacadePortal` objects as in the
+    facade's ``portal`` mapping, so that's where changes get kept.
+
+    """
     facadecls = FacadePortal
     innercls = Portal
 
@@ -1074,14 +1192,28 @@ class FacadePortalPredecessors(FacadeEntityMapping):
         super().__init__(facade)
         self.dest = destname
 
-    def _make(self, k, v):
-        return self.facadecls(self.facade.portal[k], self.dest, v)
-
     def _get_inner_map(self):
-        try:
-            return self.facade.character.preportal[self._destname]
-        except AttributeError:
-            return {}
+        return self.facade._state.preportal.get(self.dest, {})
+
+    def __contains__(self, orig):
+        portal = self.facade.portal
+        return orig in portal and self.dest in portal[orig]
+
+    def __iter__(self):
+        origs = set(self._get_inner_map())
+        origs.update(self.facade.portal._patch)
+        for orig in origs:
+            if orig in self:
+                yield orig
+
+    def __getitem__(self, orig):
+        return self.facade.portal[orig][self.dest]
+
+    def __setitem__(self, orig, v):
+        self.facade.portal[orig][self.dest] = v
+
+    def __delitem__(self, orig):
+        del self.facade.portal[orig][self.dest]
 
 
 class FacadePortalMapping(FacadeEntityMapping):
@@ -1099,7 +1231,7 @@ class FacadePortalMapping(FacadeEntityMapping):
                 nuret._patch = ret
             else:
                 nuret.update(ret)
-            ret = nuret
+            ret = self._patch[node] = nuret
         return ret
 
     def __setitem__(self, node, value):
@@ -1110,30 +1242,62 @@ class FacadePortalMapping(FacadeEntityMapping):
     def __delitem__(self, node):
         self._patch[node] = None
 
+    def _dump_patch(self):
+        ret = {}
+        for k, v in self._patch.items():
+            if isinstance(v, FacadeEntityMapping):
+                v = v._dump_patch()
+                if not v:
+                    continue
+            ret[k] = v
+        return ret
+
 
 class Facade(AbstractCharacter, nx.DiGraph):
+    """A copy of a character, as it is now, that you can change freely
+
+    Changes to a facade don't affect the character, and changes to the
+    character after the facade's made don't affect the facade.
+
+    Facades made from the same character at the same time share one
+    :class:`FacadeState`, and :meth:`copy` shares it too, so making
+    lots of them is cheap.
+
+    """
     engine = getatt('character.engine')
 
     def __getstate__(self):
-        ports = {}
-        for o in self.portal:
-            if o not in ports:
-                ports[o] = {}
-            for d in self.portal[o]:
-                ports[o][d] = dict(self.portal[o][d])
-        things = {k: dict(v) for (k, v) in self.thing.items()}
-        places = {k: dict(v) for (k, v) in self.place.items()}
-        stats = {
-            k: v.unwrap() if hasattr(v, 'unwrap') else v
-            for (k, v) in self.graph.items()
-        }
-        return things, places, ports, stats
+        return (
+            self._state,
+            dict(self.graph._patch),
+            self.place._dump_patch(),
+            self.thing._dump_patch(),
+            self.portal._dump_patch()
+        )
 
     def __setstate__(self, state):
         self.character = None
+        self._set_state(state)
+
+    def _set_state(self, state):
+        self._state, stat, place, thing, portal = state
         self.graph = self.StatMapping(self)
-        (self.thing._patch, self.place._patch, self.portal._patch,
-         self.graph._patch) = state
+        self.graph._patch = stat
+        self.place._patch = place
+        self.thing._patch = thing
+        self.portal._patch = portal
+
+    def copy(self):
+        """Return a new facade that starts out the same as me
+
+        Changes to either of us won't affect the other.
+
+        """
+        state = self.__getstate__()
+        new = type(self).__new__(type(self))
+        new.character = self.character
+        new._set_state(state[:1] + deepcopy(state[1:]))
+        return new
 
     def add_places_from(self, seq, **attrs):
         for place in seq:
@@ -1195,9 +1359,20 @@ class Facade(AbstractCharacter, nx.DiGraph):
     def add_avatar(self, a, b=None):
         raise NotImplementedError("Facades don't have avatars")
 
-    def __init__(self, character=None):
-        """Store the character."""
+    def __init__(self, character=None, state=None):
+        """Store the character, and how it looks now.
+
+        If you already have a :class:`FacadeState`, you can pass that
+        instead of having one made.
+
+        """
         self.character = character
+        if state is None:
+            if character is None:
+                state = FacadeState()
+            else:
+                state = character._facade_state()
+        self._state = state
         self.graph = self.StatMapping(self)
 
     class ThingMapping(FacadeEntityMapping):
@@ -1205,20 +1380,14 @@ class Facade(AbstractCharacter, nx.DiGraph):
         innercls = Thing
 
         def _get_inner_map(self):
-            try:
-                return self.facade.character.thing
-            except AttributeError:
-                return {}
+            return self.facade._state.thing
 
     class PlaceMapping(FacadeEntityMapping):
         facadecls = FacadePlace
         innercls = Place
 
         def _get_inner_map(self):
-            try:
-                return self.facade.character.place
-            except AttributeError:
-                return {}
+            return self.facade._state.place
 
     def ThingPlaceMapping(self, *args):
         return CompositeDict(self.thing, self.place)
@@ -1230,10 +1399,7 @@ class Facade(AbstractCharacter, nx.DiGraph):
             return item in self.facade.node
 
         def _get_inner_map(self):
-            try:
-                return self.facade.character.portal
-            except AttributeError:
-                return {}
+            return self.facade._state.portal
 
     class PortalPredecessorsMapping(FacadePortalMapping):
         cls = FacadePortalPredecessors
@@ -1242,10 +1408,7 @@ class Facade(AbstractCharacter, nx.DiGraph):
             return item in self.facade.node
 
         def _get_inner_map(self):
-            try:
-                return self.facade.character.preportal
-            except AttributeError:
-                return {}
+            return self.facade._state.preportal
 
     class StatMapping(MutableMappingUnwrapper, Signal):
         def __init__(self, facade):
@@ -1255,11 +1418,10 @@ class Facade(AbstractCharacter, nx.DiGraph):
 
         def __iter__(self):
             seen = set()
-            if hasattr(self.facade.character, 'graph'):
-                for k in self.facade.character.graph:
-                    if k not in self._patch:
-                        yield k
-                        seen.add(k)
+            for k in self.facade._state.stat:
+                if k not in self._patch:
+                    yield k
+                    seen.add(k)
             for (k, v) in self._patch.items():
                 if k not in seen and v is not None:
                     yield k
@@ -1271,20 +1433,18 @@ class Facade(AbstractCharacter, nx.DiGraph):
             return n
 
         def __contains__(self, k):
-            if hasattr(self.facade.character, 'graph') \
-                    and k in self.facade.character.graph:
-                return True
-            return k in self._patch and self._patch[k] is not None
+            if k in self._patch:
+                return self._patch[k] is not None
+            return k in self.facade._state.stat
 
         def __getitem__(self, k):
-            if k not in self._patch and hasattr(
-                    self.facade.character, 'graph'):
-                ret = self.facade.character.graph[k]
-                if not hasattr(ret, 'unwrap'):
+            if k not in self._patch:
+                ret = self.facade._state.stat[k]
+                if not isinstance(ret, (dict, list, set)):
                     return ret
-                self._patch[k] = ret.unwrap()
+                self._patch[k] = deepcopy(ret)
             if self._patch[k] is None:
-                return KeyError
+                raise KeyError("{} has been masked.".format(k))
             return self._patch[k]
 
         def __setitem__(self, k, v):
@@ -1928,12 +2088,92 @@ class Character(DiGraph, AbstractCharacter, RuleFollower):
     def facade(self):
         return Facade(self)
 
+    _last_facade_state = (None, None)
+
+    def _facade_state(self):
+        """Return a :class:`FacadeState` of how I look now
+
+        It's read straight out of the caches. Until the time changes,
+        you'll get the same one again, since I can't have changed.
+
+        """
+        engine = self.engine
+        btt = engine._btt()
+        then, state = self._last_facade_state
+        if then == btt:
+            return state
+        name = self.name
+        branch, turn, tick = btt
+        node_keys = engine._node_val_cache.iter_entity_keys
+        node_val = engine._node_val_cache.retrieve
+        location = engine._things_cache.retrieve
+        place = {}
+        thing = {}
+        for node in engine._nodes_cache.iter_entities(
+                name, branch, turn, tick):
+            stats = {
+                key: _facade_value(
+                    node_val(name, node, key, branch, turn, tick))
+                for key in node_keys(name, node, branch, turn, tick)
+            }
+            stats['character'] = name
+            stats['name'] = node
+            try:
+                loc = location(name, node, branch, turn, tick)
+            except KeyError:
+                loc = None
+            if loc is None:
+                place[node] = stats
+            else:
+                stats['location'] = loc
+                thing[node] = stats
+        successors = engine._edges_cache.iter_successors
+        edge_keys = engine._edge_val_cache.iter_entity_keys
+        edge_val = engine._edge_val_cache.retrieve
+        portal = {}
+        for orig in chain(place, thing):
+            for dest in successors(name, orig, branch, turn, tick):
+                portal.setdefault(orig, {})[dest] = {
+                    key: _facade_value(
+                        edge_val(name, orig, dest, 0, key, branch, turn, tick))
+                    for key in edge_keys(name, orig, dest, 0, branch, turn, tick)
+                }
+        stat = {k: _facade_value(v) for (k, v) in self.stat.items()}
+        state = FacadeState(stat, place, thing, portal)
+        self._last_facade_state = btt, state
+        return state
+
     def add_place(self, node_for_adding, **attr):
         self.add_node(node_for_adding, **attr)
 
     def add_places_from(self, seq, **attrs):
-        """Take a series of place names and add the lot."""
-        super().add_nodes_from(seq, **attrs)
+        """Take a series of place names and add the lot.
+
+        Items of ``seq`` may also be pairs of a name and a dictionary of
+        stats for that place, which are added to the keyword arguments.
+
+        The places are all written at once, and ``self.place`` sends a
+        single signal with ``key=None`` and ``val`` a dictionary of the
+        new places' stats.
+
+        """
+        if self.engine._planning:
+            super().add_nodes_from(seq, **attrs)
+            return
+        places = {}
+        for place in seq:
+            try:
+                hash(place)
+                stats = dict(attrs)
+            except TypeError:
+                place, more = place
+                stats = dict(attrs)
+                stats.update(more)
+            if isinstance(place, Node):
+                place = place.name
+            places[place] = stats
+        self.engine._bulk_import(self.name, places.items())
+        self.place.send(self.place, key=None, val=places)
 
     def remove_place(self, place):
         if place in self.place:
@@ -1961,11 +2201,49 @@ class Character(DiGraph, AbstractCharacter, RuleFollower):
         self.place2thing(name, location,)
 
     def add_things_from(self, seq, **attrs):
+        """Take a series of ``(name, location)`` pairs and make a
+        :class:`Thing` of each.
+
+        Triples are acceptable too, in which case the third item is a
+        dictionary of stats for the new :class:`Thing`, used instead of
+        the keyword arguments.
+
+        Everything is checked before anything is written, and then the
+        things are all written at once. ``self.thing`` sends a single
+        signal with ``key=None`` and ``val`` a dictionary of the new
+        things' stats.
+
+        """
+        if self.engine._planning:
+            for tup in seq:
+                name = tup[0]
+                location = tup[1]
+                kwargs = tup[2] if len(tup) > 2 else attrs
+                self.add_thing(name, location, **kwargs)
+            return
+        things = {}
+        locations = []
         for tup in seq:
             name = tup[0]
             location = tup[1]
-            kwargs = tup[2] if len(tup) > 2 else attrs
-            self.add_thing(name, location, **kwargs)
+            if isinstance(location, Node):
+                location = location.name
+            if name in things or name in self.thing:
+                raise WorldIntegrityError(
+                    "Already have a Thing named {}".format(name)
+                )
+            things[name] = dict(tup[2] if len(tup) > 2 else attrs)
+            locations.append((name, location))
+        for name, location in locations:
+            if location not in things and location not in self.node:
+                raise WorldIntegrityError(
+                    "{} can't be in {}, which doesn't exist".format(
+                        name, location)
+                )
+        self.engine._bulk_import(self.name, things.items(), things=locations)
+        for name in things:
+            self._recast_node(name, Thing)
+        self.thing.send(self.thing, key=None, val=things)
 
     def place2thing(self, name, location):
         """Turn a Place into a Thing with the given location.
@@ -1976,28 +2254,25 @@ class Character(DiGraph, AbstractCharacter, RuleFollower):
         self.engine._set_thing_loc(
             self.name, name, location
         )
-        if (self.name, name) in self.engine._node_objs:
-            obj = self.engine._node_objs[self.name, name]
-            thing = Thing(self, name)
-            for port in obj.portals():
-                port.origin = thing
-            for port in obj.preportals():
-                port.destination = thing
-            self.engine._node_objs[self.name, name] = thing
+        self._recast_node(name, Thing)
 
     def thing2place(self, name):
         """Unset a Thing's location, and thus turn it into a Place."""
         self.engine._set_thing_loc(
             self.name, name, None
         )
+        self._recast_node(name, Place)
+
+    def _recast_node(self, name, cls):
+        """If there's an object for the node, replace it with a ``cls``"""
         if (self.name, name) in self.engine._node_objs:
-            thing = self.engine._node_objs[self.name, name]
-            place = Place(self, name)
-            for port in thing.portals():
-                port.origin = place
-            for port in thing.preportals():
-                port.destination = place
-            self.engine._node_objs[self.name, name] = place
+            obj = self.engine._node_objs[self.name, name]
+            new = cls(self, name)
+            for port in obj.portals():
+                port.origin = new
+            for port in obj.preportals():
+                port.destination = new
+            self.engine._node_objs[self.name, name] = new
 
     def add_portal(self, origin, destination, symmetrical=False, **kwargs):
         """Connect the origin to the destination with a :class:`Portal`.
@@ -2039,14 +2314,54 @@ class Character(DiGraph, AbstractCharacter, RuleFollower):
         in the opposite direction, which will always have the same
         stats.
 
+        Everything is checked before anything is written, and then the
+        portals, and any places they need at their ends, are all
+        written at once. ``self.portal`` sends a single signal with
+        ``key=None`` and ``val`` a dictionary of the new portals'
+        stats, keyed by ``(origin, destination)``.
+
         """
+        if self.engine._planning:
+            for tup in seq:
+                orig = tup[0]
+                dest = tup[1]
+                kwargs = dict(tup[2]) if len(tup) > 2 else {}
+                if symmetrical:
+                    kwargs['symmetrical'] = True
+                self.add_portal(orig, dest, **kwargs)
+            return
+        portals = {}
+        mirrors = {}
         for tup in seq:
             orig = tup[0]
             dest = tup[1]
-            kwargs = tup[2] if len(tup) > 2 else {}
-            if symmetrical:
-                kwargs['symmetrical'] = True
-            self.add_portal(orig, dest, **kwargs)
+            if isinstance(orig, Node):
+                orig = orig.name
+            if isinstance(dest, Node):
+                dest = dest.name
+            stats = dict(tup[2]) if len(tup) > 2 else {}
+            for key in ('origin', 'destination', 'character'):
+                if key in stats:
+                    raise KeyError("Can't change " + key)
+            if stats.pop('symmetrical', symmetrical):
+                mirrors[dest, orig] = {'is_mirror': True}
+            portals[orig, dest] = stats
+        for key in portals:
+            mirrors.pop(key, None)
+        portals.update(mirrors)
+        node = self.node
+        places = {}
+        for orig, dest in portals:
+            for n in (orig, dest):
+                if n not in places and n not in node:
+                    places[n] = {}
+        self.engine._bulk_import(
+            self.name, places.items(),
+            ((orig, dest, stats) for ((orig, dest), stats) in portals.items())
+        )
+        if places:
+            self.place.send(self.place, key=None, val=places)
+        self.portal.send(self.portal, key=None, val=portals)
 
     def add_avatar(self, a, b=None):
         """Start keeping track of an avatar"""
@@ -2112,6 +2427,161 @@ class Character(DiGraph, AbstractCharacter, RuleFollower):
             self.character.name, g, n, False
         )
 
+    def copy_from(self, g):
+        """Copy all nodes and edges from the given graph into this.
+
+        Return myself.
+
+        The new places and portals, and their stats, go into the database
+        all at once, which is much faster than making them one by one.
+        As a result, nothing listening to my mappings will hear about
+        them. While planning, they're made one by one after all.
+
+        """
+        engine = self.engine
+        if engine._planning:
+            return super().copy_from(g)
+        renamed = self._names_for_copy(g)
+        nodes = [(renamed[k], dict(v)) for (k, v) in g.nodes.items()]
+        g = self._simple_for_copy(g)
+        if type(g) is nx.DiGraph:
+            edges = [
+                (renamed[u], renamed[v], dict(d))
+                for (u, v, d) in g.edges.data()
+            ]
+        else:
+            assert type(g) is nx.Graph
+            edges = []
+            mirrors = []
+            for u, v, d in g.edges.data():
+                u, v = renamed[u], renamed[v]
+                edges.append((u, v, dict(d)))
+                if u != v:
+                    mirrors.append((v, u, {'is_mirror': True}))
+            edges.extend(mirrors)
+        engine._bulk_import(self.name, nodes, edges)
+        return self
+
+    def set_node_stat_column(self, stat, nodes, values):
+        """Set ``stat`` on each of the ``nodes`` to the matching item of
+        ``values``
+
+        This is much faster than setting the stats one at a time,
+        because it skips over the :class:`Node` objects, and does its
+        writing in a batch. As a result, nothing listening to the nodes
+        will hear about it.
+
+        """
+        nodes = list(nodes)
+        if hasattr(values, 'tolist'):
+            values = values.tolist()
+        else:
+            values = list(values)
+        if len(nodes) != len(values):
+            raise ValueError("Got {} nodes but {} values".format(
+                len(nodes), len(values)))
+        if None in values:
+            raise ValueError(
+                "allegedb uses None to indicate that a key's been deleted"
+            )
+        for node in nodes:
+            if node not in self.node:
+                raise KeyError("No such node: {}".format(node))
+        items = list(zip(nodes, values))
+        engine = self.engine
+        name = self.name
+        nbtt = engine._nbtt
+        store = engine._node_val_cache.store
+        node_val_set = engine.query.node_val_set
+        if engine._no_kc:
+            batch = ExitStack()
+        else:
+            batch = engine.batch()
+        with batch:
+            for node, value in items:
+                branch, turn, tick = nbtt()
+                store(name, node, stat, branch, turn, tick, value)
+                node_val_set(name, node, stat, branch, turn, tick, value)
+
+    def node_stat_column(self, stat):
+        """Return a tuple of my node names, and their values of ``stat``
+
+        The values are in a NumPy masked array, if NumPy is installed,
+        with the nodes that lack the stat masked. Otherwise they're in
+        a tuple, with ``None`` for those nodes.
+
+        """
+        snap = self.snapshot(node_stats=(stat,))
+        return snap.nodes, _masked(
+            snap.node_stats[stat], snap.node_present[stat])
+
+    def portal_stat_column(self, stat):
+        """Return a tuple of my portals' ``(orig, dest)``, and their values of
+        ``stat``
+
+        The values are like those from :meth:`node_stat_column`.
+
+        """
+        snap = self.snapshot(edge_stats=(stat,))
+        return snap.edges, _masked(
+            snap.edge_stats[stat], snap.edge_present[stat])
+
+    def nodes_where(self, stat, test):
+        """Return a list of the names of nodes whose ``stat`` passes ``test``
+
+        With NumPy installed, ``test`` is called on the whole column
+        of values from :meth:`node_stat_column`, and should return an
+        array of booleans, eg. ``lambda dirt: dirt > 0.5``. If that
+        doesn't work, it's called on each value in turn.
+
+        Nodes without ``stat`` are left out.
+
+        """
+        return self.snapshot(node_stats=(stat,)).nodes_where(stat, test)
+
+    def portals_where(self, stat, test):
+        """Return a list of ``(orig, dest)`` for portals whose ``stat`` passes
+        ``test``
+
+        ``test`` works like it does for :meth:`nodes_where`.
+
+        """
+        return self.snapshot(edge_stats=(stat,)).edges_where(stat, test)
+
+    def _remove_in_batch(self, remover, seq):
+        if not seq:
+            return
+        if self.engine._no_kc:
+            batch = ExitStack()
+        else:
+            batch = self.engine.batch()
+        with batch:
+            remover(seq)
+
+    def cull_nodes(self, stat, threshold=0.5, comparator=ge):
+        """Delete nodes whose stat >= ``threshold`` (default 0.5).
+
+        Optional argument ``comparator`` will replace >= as the test
+        for whether to cull. You can use the name of a stored function.
+
+        """
+        comparator = self._lookup_comparator(comparator)
+        dead = self.nodes_where(stat, lambda v: comparator(v, threshold))
+        self._remove_in_batch(self.remove_nodes_from, dead)
+        return self
+
+    def cull_portals(self, stat, threshold=0.5, comparator=ge):
+        """Delete portals whose stat >= ``threshold`` (default 0.5).
+
+        Optional argument ``comparator`` will replace >= as the test
+        for whether to cull. You can use the name of a stored function.
+
+        """
+        comparator = self._lookup_comparator(comparator)
+        dead = self.portals_where(stat, lambda v: comparator(v, threshold))
+        self._remove_in_batch(self.remove_edges_from, dead)
+        return self
+
     def portals(self):
         """Iterate over all portals."""
         char = self.character
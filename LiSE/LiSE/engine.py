@@ -5,15 +5,17 @@ stores for game data and entities, as well as properties for manipulating the
 flow of time.
 
 """
+from contextlib import ExitStack
 from functools import partial
 from collections import defaultdict
 from operator import attrgetter
+from time import perf_counter
 from types import FunctionType, MethodType
 from abc import ABC, abstractmethod
 
 import msgpack
 from blinker import Signal
-from allegedb import ORM as gORM
+from allegedb import ORM as gORM, LazyCache
 from allegedb.cache import HistoryError
 from .reify import reify
 from .util import sort_set
@@ -100,6 +102,8 @@ class NextTurn(Signal):
                     )
         engine._turns_completed[start_branch] = engine.turn
         engine.query.complete_turn(start_branch, engine.turn)
+        if engine.commit_modulus and engine.turn % engine.commit_modulus == 0:
+            engine.commit()
         self.send(
             self.engine,
             branch=engine.branch,
@@ -526,6 +530,40 @@ class Engine(AbstractEngine, gORM):
     illegal_graph_names = [
         'global', 'eternal', 'universal', 'rulebooks', 'rules']
     illegal_node_names = ['nodes', 'node_val', 'edges', 'edge_val', 'things']
+    # only loaded when first used, in read-only mode
+    _things_cache = LazyCache('_things_cache')
+    _node_contents_cache = LazyCache('_node_contents_cache')
+    _universal_cache = LazyCache('_universal_cache')
+    _rulebooks_cache = LazyCache('_rulebooks_cache')
+    _characters_rulebooks_cache = LazyCache('_characters_rulebooks_cache')
+    _avatars_rulebooks_cache = LazyCache('_avatars_rulebooks_cache')
+    _characters_things_rulebooks_cache = \
+        LazyCache('_characters_things_rulebooks_cache')
+    _characters_places_rulebooks_cache = \
+        LazyCache('_characters_places_rulebooks_cache')
+    _characters_portals_rulebooks_cache = \
+        LazyCache('_characters_portals_rulebooks_cache')
+    _nodes_rulebooks_cache = LazyCache('_nodes_rulebooks_cache')
+    _portals_rulebooks_cache = LazyCache('_portals_rulebooks_cache')
+    _triggers_cache = LazyCache('_triggers_cache')
+    _prereqs_cache = LazyCache('_prereqs_cache')
+    _actions_cache = LazyCache('_actions_cache')
+    _avatarness_cache = LazyCache('_avatarness_cache')
+    _character_rules_handled_cache = \
+        LazyCache('_character_rules_handled_cache')
+    _avatar_rules_handled_cache = LazyCache('_avatar_rules_handled_cache')
+    _character_thing_rules_handled_cache = \
+        LazyCache('_character_thing_rules_handled_cache')
+    _character_place_rules_handled_cache = \
+        LazyCache('_character_place_rules_handled_cache')
+    _character_portal_rules_handled_cache = \
+        LazyCache('_character_portal_rules_handled_cache')
+    _node_rules_handled_cache = LazyCache('_node_rules_handled_cache')
+    _portal_rules_handled_cache = LazyCache('_portal_rules_handled_cache')
+    # Make this a dict of lists, [0, 0.0] by default, and I'll count the
+    # calls to each phase of the rules engine in the first item and add
+    # up the seconds they took in the second. See LiSE.run
+    _phase_times = None
 
     def _make_node(self, graph, node):
         if self._is_thing(graph.name, node):
@@ -905,7 +943,7 @@ class Engine(AbstractEngine, gORM):
         )
         from .cache import (
             NodeContentsCache,
-            InitializedCache,
+            EntityRulebooksCache,
             EntitylessCache,
             InitializedEntitylessCache,
             AvatarnessCache,
@@ -916,7 +954,9 @@ class Engine(AbstractEngine, gORM):
             NodeRulesHandledCache,
             PortalRulesHandledCache,
             CharacterRulesHandledCache,
-            ThingsCache
+            ThingsCache,
+            TriggerResultsCache,
+            ShortestPathCache
         )
         from .rule import AllRuleBooks, AllRules
 
@@ -934,8 +974,8 @@ class Engine(AbstractEngine, gORM):
             InitializedEntitylessCache(self)
         self._characters_portals_rulebooks_cache = \
             InitializedEntitylessCache(self)
-        self._nodes_rulebooks_cache = InitializedCache(self)
-        self._portals_rulebooks_cache = InitializedCache(self)
+        self._nodes_rulebooks_cache = EntityRulebooksCache(self)
+        self._portals_rulebooks_cache = EntityRulebooksCache(self)
         self._triggers_cache = InitializedEntitylessCache(self)
         self._prereqs_cache = InitializedEntitylessCache(self)
         self._actions_cache = InitializedEntitylessCache(self)
@@ -950,6 +990,8 @@ class Engine(AbstractEngine, gORM):
         self._character_portal_rules_handled_cache \
             = CharacterPortalRulesHandledCache(self)
         self._avatarness_cache = AvatarnessCache(self)
+        self._trigger_results_cache = TriggerResultsCache(self)
+        self._shortest_path_cache = ShortestPathCache(self)
         self._turns_completed = defaultdict(lambda: max((0, self.turn - 1)))
         """The last turn when the rules engine ran in each branch"""
         self.universal = UniversalMapping(self)
@@ -988,7 +1030,11 @@ class Engine(AbstractEngine, gORM):
             random_seed=None,
             logfun=None,
             validate=False,
-            clear=False
+            clear=False,
+            storage_profile=None,
+            archive=None,
+            readonly=False,
+            publish=None
     ):
         """Store the connections for the world database and the code database;
         set up listeners; and start a transaction
@@ -1024,10 +1070,27 @@ class Engine(AbstractEngine, gORM):
         loading the game
         :arg clear: whether to delete *any and all* existing data
         and code. Use with caution!
+        :arg storage_profile: name of a preset of SQLite settings:
+        ``'durable'``, ``'fast'``, or ``'bulk-load'``
+        :arg archive: path to a directory of old history made by
+        :func:`LiSE.archive.archive`, to load along with the database
+        :arg readonly: open the world database for reading its history,
+        and nothing else. It starts quickly, and many processes may
+        read the same file at once, so long as nothing writes to it.
+        Time travel works, but deltas don't, and neither do rules, or
+        ``method.init``.
+        :arg publish: path to a file to write the world's state to
+        whenever it commits, for other processes to read with
+        :class:`LiSE.shared.SharedWorld`
 
         """
         import os
         from .xcollections import StringStore
+        if clear and readonly:
+            raise ValueError("Can't clear a read-only world")
+        if publish is not None and readonly:
+            raise ValueError("Read-only worlds don't commit, so can't publish")
+        self._publish = publish
         worlddbpath = worlddb.replace('sqlite:///', '')
         if clear and os.path.exists(worlddbpath):
             os.remove(worlddbpath)
@@ -1068,21 +1131,31 @@ class Engine(AbstractEngine, gORM):
         else:
             self.action = action
         self.schema = schema_cls(self)
+        if isinstance(archive, str):
+            from .archive import Archive
+            archive = Archive(archive)
         super().__init__(
             worlddb,
             connect_args=connect_args,
             alchemy=alchemy,
-            validate=validate
+            validate=validate,
+            storage_profile=storage_profile,
+            archive=archive,
+            readonly=readonly
         )
-        self._things_cache.setdb = self.query.set_thing_loc
-        self._universal_cache.setdb = self.query.universal_set
-        self._rulebooks_cache.setdb = self.query.rulebook_set
+        if not readonly:
+            self._things_cache.setdb = self.query.set_thing_loc
+            self._universal_cache.setdb = self.query.universal_set
+            self._rulebooks_cache.setdb = self.query.rulebook_set
         self.eternal = self.query.globl
+        for trigger in self.eternal.get('memoized_triggers', ()):
+            self._trigger_results_cache.add(trigger)
         if hasattr(self, '_string_file'):
             self.string = StringStore(
                 self.query,
                 self._string_file,
-                self.eternal.setdefault('language', 'eng')
+                self.eternal.get('language', 'eng') if readonly
+                else self.eternal.setdefault('language', 'eng')
             )
         self.next_turn = NextTurn(self)
         if logfun is None:
@@ -1098,57 +1171,79 @@ class Engine(AbstractEngine, gORM):
         # set up the randomizer
         from random import Random
         self._rando = Random()
-        if 'rando_state' in self.universal:
+        if readonly:
+            self._rando.seed(self.random_seed)
+        elif 'rando_state' in self.universal:
             self._rando.setstate(self.universal['rando_state'])
         else:
             self._rando.seed(self.random_seed)
             self.universal['rando_state'] = self._rando.getstate()
-        if hasattr(self.method, 'init'):
+        if not readonly and hasattr(self.method, 'init'):
             self.method.init(self)
+        if publish is not None:
+            from .shared import publish as publish_world
+            publish_world(self, publish)
 
     def _init_load(self, validate=False):
         from .rule import Rule
         q = self.query
-        self._things_cache.load(q.things_dump())
+        load = self._load_cache
+
+        def load_rows(dump):
+            return lambda cache: cache.load(dump())
+
+        def store_rows(dump):
+            def store_all(cache):
+                store = cache.store
+                for row in dump():
+                    store(*row, loading=True)
+            return store_all
+
+        def load_things(cache):
+            # The things cache fills the node contents cache as it loads.
+            # Keeping the latter's keycache up to date the whole time
+            # is slow, and it'll be rebuilt when needed anyway.
+            no_kc = self._no_kc
+            self._no_kc = True
+            try:
+                cache.load(q.things_dump())
+            finally:
+                self._no_kc = no_kc
+
+        load('_things_cache', load_things)
+        load('_node_contents_cache', lambda cache: self._things_cache)
         super()._init_load(validate=validate)
-        self._avatarness_cache.load(q.avatars_dump())
-        self._universal_cache.load(q.universals_dump())
-        self._rulebooks_cache.load(q.rulebooks_dump())
-        self._characters_rulebooks_cache.load(
-            q.character_rulebook_dump())
-        self._avatars_rulebooks_cache.load(q.avatar_rulebook_dump())
-        self._characters_things_rulebooks_cache.load(
-            q.character_thing_rulebook_dump())
-        self._characters_places_rulebooks_cache.load(
-            q.character_place_rulebook_dump())
-        self._characters_portals_rulebooks_cache.load(
-            q.character_portal_rulebook_dump())
-        self._nodes_rulebooks_cache.load(q.node_rulebook_dump())
-        self._portals_rulebooks_cache.load(q.portal_rulebook_dump())
-        self._triggers_cache.load(q.rule_triggers_dump())
-        self._prereqs_cache.load(q.rule_prereqs_dump())
-        self._actions_cache.load(q.rule_actions_dump())
-        store_crh = self._character_rules_handled_cache.store
-        for row in q.character_rules_handled_dump():
-            store_crh(*row, loading=True)
-        store_arh = self._avatar_rules_handled_cache.store
-        for row in q.avatar_rules_handled_dump():
-            store_arh(*row, loading=True)
-        store_ctrh = self._character_thing_rules_handled_cache.store
-        for row in q.character_thing_rules_handled_dump():
-            store_ctrh(*row, loading=True)
-        store_cprh = self._character_place_rules_handled_cache.store
-        for row in q.character_place_rules_handled_dump():
-            store_cprh(*row, loading=True)
-        store_cporh = self._character_portal_rules_handled_cache.store
-        for row in q.character_portal_rules_handled_dump():
-            store_cporh(*row, loading=True)
-        store_cnrh = self._node_rules_handled_cache.store
-        for row in q.node_rules_handled_dump():
-            store_cnrh(*row, loading=True)
-        store_porh = self._portal_rules_handled_cache.store
-        for row in q.portal_rules_handled_dump():
-            store_porh(*row, loading=True)
+        load('_avatarness_cache', load_rows(q.avatars_dump))
+        load('_universal_cache', load_rows(q.universals_dump))
+        load('_rulebooks_cache', load_rows(q.rulebooks_dump))
+        load('_characters_rulebooks_cache',
+             load_rows(q.character_rulebook_dump))
+        load('_avatars_rulebooks_cache', load_rows(q.avatar_rulebook_dump))
+        load('_characters_things_rulebooks_cache',
+             load_rows(q.character_thing_rulebook_dump))
+        load('_characters_places_rulebooks_cache',
+             load_rows(q.character_place_rulebook_dump))
+        load('_characters_portals_rulebooks_cache',
+             load_rows(q.character_portal_rulebook_dump))
+        load('_nodes_rulebooks_cache', load_rows(q.node_rulebook_dump))
+        load('_portals_rulebooks_cache', load_rows(q.portal_rulebook_dump))
+        load('_triggers_cache', load_rows(q.rule_triggers_dump))
+        load('_prereqs_cache', load_rows(q.rule_prereqs_dump))
+        load('_actions_cache', load_rows(q.rule_actions_dump))
+        load('_character_rules_handled_cache',
+             store_rows(q.character_rules_handled_dump))
+        load('_avatar_rules_handled_cache',
+             store_rows(q.avatar_rules_handled_dump))
+        load('_character_thing_rules_handled_cache',
+             store_rows(q.character_thing_rules_handled_dump))
+        load('_character_place_rules_handled_cache',
+             store_rows(q.character_place_rules_handled_dump))
+        load('_character_portal_rules_handled_cache',
+             store_rows(q.character_portal_rules_handled_dump))
+        load('_node_rules_handled_cache',
+             store_rows(q.node_rules_handled_dump))
+        load('_portal_rules_handled_cache',
+             store_rows(q.portal_rules_handled_dump))
         self._turns_completed.update(q.turns_completed_dump())
         self._rules_cache = {
             name: Rule(self, name, create=False) for name in q.rules_dump()}
@@ -1185,6 +1280,8 @@ class Engine(AbstractEngine, gORM):
         self.log('critical', msg)
 
     def commit(self):
+        if self._readonly:
+            return
         try:
             self.universal['rando_state'] = self._rando.getstate()
         except HistoryError:
@@ -1193,11 +1290,28 @@ class Engine(AbstractEngine, gORM):
             self.universal['rando_state'] = self._rando.getstate()
             self.turn = turn
             self.tick = tick
-        super().commit()
+        times = self._phase_times
+        if times is None:
+            super().commit()
+        else:
+            start = perf_counter()
+            self.query.flush()
+            flushed = perf_counter()
+            super().commit()
+            times['flush'][0] += 1
+            times['flush'][1] += flushed - start
+            times['commit'][0] += 1
+            times['commit'][1] += perf_counter() - flushed
+        if self._publish is not None:
+            from .shared import publish
+            publish(self, self._publish)
 
     def close(self):
         """Commit changes and close the database."""
         import sys, os
+        if self._readonly:
+            super().close()
+            return
         for store in self.stores:
             if hasattr(store, 'save'):
                 store.save(reimport=False)
@@ -1358,9 +1472,16 @@ class Engine(AbstractEngine, gORM):
         rulemap = self.rule
         todo = defaultdict(list)
 
+        trigger_results = self._trigger_results_cache
+        memoized = trigger_results.triggers
+        call_memoized = trigger_results.call
+
         def check_triggers(rule, handled_fun, entity):
             for trigger in rule.triggers:
-                res = trigger(entity)
+                if trigger.__name__ in memoized:
+                    res = call_memoized(trigger, entity)
+                else:
+                    res = trigger(entity)
                 if res:
                     return True
             else:
@@ -1384,6 +1505,21 @@ class Engine(AbstractEngine, gORM):
             handled_fun()
             return actres
 
+        times = self._phase_times
+        if times is not None:
+            def timed(phase, fun):
+                def timed_fun(*args):
+                    start = perf_counter()
+                    try:
+                        return fun(*args)
+                    finally:
+                        times[phase][0] += 1
+                        times[phase][1] += perf_counter() - start
+                return timed_fun
+            check_triggers = timed('triggers', check_triggers)
+            check_prereqs = timed('prereqs', check_prereqs)
+            do_actions = timed('actions', do_actions)
+
         # TODO: triggers that don't mutate anything should be
         #  evaluated in parallel
         #  Ideally this would be implemented with a pool of
@@ -1530,6 +1666,25 @@ class Engine(AbstractEngine, gORM):
         #     self._rules_iter = self._follow_rules()
         #     return ex
 
+    def memoize_trigger(self, trigger):
+        """Reuse the results of a trigger until something it read changes
+
+        ``trigger`` may be a trigger function or its name. The trigger
+        must only look at the entity it's given and the rest of the
+        world, not random numbers or anything outside of me.
+
+        This can be stacked on top of the ``trigger`` decorator of a rule,
+        and returns the trigger unchanged.
+
+        """
+        name = getattr(trigger, '__name__', trigger)
+        memoized = list(self.eternal.get('memoized_triggers', ()))
+        if name not in memoized:
+            memoized.append(name)
+            self.eternal['memoized_triggers'] = memoized
+        self._trigger_results_cache.add(name)
+        return trigger
+
     def new_character(self, name, data=None, **kwargs):
         """Create and return a new :class:`Character`."""
         self.add_character(name, data, **kwargs)
@@ -1578,6 +1733,33 @@ class Engine(AbstractEngine, gORM):
             loc
         )
 
+    def _bulk_import(self, character, nodes=(), edges=(), things=()):
+        """Create lots of nodes and portals at once, and maybe make things
+        of some of the nodes
+
+        ``things`` is an iterable of pairs of a node and its location.
+        The node has to be in ``nodes`` or exist already. The rest is as
+        in :meth:`allegedb.ORM._bulk_import`.
+
+        """
+        things = list(things)
+        super()._bulk_import(character, nodes, edges)
+        if not things:
+            return
+        branch, turn, tick = self._claim_ticks(len(things))
+        rows = [
+            (character, thing, branch, turn, tick + i, loc)
+            for i, (thing, loc) in enumerate(things)
+        ]
+        cache = self._things_cache
+        # storing locations also stores the contents of the locations
+        with ExitStack() if self._no_kc else self.batch():
+            for row in rows:
+                cache._store(*row, planning=False, loading=True)
+        cache.send(cache, branch=branch, turn=turn, tick=rows[-1][-2],
+                   action='load')
+        self.query.bulk_insert(things=rows)
+
     def alias(self, v, stat='dummy'):
         """Return a pointer to a value for use in historical queries.
 
@@ -695,7 +695,7 @@ class EngineHandle(object):
     @timely
     def set_node_stat(self, char, node, k, v):
         self._real.character[char].node[node][k] = v
-        self._node_stat_cache.setdefault(char, {})[node][k] = v
+        self._node_stat_cache.setdefault(char, {}).setdefault(node, {})[k] = v
 
     @timely
     def del_node_stat(self, char, node, k):
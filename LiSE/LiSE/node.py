@@ -21,7 +21,7 @@ thing. This module is for what they have in common.
 """
 from collections import Mapping, ValuesView
 
-from networkx import shortest_path, shortest_path_length
+from networkx import NetworkXNoPath
 
 import allegedb.graph
 from allegedb.cache import HistoryError
@@ -55,6 +55,7 @@ class UserMapping(Mapping):
         engine = self.engine
         charn = node.character.name
         nn = node.name
+        engine._avatarness_cache._record_read(())
         cache = engine._avatarness_cache.user_order
         if charn not in cache or \
            nn not in cache[charn]:
@@ -406,8 +407,7 @@ class Node(allegedb.graph.Node, rule.RuleFollower):
         or the name of one.
 
         """
-
-        return shortest_path_length(
+        return self.engine._shortest_path_cache.length(
             self.character, self.name, self._plain_dest_name(dest), weight
         )
 
@@ -418,7 +418,7 @@ class Node(allegedb.graph.Node, rule.RuleFollower):
         or the name of one.
 
         """
-        return shortest_path(
+        return self.engine._shortest_path_cache.path(
             self.character, self.name, self._plain_dest_name(dest), weight
         )
 
@@ -434,7 +434,7 @@ class Node(allegedb.graph.Node, rule.RuleFollower):
         """
         try:
             return bool(self.shortest_path_length(dest, weight))
-        except KeyError:
+        except (KeyError, NetworkXNoPath):
             return False
 
     @property
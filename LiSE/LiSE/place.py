@@ -39,6 +39,12 @@ class Place(Node):
         except KeyError:
             return {'name': self.name, 'character': self.character.name}[key]
 
+    def get_raw(self, key):
+        try:
+            return super().get_raw(key)
+        except KeyError:
+            return {'name': self.name, 'character': self.character.name}[key]
+
     def __repr__(self):
         return "{}.character[{}].place[{}]".format(
             repr(self.engine),
@@ -136,6 +136,27 @@ class Portal(Edge, RuleFollower):
         else:
             return super().__getitem__(key)
 
+    def get_raw(self, key):
+        if key == 'origin':
+            return self.orig
+        elif key == 'destination':
+            return self.dest
+        elif key == 'character':
+            return self.character.name
+        elif key == 'is_mirror':
+            try:
+                return super().get_raw(key)
+            except KeyError:
+                return False
+        elif 'is_mirror' in self and self.get_raw('is_mirror'):
+            return self.character.preportal[
+                self.orig
+            ][
+                self.dest
+            ].get_raw(key)
+        else:
+            return super().get_raw(key)
+
     def __setitem__(self, key, value):
         """Set ``key``=``value`` at the present game-time.
 
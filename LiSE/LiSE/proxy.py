@@ -35,7 +35,7 @@ from multiprocessing import Process, Pipe, Queue, ProcessError
 from concurrent.futures import ThreadPoolExecutor
 from queue import Empty
 
-from blinker import Signal
+from blinker import Signal, ANY
 
 from allegedb.cache import HistoryError, PickyDefaultDict, StructuredDefaultDict
 from allegedb.wrap import DictWrapper, ListWrapper, SetWrapper, UnwrappingDict
@@ -51,12 +51,40 @@ from .thing import Thing
 from .portal import Portal
 
 
-class CachingProxy(MutableMapping, Signal):
-    """Abstract class for proxy objects representing LiSE entities or mappings thereof"""
+class CachingProxy(MutableMapping):
+    """Abstract class for proxy objects representing LiSE entities or mappings thereof
+
+    You can ``connect`` to me like a :class:`blinker.Signal`, but I only
+    make the signal when something does, since most proxies never get
+    listened to.
+
+    """
+    __slots__ = ('exists', '_signal', '__weakref__')
+
     def __init__(self):
         super().__init__()
         self.exists = True
 
+    def connect(self, receiver, sender=ANY, weak=True):
+        try:
+            signal = self._signal
+        except AttributeError:
+            signal = self._signal = Signal()
+        return signal.connect(receiver, sender, weak)
+
+    def disconnect(self, receiver, sender=ANY):
+        try:
+            self._signal.disconnect(receiver, sender)
+        except AttributeError:
+            pass
+
+    def send(self, *sender, **kwargs):
+        try:
+            signal = self._signal
+        except AttributeError:
+            return []
+        return signal.send(*sender, **kwargs)
+
     def __bool__(self):
         return bool(self.exists)
 
@@ -113,6 +141,8 @@ class CachingProxy(MutableMapping, Signal):
 
 class CachingEntityProxy(CachingProxy):
     """Abstract class for proxy objects representing LiSE entities"""
+    __slots__ = ()
+
     def _cache_get_munge(self, k, v):
         if isinstance(v, dict):
             return DictWrapper(lambda: self._cache[k], partial(self._set_item, k), self, k)
@@ -168,6 +198,7 @@ class ProxyUserDescriptor(UserDescriptor):
 
 
 class NodeProxy(CachingEntityProxy):
+    __slots__ = ('engine', '_charname', 'name')
     rulebook = RulebookProxyDescriptor()
 
     @property
@@ -272,6 +303,8 @@ class NodeProxy(CachingEntityProxy):
 
 
 class PlaceProxy(NodeProxy):
+    __slots__ = ()
+
     def __repr__(self):
         return "<proxy to {}.place[{}] at {}>".format(
             self._charname,
@@ -284,6 +317,8 @@ Place.register(PlaceProxy)
 
 
 class ThingProxy(NodeProxy):
+    __slots__ = ('_location',)
+
     @property
     def location(self):
         return self.engine.character[self._charname].node[self._location]
@@ -417,6 +452,7 @@ Thing.register(ThingProxy)
 
 
 class PortalProxy(CachingEntityProxy):
+    __slots__ = ('engine', '_charname', '_origin', '_destination')
     rulebook = RulebookProxyDescriptor()
 
     def _get_default_rulebook_name(self):
@@ -1668,7 +1704,7 @@ class StringStoreProxy(Signal):
 
     def __setattr__(self, k, v):
         if k in ('_cache', 'engine', 'language', '_language', 'receivers',
-                 '_by_receiver', '_by_sender', '_weak_senders'):
+                 '_by_receiver', '_by_sender', '_weak_senders', 'is_muted'):
             super().__setattr__(k, v)
             return
         self._cache[k] = v
@@ -1868,7 +1904,8 @@ class FuncStoreProxy(Signal):
 
     def __setattr__(self, func_name, source):
         if func_name in ('engine', '_store', '_cache', 'receivers',
-                         '_by_sender', '_by_receiver', '_weak_senders'):
+                         '_by_sender', '_by_receiver', '_weak_senders',
+                         'is_muted'):
             super().__setattr__(func_name, source)
             return
         self.engine.handle(
@@ -2117,12 +2154,22 @@ class EngineProxy(AbstractEngine):
             deltas = self.handle('get_char_deltas', chars='all')
             for char in deltas:
                 self._char_cache[char] = character = CharacterProxy(self, char)
+                # node names arrive as a fresh object every time they're
+                # mentioned, so keep only the first of each
+                names = {}
+
+                def intern(name):
+                    return names.setdefault(name, name)
                 for origin, destinations in deltas[
                         char].pop('edge_val', {}).items():
+                    origin = intern(origin)
                     for destination,  stats in destinations.items():
-                        self._portal_stat_cache[char][origin][destination] = stats
+                        self._portal_stat_cache[char][origin][
+                            intern(destination)] = stats
                 for node,  stats in deltas[char].pop('node_val', {}).items():
-                    self._node_stat_cache[char][node] = stats
+                    if 'location' in stats:
+                        stats['location'] = intern(stats['location'])
+                    self._node_stat_cache[char][intern(node)] = stats
                 avatars = self._character_avatars_cache[char] = deltas[char].pop('avatars', {})
                 for av, node in avatars.items():
                     self._avatar_characters_cache[av].setdefault(char, node)
@@ -2135,6 +2182,7 @@ class EngineProxy(AbstractEngine):
                             = self._rulebook_obj_cache[rb] \
                             = RuleBookProxy(self, rb)
                 for node, rb in deltas[char].pop('node_rulebooks', {}).items():
+                    node = intern(node)
                     if rb in self._rulebook_obj_cache:
                         self._char_node_rulebooks_cache[char][node] \
                             = self._rulebook_obj_cache[rb]
@@ -2144,7 +2192,9 @@ class EngineProxy(AbstractEngine):
                             = RuleBookProxy(self, rb)
                 for origin, destinations in deltas[
                         char].pop('portal_rulebooks', {}).items():
+                    origin = intern(origin)
                     for destination, rulebook in destinations.items():
+                        destination = intern(destination)
                         if rulebook in self._rulebook_obj_cache:
                             self._char_port_rulebooks_cache[
                                 char][origin][destination
@@ -2156,6 +2206,7 @@ class EngineProxy(AbstractEngine):
                                 = RuleBookProxy(self, rulebook)
                 for node, ex in deltas[char].pop('nodes', {}).items():
                     if ex:
+                        node = intern(node)
                         noded = self._node_stat_cache[char].get(node)
                         if noded and 'location' in noded:
                             self._things_cache[char][node] = ThingProxy(
@@ -2166,8 +2217,10 @@ class EngineProxy(AbstractEngine):
                                 character, node
                             )
                 for orig, dests in deltas[char].pop('edges', {}).items():
+                    orig = intern(orig)
                     for dest, ex in dests.items():
                         if ex:
+                            dest = intern(dest)
                             self._character_portals_cache.store(
                                 char, orig, dest, PortalProxy(character, orig, dest)
                             )
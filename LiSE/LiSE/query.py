@@ -768,6 +768,23 @@ class QueryEngine(allegedb.query.QueryEngine):
             loc
         )
 
+    def bulk_insert(self, nodes=(), node_vals=(), edges=(), edge_vals=(),
+                    things=()):
+        """Insert lots of new records at once, one query per table
+
+        ``things`` is a list of rows with the same fields as the
+        arguments to :meth:`set_thing_loc`. The rest are as in
+        :meth:`allegedb.query.QueryEngine.bulk_insert`.
+
+        """
+        super().bulk_insert(nodes, node_vals, edges, edge_vals)
+        if things:
+            pack = self.pack
+            self.sqlmany('things_insert', *(
+                (pack(character), pack(thing), branch, turn, tick, pack(loc))
+                for (character, thing, branch, turn, tick, loc) in things
+            ))
+
     def avatar_set(self, character, graph, node, branch, turn, tick, isav):
         (character, graph, node) = map(
             self.pack, (character, graph, node)
@@ -828,6 +845,8 @@ class QueryEngine(allegedb.query.QueryEngine):
 
         """
         super().initdb()
+        if self.readonly:
+            return
         init_table = self.init_table
         for table in (
             'universals',
@@ -856,3 +875,4 @@ class QueryEngine(allegedb.query.QueryEngine):
             'turns_completed'
         ):
             init_table(table)
+        self.init_indices()
@@ -0,0 +1,199 @@
+# This file is part of LiSE, a framework for life simulation games.
+# Copyright (c) Zachary Spector, public@zacharyspector.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""Run a world's rules with no interface, as fast as they'll go
+
+::
+
+    python -m LiSE.run world.db --install LiSE.examples.college \\
+        --turns 100 --commit-modulus 10 --profile college.prof
+
+Afterward, it says how many turns and rules it ran per second, how
+long each phase of the rules engine took, and the most memory the
+process used. ``--profile`` writes :mod:`cProfile` stats, for
+:mod:`pstats` to read; ``--sample`` writes stacks sampled every few
+milliseconds, one per line with how many times each was seen, which is
+the format flame graph tools take.
+
+"""
+import cProfile
+import sys
+import threading
+from argparse import ArgumentParser
+from collections import Counter, defaultdict
+from importlib import import_module
+from os.path import basename
+from time import perf_counter
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from .engine import Engine
+
+PHASES = ('triggers', 'prereqs', 'actions', 'flush', 'commit')
+
+
+class Sampler(object):
+    """Every ``interval`` seconds, note what the thread that started me
+    is doing
+
+    Use me as a context manager around the code to sample, then
+    :meth:`write` the stacks I saw.
+
+    """
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+
+    def __enter__(self):
+        self._target = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._stop.set()
+        self._thread.join()
+
+    def _sample(self):
+        stacks = self.stacks
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append('{}:{}'.format(
+                    basename(code.co_filename), code.co_name))
+                frame = frame.f_back
+            stacks[';'.join(reversed(stack))] += 1
+
+    def write(self, path):
+        with open(path, 'w') as outf:
+            for stack, n in self.stacks.most_common():
+                outf.write('{} {}\n'.format(stack, n))
+
+
+def peak_memory():
+    """Return the most memory this process has had, in bytes
+
+    Or ``None``, if I can't tell on this platform.
+
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux says kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def run(engine, turns):
+    """Run ``turns`` turns in ``engine``, and commit
+
+    Return a dictionary of statistics about it. ``phases`` is a
+    dictionary of ``[calls, seconds]`` for each of :data:`PHASES`.
+
+    """
+    times = engine._phase_times = defaultdict(lambda: [0, 0.])
+    start = perf_counter()
+    try:
+        for i in range(turns):
+            engine.next_turn()
+        engine.commit()
+    finally:
+        del engine._phase_times
+    elapsed = perf_counter() - start
+    rules = times['actions'][0]
+    return {
+        'turns': turns,
+        'seconds': elapsed,
+        'turns_per_second': turns / elapsed,
+        'rules_fired': rules,
+        'rules_per_second': rules / elapsed,
+        'phases': {phase: times[phase] for phase in PHASES},
+        'peak_memory': peak_memory()
+    }
+
+
+def report(stats, outf=sys.stdout):
+    """Print what :func:`run` returned"""
+    print(
+        "{turns} turns in {seconds:.2f}s: {turns_per_second:.2f} turns/s, "
+        "{rules_fired} rules fired, {rules_per_second:.1f} rules/s".format(
+            **stats), file=outf)
+    accounted = 0.
+    for phase in PHASES:
+        calls, seconds = stats['phases'][phase]
+        accounted += seconds
+        print("{:>10} {:10.3f}s {:6.1%} {:9} calls".format(
+            phase, seconds, seconds / stats['seconds'], calls), file=outf)
+    other = stats['seconds'] - accounted
+    print("{:>10} {:10.3f}s {:6.1%}".format(
+        'other', other, other / stats['seconds']), file=outf)
+    if stats['peak_memory'] is not None:
+        print("peak memory {:.1f} MiB".format(
+            stats['peak_memory'] / 2 ** 20), file=outf)
+
+
+def main(argv=None):
+    parser = ArgumentParser(
+        prog='python -m LiSE.run', description=__doc__.splitlines()[0])
+    parser.add_argument('world', help='path to the world database')
+    parser.add_argument('-n', '--turns', type=int, default=10)
+    parser.add_argument(
+        '--install', help="module whose install(engine) to call first")
+    parser.add_argument(
+        '--commit-modulus', type=int,
+        help="commit every this many turns, rather than only at the end")
+    parser.add_argument('--random-seed', type=int)
+    parser.add_argument(
+        '--storage-profile', choices=('durable', 'fast', 'bulk-load'))
+    profiling = parser.add_mutually_exclusive_group()
+    profiling.add_argument(
+        '--profile', metavar='FILE', help="write cProfile stats here")
+    profiling.add_argument(
+        '--sample', metavar='FILE', help="write sampled stacks here")
+    parser.add_argument(
+        '--sample-interval', type=float, default=0.005,
+        help="seconds between samples")
+    args = parser.parse_args(argv)
+    with Engine(
+            args.world,
+            commit_modulus=args.commit_modulus,
+            random_seed=args.random_seed,
+            storage_profile=args.storage_profile
+    ) as engine:
+        if args.install:
+            import_module(args.install).install(engine)
+            engine.commit()
+        if args.profile:
+            profiler = cProfile.Profile()
+            stats = profiler.runcall(run, engine, args.turns)
+            profiler.dump_stats(args.profile)
+        elif args.sample:
+            with Sampler(args.sample_interval) as sampler:
+                stats = run(engine, args.turns)
+            sampler.write(args.sample)
+        else:
+            stats = run(engine, args.turns)
+    report(stats)
+    return stats
+
+
+if __name__ == '__main__':
+    main()
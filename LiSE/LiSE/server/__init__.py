@@ -13,103 +13,821 @@
 #
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
-import cherrypy
-import threading
+"""Serve one engine to many clients at once, over asyncio streams
+
+Every message, both ways, is a four-byte big-endian length followed
+by that many bytes of msgpack. A request is a dictionary with the
+``command`` to run, an ``id`` of the client's choosing, and the
+command's keyword arguments. The reply is a dictionary with the same
+``id``, the ``branch``, ``turn``, and ``tick`` it's about, and either
+a ``result`` or an ``error``. Requests without an ``id`` get no reply.
+
+Commands that change the world are run one at a time by the engine,
+in the order they arrive, just like in :mod:`LiSE.proxy`. Those in
+:attr:`LiSEServer.readonly_commands` are answered right away from a
+:class:`View` of the world as it was at the last commit or new turn,
+however busy the engine is. The exception is a client that's changed
+the world since then: its reads go to the engine, after its writes,
+so that it sees its own changes. Each client has its own cursor for
+``get_char_deltas``, so it sees every change exactly once, no matter
+who else is polling.
+
+Better than polling, ``subscribe`` to have the changes to the
+characters you're interested in sent to you whenever a turn passes.
+These pushes are dictionaries of ``branch``, ``turn``, ``tick``, and
+``delta``, and have no ``id``. If you can't keep up, you won't get
+the turns you missed, but one delta covering all of them, as soon as
+you've caught up. :meth:`LiSEServer.start_sse` does the same for web
+browsers, with Server-Sent Events, and :meth:`LiSEServer.subscribe`
+for anything else you can send messages with, such as WebSockets.
+
+:class:`LiSEClient` speaks the protocol, if you're using asyncio
+yourself. :mod:`LiSE.server.loadtest` puts a server under load.
+
+"""
+import asyncio
+import json
 import logging
-from queue import Queue
-from ..handle import EngineHandle
+import os
+import shutil
+import struct
+import sys
+import tempfile
+from base64 import b64encode
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+from urllib.parse import parse_qs, urlsplit
 
+from allegedb.cache import HistoryError
+from ..character import FacadeState
+from ..handle import EngineHandle, dict_delta, set_delta
+from ..shared import SharedWorld, publish, _packer, _unpacker
 
-class LiSEHandleWebService(object):
-    exposed = True
+if sys.version_info < (3, 7):
+    try:
+        from .web import LiSEHandleWebService
+    except ImportError:  # no cherrypy
+        pass
+else:
+    def __getattr__(name):
+        # cherrypy is only needed for the old web service,
+        # so don't import it until somebody asks
+        if name == 'LiSEHandleWebService':
+            from .web import LiSEHandleWebService
+            return LiSEHandleWebService
+        raise AttributeError(
+            "module {!r} has no attribute {!r}".format(__name__, name))
 
-    def __init__(self, *args, **kwargs):
-        if 'logger' in kwargs:
-            self.logger = kwargs['logger']
-        else:
-            self.logger = kwargs['logger'] = logging.getLogger(__name__)
-        self.cmdq = kwargs['cmdq'] = Queue()
-        self.outq = kwargs['outq'] = Queue()
-        self._handle_thread = threading.Thread(
-            target=self._run_handle_forever, args=args, kwargs=kwargs,
-            daemon=True
-        )
-        self._handle_thread.start()
-
-    @staticmethod
-    def _run_handle_forever(*args, **kwargs):
-        cmdq = kwargs.pop('cmdq')
-        outq = kwargs.pop('outq')
-        logger = kwargs.pop('logger')
-        setup = kwargs.pop('setup', None)
-        logq = Queue()
-
-        def log(typ, data):
-            if typ == 'command':
-                (cmd, args) = data
-                logger.debug(
-                    "LiSE thread {}: calling {}{}".format(
-                        threading.get_ident(),
-                        cmd,
-                        tuple(args)
+_frame_len = struct.Struct('>I')
+_empty = FacadeState()
+# keys that nodes have in their facade state, but not their stats
+_not_stats = {'character', 'name', 'arrival_time', 'next_arrival_time'}
+
+
+async def read_frame(reader):
+    """Return the next message from ``reader``, still packed
+
+    Return ``None`` at the end of the stream.
+
+    """
+    try:
+        head = await reader.readexactly(_frame_len.size)
+        return await reader.readexactly(_frame_len.unpack(head)[0])
+    except asyncio.IncompleteReadError:
+        return None
+
+
+def frame(data):
+    """Prefix the packed message ``data`` with its length"""
+    return _frame_len.pack(len(data)) + data
+
+
+def columnar(delta):
+    """Rearrange a character's delta so that each stat is a column
+
+    ``nodes`` becomes a list of node names and a list of whether
+    they exist. ``edges`` becomes lists of origins, destinations, and
+    whether they exist. ``node_val`` and ``edge_val`` have a key for
+    each stat that changed: its value is like ``nodes`` or ``edges``,
+    but with the stat's new values in the last list.
+
+    Stats that change on many nodes at once come out much smaller.
+
+    """
+    ret = {
+        k: v for (k, v) in delta.items()
+        if k not in ('nodes', 'edges', 'node_val', 'edge_val')
+    }
+    if 'nodes' in delta:
+        ret['nodes'] = [list(delta['nodes']), list(delta['nodes'].values())]
+    if 'edges' in delta:
+        origs, dests, exists = ret['edges'] = [[], [], []]
+        for orig, ds in delta['edges'].items():
+            for dest, ex in ds.items():
+                origs.append(orig)
+                dests.append(dest)
+                exists.append(ex)
+    if 'node_val' in delta:
+        node_val = ret['node_val'] = {}
+        for node, stats in delta['node_val'].items():
+            for k, v in stats.items():
+                if k not in node_val:
+                    node_val[k] = [[], []]
+                nodes, vals = node_val[k]
+                nodes.append(node)
+                vals.append(v)
+    if 'edge_val' in delta:
+        edge_val = ret['edge_val'] = {}
+        for orig, ds in delta['edge_val'].items():
+            for dest, stats in ds.items():
+                for k, v in stats.items():
+                    if k not in edge_val:
+                        edge_val[k] = [[], [], []]
+                    origs, dests, vals = edge_val[k]
+                    origs.append(orig)
+                    dests.append(dest)
+                    vals.append(v)
+    return ret
+
+
+def jsonable(obj):
+    """Return ``obj`` in a form that JSON can take
+
+    JSON objects can only have strings for keys, so dictionaries with
+    any other keys, like the tuples that name nodes in a grid, become
+    lists of ``[key, value]`` pairs. Tuples and sets become lists.
+
+    """
+    if isinstance(obj, dict):
+        if all(isinstance(k, str) for k in obj):
+            return {k: jsonable(v) for (k, v) in obj.items()}
+        return [[jsonable(k), jsonable(v)] for (k, v) in obj.items()]
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return [jsonable(v) for v in obj]
+    return obj
+
+
+class CommandError(Exception):
+    """The server couldn't run a command
+
+    ``args`` are the name of the exception it got, and its message.
+
+    """
+
+
+class View(object):
+    """The world as it was at one time, for read-only commands
+
+    Methods are named after those of :class:`LiSE.handle.EngineHandle`
+    that they stand in for. ``gen`` counts how many views came before.
+
+    """
+    def __init__(self, path, gen):
+        self.gen = gen
+        self.world = world = SharedWorld(path)
+        self.btt = (world.branch, world.turn, world.tick)
+        self._deltas = {}
+        self._messages = {}
+
+    def close(self):
+        self.world.close()
+
+    def get_btt(self):
+        return self.btt
+
+    def characters(self):
+        return list(self.world.character)
+
+    def universal_copy(self):
+        return self.world.universal
+
+    def get_universal(self, k):
+        return self.world.universal[k]
+
+    def character_stat_copy(self, char):
+        return self.world.character[char].stat
+
+    def character_nodes(self, char):
+        state = self.world.character[char]
+        return frozenset(state.place).union(state.thing)
+
+    def node_stat_copy(self, char, node):
+        state = self.world.character[char]
+        stats = state.thing[node] if node in state.thing \
+            else state.place[node]
+        return {k: v for (k, v) in stats.items() if k not in _not_stats}
+
+    def character_nodes_stat_copy(self, char):
+        return {
+            node: self.node_stat_copy(char, node)
+            for node in self.character_nodes(char)
+        }
+
+    def get_thing_location(self, char, thing):
+        return self.world.character[char].thing[thing]['location']
+
+    def character_portals(self, char):
+        return {
+            (orig, dest)
+            for (orig, dests) in self.world.character[char].portal.items()
+            for dest in dests
+        }
+
+    def portal_stat_copy(self, char, orig, dest):
+        return self.world.character[char].portal[orig][dest]
+
+    def character_portals_stat_copy(self, char):
+        return self.world.character[char].portal
+
+    def character_copy(self, char):
+        ret = dict(self.character_stat_copy(char))
+        nv = self.character_nodes_stat_copy(char)
+        if nv:
+            ret['node_val'] = nv
+        ev = self.character_portals_stat_copy(char)
+        if ev:
+            ret['edge_val'] = ev
+        return ret
+
+    def character_delta(self, char, gen, old):
+        """Return changes to ``char`` since view number ``gen``
+
+        ``old`` is the character's :class:`FacadeState` in that view.
+        It's compared with mine only once: after that, everyone who
+        asks about the same character and view gets the same delta.
+
+        """
+        if (gen, char) in self._deltas:
+            return self._deltas[gen, char]
+        new = self.world.character[char]
+        ret = dict_delta(old.stat, new.stat)
+        oldnodes = old.place.keys() | old.thing.keys()
+        newnodes = new.place.keys() | new.thing.keys()
+        nodes = set_delta(oldnodes, newnodes)
+        if nodes:
+            ret['nodes'] = nodes
+        edges = {}
+        for (orig, dest), exists in set_delta(
+            ((o, d) for (o, dests) in old.portal.items() for d in dests),
+            ((o, d) for (o, dests) in new.portal.items() for d in dests)
+        ).items():
+            edges.setdefault(orig, {})[dest] = exists
+        if edges:
+            ret['edges'] = edges
+        node_val = {}
+        for node in newnodes:
+            then = old.thing.get(node) or old.place.get(node, {})
+            now = new.thing.get(node) or new.place[node]
+            delta = {
+                k: v for (k, v) in dict_delta(then, now).items()
+                if k not in _not_stats
+            }
+            if delta:
+                node_val[node] = delta
+        if node_val:
+            ret['node_val'] = node_val
+        edge_val = {}
+        for orig, dests in new.portal.items():
+            olddests = old.portal.get(orig, {})
+            for dest, now in dests.items():
+                delta = dict_delta(olddests.get(dest, {}), now)
+                if delta:
+                    edge_val.setdefault(orig, {})[dest] = delta
+        if edge_val:
+            ret['edge_val'] = edge_val
+        self._deltas[gen, char] = ret
+        return ret
+
+
+class Subscription(object):
+    """Where, and how, to send the changes to some characters
+
+    Made by :meth:`LiSEServer.subscribe`. ``sent`` is how many
+    messages have been sent; ``coalesced`` is how many views were left
+    out of them, because the last send hadn't finished.
+
+    """
+    def __init__(self, server, send, chars, columnar, encoding):
+        self.server = server
+        self.send = send
+        self.chars = chars if chars == 'all' else frozenset(chars)
+        self.columnar = columnar
+        self.encoding = encoding
+        self.cursor = {}
+        self.gen = None
+        self.sent = self.coalesced = 0
+        self.ready = asyncio.Event()
+        self.task = None
+
+    def characters(self, view):
+        """Return the names of the characters I want from ``view``"""
+        if self.chars == 'all':
+            return list(view.world.character)
+        return [
+            char for char in view.world.character if char in self.chars]
+
+    def cancel(self):
+        """Stop sending"""
+        self.server._subscriptions.discard(self)
+        if self.task is not None:
+            self.task.cancel()
+
+
+class LiSEServer(object):
+    """Run an engine, and let any number of clients use it at once
+
+    Positional and keyword arguments, besides those that follow, are
+    for the :class:`LiSE.Engine`. It's made, and used, in a thread of
+    its own.
+
+    ``publish`` is where to publish the world for read-only commands,
+    and for :class:`LiSE.shared.SharedWorld` in other processes, if
+    you like. By default it's in a temporary directory.
+
+    ``setup`` is a function to call with the engine, once it's made.
+
+    """
+    readonly_commands = frozenset({
+        'get_btt', 'characters', 'universal_copy', 'get_universal',
+        'character_copy', 'character_stat_copy', 'character_nodes',
+        'node_stat_copy', 'character_nodes_stat_copy', 'get_thing_location',
+        'character_portals', 'portal_stat_copy',
+        'character_portals_stat_copy', 'get_char_deltas'
+    })
+    # read-only commands that are always answered from the view
+    _view_commands = frozenset({'get_btt', 'get_char_deltas'})
+
+    def __init__(
+            self, *args, publish=None, setup=None, logger=None, **kwargs
+    ):
+        self.logger = logger or logging.getLogger(__name__)
+        self._args = args
+        self._kwargs = kwargs
+        self._setup = setup
+        self._tempdir = None
+        if publish is None:
+            self._tempdir = tempfile.mkdtemp()
+            publish = os.path.join(self._tempdir, 'world.shared')
+        self.publish = publish
+        self._executor = ThreadPoolExecutor(
+            1, thread_name_prefix='LiSE engine')
+        self._handle = self._server = self._sse_server = self.view = None
+        self._clients = set()
+        self._subscriptions = set()
+        self._encoders = {
+            'msgpack': lambda message: self._pack(message),
+            'json': lambda message: json.dumps(jsonable(message))
+        }
+
+    async def start(self, host='127.0.0.1', port=0):
+        """Start the engine, and listen for clients
+
+        Return the host and port I'm listening on.
+
+        """
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(self._executor, self._start_engine)
+        self._pack = self._handle.pack
+        self._unpack = _unpacker()
+        self.view = View(self.publish, 0)
+        self._server = await asyncio.start_server(
+            self._serve_client, host, port)
+        self.address = self._server.sockets[0].getsockname()[:2]
+        return self.address
+
+    def _start_engine(self):
+        self._handle = EngineHandle(self._args, self._kwargs)
+        if self._setup:
+            self._setup(self._handle._real)
+        self._publish()
+
+    def _publish(self):
+        real = self._handle._real
+        publish(real, self.publish)
+        self._published = real._btt()
+
+    async def start_sse(self, host='127.0.0.1', port=0):
+        """Send deltas to web browsers, as Server-Sent Events
+
+        They ``GET /deltas``. The query string may have any number of
+        ``chars`` to filter by, ``columnar=1``, ``full=1``, or
+        ``encoding=msgpack`` to get base64 encoded msgpack instead of
+        JSON. See :meth:`subscribe` for what those do.
+
+        Return the host and port I'm listening on for this.
+
+        """
+        self._sse_server = await asyncio.start_server(
+            self._serve_sse, host, port)
+        self.sse_address = self._sse_server.sockets[0].getsockname()[:2]
+        return self.sse_address
+
+    async def serve_forever(self):
+        """Wait until I'm closed"""
+        await self._server.wait_closed()
+
+    async def close(self):
+        """Disconnect everyone, and close the engine"""
+        for server in (self._server, self._sse_server):
+            if server is not None:
+                server.close()
+                await server.wait_closed()
+        for sub in list(self._subscriptions):
+            sub.cancel()
+        for writer in list(self._clients):
+            writer.close()
+        if self._handle is not None:
+            await asyncio.get_event_loop().run_in_executor(
+                self._executor, self._handle.close)
+        self._executor.shutdown()
+        if self.view is not None:
+            self.view.close()
+        if self._tempdir is not None:
+            shutil.rmtree(self._tempdir)
+
+    async def _serve_client(self, reader, writer):
+        self._clients.add(writer)
+        lock = asyncio.Lock()
+        cursor = {}
+        pending = set()
+        sub = None
+        # the generation of the view that's missing this client's changes
+        stale = None
+
+        async def write(reqid, cmd, inst):
+            nonlocal stale
+            if await self._write(writer, lock, reqid, cmd, inst) \
+                    and cmd not in self.readonly_commands:
+                stale = self.view.gen
+
+        async def send(message):
+            async with lock:
+                writer.write(frame(message))
+                await writer.drain()
+
+        def subscribe(chars='all', *, columnar=False, full=False):
+            nonlocal sub
+            unsubscribe()
+            sub = self.subscribe(send, chars, columnar=columnar, full=full)
+
+        def unsubscribe():
+            nonlocal sub
+            if sub is not None:
+                sub.cancel()
+                sub = None
+        try:
+            while True:
+                data = await read_frame(reader)
+                if data is None:
+                    break
+                try:
+                    inst = self._unpack(data)
+                    cmd = inst.pop('command')
+                except Exception:
+                    self.logger.warning("Malformed request, hanging up")
+                    break
+                reqid = inst.pop('id', None)
+                if cmd == 'subscribe':
+                    await self._reply(
+                        writer, lock, reqid, self.view.btt,
+                        lambda: subscribe(**inst)
                     )
-                )
-            else:
-                logger.debug(
-                    "LiSE thread {}: returning {} (of type {})".format(
-                        threading.get_ident(),
-                        data,
-                        repr(type(data))
+                elif cmd == 'unsubscribe':
+                    await self._reply(
+                        writer, lock, reqid, self.view.btt, unsubscribe)
+                elif cmd in self.readonly_commands and (
+                        cmd in self._view_commands
+                        or not (pending or stale == self.view.gen)):
+                    await self._reply(
+                        writer, lock, reqid, self.view.btt,
+                        self._read, cmd, cursor, inst
                     )
+                else:
+                    task = asyncio.ensure_future(write(reqid, cmd, inst))
+                    pending.add(task)
+                    task.add_done_callback(pending.discard)
+            if pending:
+                await asyncio.wait(pending)
+        finally:
+            unsubscribe()
+            self._clients.discard(writer)
+            writer.close()
+
+    async def _serve_sse(self, reader, writer):
+        self._clients.add(writer)
+        sub = None
+        try:
+            request = (await reader.readline()).decode('latin-1').split()
+            while (await reader.readline()).strip():
+                pass  # headers don't matter
+            url = urlsplit(request[1] if len(request) == 3 else '')
+            if request[:1] != ['GET'] or url.path != '/deltas':
+                writer.write(
+                    b'HTTP/1.1 404 Not Found\r\n'
+                    b'Content-Length: 0\r\nConnection: close\r\n\r\n')
+                return
+            query = parse_qs(url.query)
+            encoding = query.get('encoding', ['json'])[-1]
+
+            async def send(message):
+                if encoding == 'msgpack':
+                    message = b64encode(message).decode()
+                writer.write(
+                    'event: delta\ndata: {}\n\n'.format(message).encode())
+                await writer.drain()
+            try:
+                sub = self.subscribe(
+                    send, query.get('chars', 'all'),
+                    columnar=query.get('columnar', ['0'])[-1] == '1',
+                    encoding=encoding,
+                    full=query.get('full', ['0'])[-1] == '1'
                 )
+            except ValueError:
+                writer.write(
+                    b'HTTP/1.1 400 Bad Request\r\n'
+                    b'Content-Length: 0\r\nConnection: close\r\n\r\n')
+                return
+            writer.write(
+                b'HTTP/1.1 200 OK\r\n'
+                b'Content-Type: text/event-stream\r\n'
+                b'Cache-Control: no-cache\r\n\r\n')
+            # nothing more to read, but it'll tell me when they hang up
+            await reader.read()
+        except ConnectionError:
+            pass
+        finally:
+            if sub is not None:
+                sub.cancel()
+            self._clients.discard(writer)
+            writer.close()
+
+    def subscribe(
+            self, send, chars='all', *,
+            columnar=False, encoding='msgpack', full=False
+    ):
+        """Send the changes to some characters every time a turn passes
+
+        ``send`` is a coroutine function that takes one message, and
+        returns once it's sent. Messages are dictionaries of
+        ``branch``, ``turn``, ``tick``, and ``delta``, like the output
+        of ``get_char_deltas``, encoded with ``encoding``: either
+        ``'msgpack'``, giving bytes, or ``'json'``, giving a string.
+        In JSON, dictionaries that aren't keyed by strings are sent as
+        lists of ``[key, value]`` pairs; see :func:`jsonable`.
+
+        ``chars`` is a list of the names of the characters to send
+        changes to, or ``'all'``. With ``columnar=True``, each
+        character's delta is rearranged by :func:`columnar`.
+
+        While one message is being sent, turns may pass. Those turns
+        aren't sent separately. When ``send`` returns, the next
+        message will have all the changes since the last one.
+
+        Normally, the first message is the first change since now. With
+        ``full=True``, the first message is sent right away, with
+        everything about the characters. Return a
+        :class:`Subscription`; ``cancel`` it when you're done.
+
+        """
+        if encoding not in self._encoders:
+            raise ValueError("Unknown encoding: {}".format(encoding))
+        sub = Subscription(self, send, chars, columnar, encoding)
+        if full:
+            sub.ready.set()
+        else:
+            view = self.view
+            sub.gen = view.gen
+            for char in sub.characters(view):
+                sub.cursor[char] = (view.gen, view.world.character[char])
+        self._subscriptions.add(sub)
+        sub.task = asyncio.ensure_future(self._push(sub))
+        return sub
+
+    async def _push(self, sub):
+        while True:
+            await sub.ready.wait()
+            sub.ready.clear()
+            view = self.view
+            chars = sub.characters(view)
+            # everyone who's seen the same views gets the same message
+            key = (sub.columnar, sub.encoding, frozenset(
+                (char, sub.cursor.get(char, (None,))[0]) for char in chars
+            ))
+            deltas = self._get_char_deltas(sub.cursor, chars)
+            if key not in view._messages:
+                if sub.columnar:
+                    deltas = {
+                        char: columnar(delta)
+                        for (char, delta) in deltas.items()
+                    }
+                branch, turn, tick = view.btt
+                try:
+                    view._messages[key] = deltas and self._encoders[
+                        sub.encoding]({
+                            'branch': branch,
+                            'turn': turn,
+                            'tick': tick,
+                            'delta': deltas
+                        })
+                except (TypeError, ValueError) as ex:
+                    self.logger.error(
+                        "Can't encode delta as {}: {!r}".format(
+                            sub.encoding, ex))
+                    view._messages[key] = None
+            message = view._messages[key]
+            if sub.gen is not None:
+                sub.coalesced += view.gen - sub.gen - 1
+            sub.gen = view.gen
+            if not message:
+                continue
+            try:
+                await sub.send(message)
+            except ConnectionError:
+                sub.cancel()
+                return
+            sub.sent += 1
+
+    async def _reply(self, writer, lock, reqid, btt, fun, *args):
+        try:
+            result = fun(*args)
+        except Exception as ex:
+            self.logger.debug("{!r} failed: {!r}".format(fun, ex))
+            response = {'error': [type(ex).__name__, str(ex)]}
+        else:
+            response = {'result': result}
+        if reqid is None:
+            return
+        response['id'] = reqid
+        response['branch'], response['turn'], response['tick'] = btt
+        async with lock:
+            writer.write(frame(self._pack(response)))
+            await writer.drain()
+
+    def _read(self, cmd, cursor, kwargs):
+        if cmd == 'get_char_deltas':
+            return self._get_char_deltas(cursor, **kwargs)
+        return getattr(self.view, cmd)(**kwargs)
+
+    def _get_char_deltas(self, cursor, chars='all', *, store=True):
+        view = self.view
+        ret = {}
+        if chars == 'all':
+            chars = view.world.character
+        for char in chars:
+            gen, old = cursor.get(char, (None, _empty))
+            if gen == view.gen:
+                continue
+            delta = view.character_delta(char, gen, old)
+            if store:
+                cursor[char] = (view.gen, view.world.character[char])
+            if delta:
+                ret[char] = delta
+        return ret
+
+    async def _write(self, writer, lock, reqid, cmd, kwargs):
+        """Run a command in the engine, and reply with the result
+
+        Return whether the command ran, but my view doesn't show it.
+
+        """
+        loop = asyncio.get_event_loop()
+        try:
+            response, published = await loop.run_in_executor(
+                self._executor, self._run, reqid, cmd, kwargs)
+        except Exception as ex:
+            self.logger.debug("{} failed: {!r}".format(cmd, ex))
+            if reqid is None:
+                return False
+            ran = False
+            handle = self._handle
+            response = self._pack({
+                'id': reqid,
+                'branch': handle.branch,
+                'turn': handle.turn,
+                'tick': handle.tick,
+                'error': [type(ex).__name__, str(ex)]
+            })
+        else:
+            if published and published != self.view.btt:
+                self.view.close()
+                self.view = View(self.publish, self.view.gen + 1)
+                for sub in self._subscriptions:
+                    sub.ready.set()
+            ran = not published
+            if reqid is None:
+                return ran
+        async with lock:
+            writer.write(frame(response))
+            await writer.drain()
+        return ran
+
+    def _run(self, reqid, cmd, kwargs):
+        """Run a command in the engine's thread
 
-        def get_log_forever(logq):
-            (level, data) = logq.get()
-            getattr(logger, level)(data)
-
-        engine_handle = EngineHandle(args, kwargs, logq)
-        if setup:
-            setup(engine_handle._real)
-        handle_log_thread = threading.Thread(
-            target=get_log_forever, args=(logq,), daemon=True
-        )
-        handle_log_thread.start()
+        Return the packed response, and the time I published, if I did.
+
+        """
+        handle = self._handle
+        if cmd.startswith('_') or not hasattr(handle, cmd):
+            raise AttributeError("No such command: {}".format(cmd))
+        branching = kwargs.pop('branching', False)
+        if cmd == 'node_stat_copy' and 'char' in kwargs:
+            # clients call it char, as they would when reading the view
+            kwargs['node_or_char'] = kwargs.pop('char')
+        try:
+            result = getattr(handle, cmd)(**kwargs)
+        except HistoryError:
+            if not branching:
+                raise
+            handle.increment_branch()
+            result = getattr(handle, cmd)(**kwargs)
+        real = handle._real
+        branch, turn, tick = btt = real._btt()
+        # pack it now, because _after_ret may change it
+        response = handle.pack({
+            'id': reqid,
+            'branch': branch,
+            'turn': turn,
+            'tick': tick,
+            'result': result
+        })
+        if hasattr(handle, '_after_ret'):
+            handle._after_ret()
+            del handle._after_ret
+        published = None
+        if cmd == 'commit' or btt[:2] != self._published[:2]:
+            self._publish()
+            published = self._published
+        return response, published
+
+
+class LiSEClient(object):
+    """Talk to a :class:`LiSEServer` with asyncio
+
+    Any number of calls can be waiting at once. Their replies are
+    matched up by request ID.
+
+    """
+    def __init__(self):
+        self._pack = _packer()
+        self._unpack = _unpacker()
+        self._ids = count()
+        self._waiting = {}
+        self.branch = self.turn = self.tick = None
+        self.pushed = asyncio.Queue()
+        self.received = 0
+
+    async def connect(self, host, port):
+        self._reader, self._writer = await asyncio.open_connection(
+            host, port)
+        self._listener = asyncio.ensure_future(self._listen())
+        return self
+
+    async def _listen(self):
         while True:
-            inst = cmdq.get()
-            if inst == 'shutdown':
-                handle_log_thread.join()
-                cmdq.close()
-                outq.close()
-                return 0
-            cmd = inst.pop('command')
-            silent = inst.pop('silent', False)
-            log('command', (cmd, args))
-            response = getattr(engine_handle, cmd)(**inst)
-            if silent:
+            data = await read_frame(self._reader)
+            if data is None:
+                break
+            self.received += len(data)
+            response = self._unpack(data)
+            if 'id' not in response:
+                self.pushed.put_nowait(response)
                 continue
-            log('result', response)
-            outq.put(engine_handle._real.listify(response))
-
-    @cherrypy.tools.accept(media='application/json')
-    @cherrypy.tools.json_out()
-    def GET(self):
-        return cherrypy.session['LiSE_response']
-
-    @cherrypy.tools.json_out()
-    def POST(self, **kwargs):
-        silent = kwargs.get('silent', False)
-        self.cmdq.put(kwargs)
-        if silent:
-            return None
-        response = self.outq.get()
-        cherrypy.session['LiSE_response'] = response
-        return response
-
-    def PUT(self, silent=False, **kwargs):
-        silent = silent
-        self.cmdq.put(kwargs)
-        if not silent:
-            cherrypy.session['LiSE_response'] = self.outq.get()
-
-    def DELETE(self):
-        cherrypy.session.pop('LiSE_response', None)
+            fut = self._waiting.pop(response['id'])
+            if 'error' in response:
+                fut.set_exception(CommandError(*response['error']))
+            else:
+                self.branch = response['branch']
+                self.turn = response['turn']
+                self.tick = response['tick']
+                fut.set_result(response['result'])
+        for fut in self._waiting.values():
+            fut.set_exception(ConnectionError("Server hung up"))
+        self._waiting = {}
+
+    async def call(self, command, **kwargs):
+        """Run ``command`` on the server, and return its result"""
+        reqid = next(self._ids)
+        fut = self._waiting[reqid] = asyncio.get_event_loop().create_future()
+        kwargs['command'] = command
+        kwargs['id'] = reqid
+        self._writer.write(frame(self._pack(kwargs)))
+        return await fut
+
+    async def subscribe(self, chars='all', *, columnar=False, full=False):
+        """Have the server send me the changes to ``chars`` every turn
+
+        They go in the queue ``pushed``. See :meth:`LiSEServer.subscribe`.
+
+        """
+        await self.call(
+            'subscribe', chars=chars, columnar=columnar, full=full)
+
+    def send(self, command, **kwargs):
+        """Run ``command`` on the server, and don't wait for it"""
+        kwargs['command'] = command
+        self._writer.write(frame(self._pack(kwargs)))
+
+    async def close(self):
+        self._writer.close()
+        await self._listener
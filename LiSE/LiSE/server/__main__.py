@@ -13,22 +13,35 @@
 #
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
-import cherrypy
+import asyncio
+import logging
 from argparse import ArgumentParser
-from . import LiSEHandleWebService
+from importlib import import_module
+from . import LiSEServer
 
-parser = ArgumentParser()
-parser.add_argument('world', action='store', required=True)
-parser.add_argument('-c', '--code', action='store')
+parser = ArgumentParser(prog='python -m LiSE.server')
+parser.add_argument('world', help='path to the world database')
+parser.add_argument('--host', default='127.0.0.1')
+parser.add_argument('--port', type=int, default=8765)
+parser.add_argument(
+    '--publish', help='where to publish the world for read-only commands')
+parser.add_argument(
+    '--install', help="module whose install(engine) to call at startup")
 args = parser.parse_args()
-conf = {
-    '/': {
-        'request.dispatch': cherrypy.dispatch.MethodDispatcher(),
-        'tools.sessions.on': True,
-        'tools.response_headers.on': True,
-        'tools.response_headers.headers': [('Content-Type', 'application/json')],
-        'tools.encode.on': True,
-        'tools.encode.encoding': 'utf-8'
-    }
-}
-cherrypy.quickstart(LiSEHandleWebService(args.world, args.code), '/', conf)
+logging.basicConfig(level=logging.INFO)
+setup = import_module(args.install).install if args.install else None
+server = LiSEServer(args.world, publish=args.publish, setup=setup)
+
+
+async def main():
+    host, port = await server.start(args.host, args.port)
+    server.logger.info("Serving {} on {}:{}".format(args.world, host, port))
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+
+try:
+    asyncio.get_event_loop().run_until_complete(main())
+except KeyboardInterrupt:
+    pass
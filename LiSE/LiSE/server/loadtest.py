@@ -0,0 +1,196 @@
+# This file is part of LiSE, a framework for life simulation games.
+# Copyright (c) Zachary Spector, public@zacharyspector.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""See how a :class:`LiSE.server.LiSEServer` holds up with many clients
+
+One client runs ``next_turn`` over and over, while all the others poll
+``get_char_deltas`` as fast as they get answers::
+
+    python -m LiSE.server.loadtest world.db --clients 100 --turns 10
+
+Or, with ``--push``, they subscribe, and wait for the server to send
+them the deltas.
+
+"""
+import asyncio
+from argparse import ArgumentParser
+from importlib import import_module
+from time import monotonic, process_time
+
+from . import LiSEServer, LiSEClient
+
+
+async def poll(client, done, latencies):
+    """Call ``get_char_deltas`` until ``done`` is set
+
+    Record how long each call took in ``latencies``, and return how
+    many of them had any changes.
+
+    """
+    changed = 0
+    while not done.is_set():
+        start = monotonic()
+        if await client.call('get_char_deltas', chars='all'):
+            changed += 1
+        latencies.append(monotonic() - start)
+    return changed
+
+
+async def listen(client, done, started, latencies):
+    """Take pushed deltas until ``done`` is set
+
+    Record how long it's been since each turn ``started`` in
+    ``latencies``, and return how many deltas there were.
+
+    """
+    n = 0
+
+    def take(push):
+        nonlocal n
+        n += 1
+        if push['turn'] in started:
+            latencies.append(monotonic() - started[push['turn']])
+    finished = asyncio.ensure_future(done.wait())
+    while True:
+        get = asyncio.ensure_future(client.pushed.get())
+        await asyncio.wait(
+            [get, finished], return_when=asyncio.FIRST_COMPLETED)
+        if not get.done():
+            get.cancel()
+            break
+        take(get.result())
+    # anything pushed already will arrive before this reply
+    await client.call('get_btt')
+    while not client.pushed.empty():
+        take(client.pushed.get_nowait())
+    return n
+
+
+async def drive(client, turns, done, started=None, interval=0):
+    """Run ``turns`` turns, ``interval`` seconds apart, then set ``done``
+
+    If ``started`` is a dictionary, put the time each turn started in it.
+
+    """
+    try:
+        for i in range(turns):
+            if i and interval:
+                await asyncio.sleep(interval)
+            if started is not None:
+                started[client.turn + 1] = monotonic()
+            await client.call('next_turn')
+    finally:
+        done.set()
+
+
+async def load_test(server, clients=100, turns=10, push=False, interval=0):
+    """Put ``server``, already started, under load
+
+    Return a dictionary of statistics about how it went. Latencies
+    are how long polls took, or, with ``push=True``, how long it took
+    for a delta to arrive after its turn started.
+
+    """
+    host, port = server.address
+    pollers = [
+        await LiSEClient().connect(host, port) for i in range(clients)]
+    driver = await LiSEClient().connect(host, port)
+    await driver.call('get_btt')  # so it knows what turn it is
+    done = asyncio.Event()
+    latencies = []
+    start = monotonic()
+    cpu_start = process_time()
+    if push:
+        started = {}
+        for client in pollers:
+            await client.subscribe(full=True)
+        changed = await asyncio.gather(
+            drive(driver, turns, done, started, interval),
+            *(listen(client, done, started, latencies) for client in pollers)
+        )
+    else:
+        changed = await asyncio.gather(
+            drive(driver, turns, done, interval=interval),
+            *(poll(client, done, latencies) for client in pollers)
+        )
+    elapsed = monotonic() - start
+    cpu = process_time() - cpu_start
+    received = sum(client.received for client in pollers)
+    for client in pollers + [driver]:
+        await client.close()
+    latencies.sort()
+
+    def percentile(p):
+        if not latencies:
+            return float('nan')
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+    return {
+        'clients': clients,
+        'turns': turns,
+        'seconds': elapsed,
+        'cpu_seconds': cpu,
+        'bytes': received,
+        'polls': len(latencies),
+        'polls_per_second': len(latencies) / elapsed,
+        'polls_with_changes': sum(changed[1:]),
+        'p50': percentile(.5),
+        'p95': percentile(.95),
+        'p99': percentile(.99),
+        'max': percentile(1)
+    }
+
+
+async def main(
+        world, clients, turns, push=False, interval=0, install=None):
+    setup = import_module(install).install if install else None
+    server = LiSEServer(world, setup=setup)
+    await server.start()
+    try:
+        return await load_test(server, clients, turns, push, interval)
+    finally:
+        await server.close()
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(prog='python -m LiSE.server.loadtest')
+    parser.add_argument('world', help='path to the world database')
+    parser.add_argument('--clients', type=int, default=100)
+    parser.add_argument('--turns', type=int, default=10)
+    parser.add_argument(
+        '--interval', type=float, default=0,
+        help="seconds to wait between turns")
+    parser.add_argument(
+        '--push', action='store_true', help="subscribe instead of polling")
+    parser.add_argument(
+        '--install', help="module whose install(engine) to call first")
+    args = parser.parse_args()
+    stats = asyncio.get_event_loop().run_until_complete(main(
+        args.world, args.clients, args.turns, args.push, args.interval,
+        args.install))
+    if args.push:
+        print(
+            "{clients} clients got {polls_with_changes} deltas "
+            "while {turns} turns ran in {seconds:.2f}s".format(**stats))
+    else:
+        print(
+            "{clients} clients polled {polls} times in {seconds:.2f}s "
+            "({polls_per_second:.0f}/s) while {turns} turns ran; "
+            "{polls_with_changes} polls had changes".format(**stats))
+    print(
+        "{bytes} bytes received; {cpu_seconds:.2f}s of CPU time".format(
+            **stats))
+    print(
+        "latency: p50 {:.2f}ms, p95 {:.2f}ms, p99 {:.2f}ms, max {:.2f}ms"
+        .format(*(stats[k] * 1000 for k in ('p50', 'p95', 'p99', 'max'))))
@@ -0,0 +1,267 @@
+# This file is part of LiSE, a framework for life simulation games.
+# Copyright (c) Zachary Spector, public@zacharyspector.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""Let other processes read the world an engine has committed, without
+asking the engine.
+
+Start the engine with a path to publish to::
+
+    Engine('world.db', publish='world.shared')
+
+Every time it commits, it writes the state of every character, and the
+universal variables, to that file, replacing what was there all at
+once. Any number of processes can then read it::
+
+    world = SharedWorld('world.shared')
+    world.turn
+    world.character['physical'].place['home']['size']
+    world.facade('physical')  # to use networkx, or try changes
+
+The file is memory-mapped, so readers share its pages with one another
+through the operating system, and each character is only unpacked when
+it's first used. A reader keeps seeing the turn it opened until it
+calls :meth:`SharedWorld.refresh`, even if the engine publishes in the
+meantime.
+
+Changes still have to go through the engine. References to characters,
+places, things, and portals come back as their names: the character's
+name, or a tuple of it with the node's name, or with the portal's
+origin and destination.
+
+"""
+import mmap
+import os
+import struct
+from collections.abc import Mapping
+from functools import partial
+
+import msgpack
+
+from .character import FacadeState, Facade
+from .engine import (
+    MSGPACK_TUPLE,
+    MSGPACK_FROZENSET,
+    MSGPACK_SET,
+    MSGPACK_CHARACTER,
+    MSGPACK_PLACE,
+    MSGPACK_THING,
+    MSGPACK_PORTAL
+)
+
+MAGIC = b'LiSEpub1'
+_header_len = struct.Struct('<I')
+
+
+def _unwrapped(mapping):
+    # characters, places, things, and portals stay as they are,
+    # so that they're packed as references
+    return {
+        k: v.unwrap()
+        if hasattr(v, 'unwrap') and not hasattr(v, 'no_unwrap') else v
+        for (k, v) in mapping.items()
+    }
+
+
+def publish(engine, path):
+    """Write the state of ``engine``'s world, as it is now, to ``path``
+
+    The file at ``path`` is replaced all at once, so readers never see
+    half of it.
+
+    """
+    pack = engine.pack
+    blobs = []
+    characters = []
+    offset = 0
+    for name, char in engine.character.items():
+        state = char._facade_state()
+        blob = pack([
+            _unwrapped(char.stat), state.place, state.thing, state.portal])
+        characters.append([name, offset, len(blob)])
+        blobs.append(blob)
+        offset += len(blob)
+    universal = pack(_unwrapped(engine.universal))
+    blobs.append(universal)
+    branch, turn, tick = engine._btt()
+    header = pack({
+        'branch': branch,
+        'turn': turn,
+        'tick': tick,
+        'characters': characters,
+        'universal': [offset, len(universal)]
+    })
+    with open(path + '.tmp', 'wb') as outf:
+        outf.write(MAGIC)
+        outf.write(_header_len.pack(len(header)))
+        outf.write(header)
+        for blob in blobs:
+            outf.write(blob)
+    os.replace(path + '.tmp', path)
+
+
+def _packer():
+    handlers = {
+        tuple: lambda tup: msgpack.ExtType(MSGPACK_TUPLE, packer(list(tup))),
+        frozenset: lambda frozs: msgpack.ExtType(
+            MSGPACK_FROZENSET, packer(list(frozs))),
+        set: lambda s: msgpack.ExtType(MSGPACK_SET, packer(list(s)))
+    }
+
+    def pack_handler(obj):
+        if type(obj) in handlers:
+            return handlers[type(obj)](obj)
+        raise TypeError("Can't pack {}".format(type(obj)))
+    packer = partial(
+        msgpack.packb,
+        default=pack_handler, strict_types=True,
+        use_bin_type=True
+    )
+    return packer
+
+
+def _unpacker():
+    handlers = {
+        MSGPACK_TUPLE: lambda ext: tuple(unpacker(ext)),
+        MSGPACK_FROZENSET: lambda ext: frozenset(unpacker(ext)),
+        MSGPACK_SET: lambda ext: set(unpacker(ext)),
+        MSGPACK_CHARACTER: lambda ext: unpacker(ext),
+        MSGPACK_PLACE: lambda ext: tuple(unpacker(ext)),
+        MSGPACK_THING: lambda ext: tuple(unpacker(ext)),
+        MSGPACK_PORTAL: lambda ext: tuple(unpacker(ext))
+    }
+
+    def unpack_handler(code, data):
+        if code in handlers:
+            return handlers[code](data)
+        return msgpack.ExtType(code, data)
+    unpacker = partial(
+        msgpack.unpackb,
+        ext_hook=unpack_handler,
+        raw=False, strict_map_key=False
+    )
+    return unpacker
+
+
+class SharedCharacters(Mapping):
+    """The :class:`FacadeState` of each character in a :class:`SharedWorld`"""
+    def __init__(self, world):
+        self.world = world
+        self._states = {}
+
+    def __iter__(self):
+        return iter(self.world._index)
+
+    def __len__(self):
+        return len(self.world._index)
+
+    def __contains__(self, name):
+        return name in self.world._index
+
+    def __getitem__(self, name):
+        if name in self._states:
+            return self._states[name]
+        offset, length = self.world._index[name]
+        ret = self._states[name] = FacadeState(
+            *self.world._read(offset, length))
+        return ret
+
+
+class SharedWorld(object):
+    """Reader for the world that an engine published to ``path``
+
+    ``branch``, ``turn``, and ``tick`` are when it was published.
+    ``character`` maps names to :class:`FacadeState` objects.
+    ``universal`` is a dictionary of the universal variables.
+
+    Don't change any of these. For a character you can change, get a
+    :meth:`facade`.
+
+    """
+    def __init__(self, path):
+        self.path = path
+        self._unpack = _unpacker()
+        self._file = self._mm = None
+        self._open()
+
+    def _open(self):
+        inf = open(self.path, 'rb')
+        try:
+            mm = mmap.mmap(inf.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            inf.close()
+            raise ValueError("Empty file: {}".format(self.path))
+        if mm[:len(MAGIC)] != MAGIC:
+            mm.close()
+            inf.close()
+            raise ValueError(
+                "Not a published LiSE world: {}".format(self.path))
+        self.close()
+        self._file = inf
+        self._mm = mm
+        self._stat = os.fstat(inf.fileno())
+        (headerlen,) = _header_len.unpack_from(mm, len(MAGIC))
+        start = len(MAGIC) + _header_len.size
+        header = self._unpack(mm[start:start+headerlen])
+        self._data_start = start + headerlen
+        self.branch = header['branch']
+        self.turn = header['turn']
+        self.tick = header['tick']
+        self._index = {
+            name: (offset, length)
+            for (name, offset, length) in header['characters']
+        }
+        self.character = SharedCharacters(self)
+        self.universal = self._read(*header['universal'])
+
+    def _read(self, offset, length):
+        start = self._data_start + offset
+        return self._unpack(self._mm[start:start+length])
+
+    def refresh(self):
+        """Switch to the latest published world, if there's a new one
+
+        Return whether there was.
+
+        """
+        new = os.stat(self.path)
+        if (new.st_ino, new.st_mtime_ns, new.st_size) == (
+                self._stat.st_ino, self._stat.st_mtime_ns,
+                self._stat.st_size
+        ):
+            return False
+        self._open()
+        return True
+
+    def facade(self, name):
+        """Return a :class:`Facade` of the character ``name``
+
+        Changes to it stay in this process.
+
+        """
+        fac = Facade.__new__(Facade)
+        fac.__setstate__((self.character[name], {}, {}, {}, {}))
+        return fac
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._file.close()
+            self._mm = self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
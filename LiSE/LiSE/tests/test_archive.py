@@ -0,0 +1,40 @@
+import sqlite3
+
+from LiSE import Engine
+from LiSE.archive import Archive, archive
+
+
+def test_archive(clean, tmp_path):
+    dbpath = str(tmp_path / 'world.db')
+    arcpath = str(tmp_path / 'archive')
+    with Engine(dbpath) as eng:
+        char = eng.new_character('physical')
+        place = char.new_place('home')
+        cat = place.new_thing('cat')
+        for turn in range(10):
+            place['n'] = turn
+            cat['n'] = turn * 2
+            eng.next_turn()
+    counts = archive(dbpath, arcpath, before=5, turns_per_file=2)
+    assert counts['node_val'] == 10
+    conn = sqlite3.connect(dbpath)
+    assert conn.execute(
+        'SELECT MIN(turn) FROM node_val'
+    ).fetchone()[0] == 5
+    conn.close()
+    arc = Archive(arcpath)
+    assert arc.horizons['node_val'] == {'trunk': 5}
+    assert len(list(arc.iter_entries('node_val'))) == 3
+    assert {row[-3] for row in arc.rows('node_val', turn_from=3)} \
+        == {3, 4}
+    # archiving again with the same horizon doesn't change anything
+    assert archive(dbpath, arcpath, before=5)['node_val'] == 0
+    with Engine(dbpath, archive=arcpath) as eng:
+        place = eng.character['physical'].place['home']
+        cat = eng.character['physical'].thing['cat']
+        assert place['n'] == 9
+        eng.turn = 2
+        assert place['n'] == 2
+        assert cat['n'] == 4
+        assert cat.location == place
+        eng.turn = 10
@@ -243,4 +243,323 @@ def test_facade(character_updates):
     for o in character.edge:
         for d in character.edge[o]:
             end_edge.setdefault(o, {})[d] = dict(character.edge[o][d])
-    assert start_edge == end_edge
\ No newline at end of file
+    assert start_edge == end_edge
+
+
+def test_facade_copy(character_updates):
+    """Make sure facades are frozen in time, and copies are independent"""
+    import pickle
+    from LiSE.character import AbstractCharacter
+    character = character_updates[0]
+    character.add_place('here', things={'hat': ['feather']})
+    character.add_thing('cat', 'here', lives=9)
+    character.add_portal('here', 'there', length=2)
+    state = character._facade_state()
+    generic = AbstractCharacter._facade_state(character)
+    for attr in ('stat', 'place', 'thing', 'portal', 'preportal'):
+        assert getattr(state, attr) == getattr(generic, attr)
+    facade = character.facade()
+    assert character.facade()._state is facade._state
+    character.place['here']['things']['hat'].append('ribbon')
+    character.thing['cat']['lives'] = 8
+    assert facade.place['here']['things'] == {'hat': ['feather']}
+    assert facade.thing['cat']['lives'] == 9
+    facade.thing['cat']['lives'] = 7
+    facade.place['here']['things']['hat'].append('bow')
+    facade.portal['here']['there']['length'] = 3
+    assert state.place['here']['things'] == {'hat': ['feather']}
+    copy = facade.copy()
+    assert copy._state is facade._state
+    copy.thing['cat']['lives'] = 6
+    copy.place['here']['things']['hat'].append('pin')
+    del copy.portal['here']['there']
+    copy.add_place('elsewhere')
+    assert facade.thing['cat']['lives'] == 7
+    assert facade.place['here']['things'] == {'hat': ['feather', 'bow']}
+    assert facade.portal['here']['there']['length'] == 3
+    assert 'elsewhere' not in facade.place
+    assert copy.place['here']['things'] == {'hat': ['feather', 'bow', 'pin']}
+    assert 'there' not in copy.portal['here']
+    assert list(facade.preportal['there']) == ['here']
+    assert facade.preportal['there']['here']['length'] == 3
+    assert not list(copy.preportal['there'])
+    unpickled = pickle.loads(pickle.dumps(copy))
+    assert unpickled.character is None
+    assert unpickled.thing['cat']['lives'] == 6
+    assert unpickled.place['here']['things'] == {'hat': ['feather', 'bow', 'pin']}
+    assert 'elsewhere' in unpickled.place
+    assert 'there' not in unpickled.portal['here']
+    assert unpickled.stat == copy.stat
+    # unchanged entities aren't in the pickle
+    assert 'cat' in facade.thing._dump_patch()
+    assert not facade.place._dump_patch().keys() - {'here'}
+
+
+def _move_cat(dest, facade):
+    facade.thing['cat']['location'] = dest
+
+
+def _feed_cat(facade):
+    facade.thing['cat']['lives'] += 1
+
+
+def _cat_score(facade):
+    cat = facade.thing['cat']
+    return cat['lives'] + (cat['location'] == 'there')
+
+
+def _score_home(facade):
+    return len(facade.place['home']['dest'])
+
+
+def test_pickle_facade_with_entity_stat(character_updates):
+    """Make sure facades pickle when a stat refers to an entity"""
+    import pickle
+    character = character_updates[0]
+    home = character.new_place('home')
+    work = character.new_place('work')
+    port = home.one_way(work)
+    character.stat['home'] = home
+    home['dest'] = work
+    work['way'] = port
+    port['back'] = home
+    facade = pickle.loads(pickle.dumps(character.facade()))
+    name = character.name
+    # entities in the stats of those are references
+    assert facade.stat['home']['dest'] == (name, 'work')
+    assert facade.place['home']['dest']['way'] == (name, 'home', 'work')
+    assert facade.place['work']['way']['back'] == (name, 'home')
+    assert facade.portal['home']['work']['back']['dest'] == (name, 'work')
+    assert character.what_if([()], _score_home, processes=2) \
+        == [(len(work.unwrap()), ())]
+
+
+def test_what_if(character_updates):
+    """Make sure candidates are ranked without changing the character"""
+    from functools import partial
+    character = character_updates[0]
+    character.add_place('here')
+    character.add_place('there')
+    character.add_thing('cat', 'here', lives=1)
+    candidates = [
+        (),
+        (partial(_move_cat, 'there'),),
+        (_feed_cat, _feed_cat),
+        (_feed_cat, partial(_move_cat, 'there'))
+    ]
+    expected = [
+        (3, candidates[2]), (3, candidates[3]),
+        (2, candidates[1]), (1, candidates[0])
+    ]
+    assert character.what_if(candidates, _cat_score, processes=0) == expected
+    assert character.what_if(candidates, _cat_score, processes=2) == expected
+    assert character.thing['cat']['location'] == 'here'
+    assert character.thing['cat']['lives'] == 1
+
+
+def test_snapshot(character_updates):
+    """Make sure a snapshot matches the character and notices when it changes"""
+    character = character_updates[0]
+    snap = character.snapshot()
+    assert set(snap) == set(character.node)
+    assert set(snap.view.edges) == set(character.edges)
+    assert snap.is_current()
+    character.new_place('somewhere new')
+    assert not snap.is_current()
+    assert 'somewhere new' in character.snapshot()
+
+
+def test_cull(engy):
+    """Make sure culling removes just the nodes and portals past the threshold"""
+    import networkx as nx
+    char = engy.new_character('dirty', nx.grid_2d_graph(4, 4))
+    for (x, y), place in char.place.items():
+        place['dirt'] = x / 4
+        place['color'] = 'red' if y % 2 else 'blue'
+    char.place[0, 0].new_thing('lump', dirt=1.0)
+    for orig, dest in char.edges:
+        char.portal[orig][dest]['width'] = orig[1] + dest[1]
+    assert set(char.nodes_where('color', lambda c: c == 'red')) \
+        == {(x, y) for x in range(4) for y in (1, 3)}
+
+    def picky(v):
+        if v > 5:
+            return True
+        return False
+    assert set(char.portals_where('width', picky)) == {
+        (o, d) for (o, d) in char.edges if o[1] + d[1] > 5}
+    char.cull_portals('width', 1, 'lt')
+    assert all(char.portal[o][d]['width'] >= 1 for (o, d) in char.edges)
+    assert (1, 0) not in char.portal[0, 0]
+    assert (0, 1) in char.portal[0, 0]
+    char.cull_nodes('dirt')
+    assert set(char.node) == {(x, y) for x in range(2) for y in range(4)}
+    assert not any(x >= 2 for (x, y) in char.node)
+    assert 'lump' not in char.thing
+    assert (2, 0) not in char.portal[1, 0]
+
+
+def test_perlin(engy):
+    """Make sure the vectorized Perlin noise is the same as the plain one"""
+    from LiSE.util import (
+        perlin_noise, perlin_noise_array, PERLIN_PERMUTATION, numpy)
+    import random
+    p = list(PERLIN_PERMUTATION)
+    random.Random(0).shuffle(p)
+    p *= 2
+    rando = random.Random(1)
+    points = [
+        (rando.uniform(-300, 300), rando.uniform(-300, 300), rando.uniform(-3, 3))
+        for _ in range(500)] + [(x, y, 0.0) for x in range(5) for y in range(5)]
+    expected = [perlin_noise(p, x, y, z) for (x, y, z) in points]
+    if numpy is not None:
+        xs, ys, zs = zip(*points)
+        assert perlin_noise_array(p, xs, ys, zs).tolist() == expected
+    char = engy.new_character('noisy')
+    char.grid_2d_graph(4, 4)
+    char.add_place('elsewhere', x=1.5, y=2.5)
+    char.add_place('nowhere')
+    engy._rando.seed(0)
+    char.perlin()
+    engy._rando.seed(0)
+    p = list(PERLIN_PERMUTATION)
+    engy.shuffle(p)
+    p *= 2
+    for name, place in char.place.items():
+        if name == 'nowhere':
+            assert 'perlin' not in place
+        elif name == 'elsewhere':
+            assert place['perlin'] == perlin_noise(p, 1.5, 2.5, 0.0)
+        else:
+            assert place['perlin'] == perlin_noise(p, name[0], name[1], 0.0)
+
+
+def test_copy_from(clean):
+    """Make sure a bulk copy makes the same world as one made bit by bit"""
+    import networkx as nx
+    from LiSE.character import AbstractCharacter
+    g = nx.grid_2d_graph(3, 3)
+    for node in g:
+        g.nodes[node]['height'] = sum(node)
+    for u, v in g.edges:
+        g.edges[u, v]['weight'] = 2
+    d = nx.DiGraph([(0, 1), ((0, 1), 0)])
+    d.edges[0, 1]['one way'] = True
+
+    def dump(char):
+        def stats(ent):
+            return {k: v for (k, v) in ent.items()
+                    if k not in ('character', 'name', 'origin', 'destination')}
+        return (
+            {k: stats(v) for (k, v) in char.node.items()},
+            {(o, d): stats(char.portal[o][d]) for (o, d) in char.edges}
+        )
+    tempdir = tempfile.mkdtemp()
+    try:
+        dbpath = os.path.join(tempdir, 'world.db')
+        with Engine(dbpath) as eng:
+            slow = eng.new_character('slow')
+            slow.add_place((0, 0), height=99)
+            AbstractCharacter.copy_from(slow, g)
+            AbstractCharacter.copy_from(slow, d)
+            fast = eng.new_character('fast')
+            fast.add_place((0, 0), height=99)
+            fast.copy_from(g)
+            fast.copy_from(d)
+            assert dump(fast) == dump(slow)
+            assert fast.portal[(0, 1)][(0, 0, 0)]['is_mirror']
+            assert fast.portal[(0, 0, 0)][(0, 1)]['weight'] == 2
+            assert fast.portal[0][1]['one way']
+            snap = fast.snapshot()
+            fast.grid_2d_graph(2, 2)
+            assert not snap.is_current()
+            assert ((0, 0, 1), (0, 1, 1)) in fast.edges
+            fast.add_place('after')
+            expected_after = dump(fast)
+        with Engine(dbpath) as eng:
+            assert dump(eng.character['fast']) == expected_after
+            eng.turn = 0
+            eng.tick = eng._turn_end_plan[eng.branch, 0]
+            assert 'after' in eng.character['fast'].node
+    finally:
+        for f in os.listdir(tempdir):
+            os.remove(os.path.join(tempdir, f))
+        os.rmdir(tempdir)
+
+
+def test_add_from(engy):
+    """Make sure the batch methods make the same world as the single ones"""
+    from LiSE.exc import WorldIntegrityError
+    slow = engy.new_character('slow')
+    fast = engy.new_character('fast')
+    places = [0, (1, {'size': 2}), 'home']
+    things = [('cat', 'home'), ('hat', 'cat', {'size': 1}), (2, 0)]
+    portals = [(0, 1), (1, 'home', {'length': 3}), ('home', 'yard')]
+    for char in (slow, fast):
+        char.add_place(2)
+    slow.add_place(0, color='red')
+    slow.add_place(1, color='red', size=2)
+    slow.add_place('home', color='red')
+    for name, location, *stats in things:
+        slow.add_thing(name, location, **(stats[0] if stats else {}))
+    for orig, dest, *stats in portals:
+        slow.add_portal(orig, dest, symmetrical=True,
+                        **(stats[0] if stats else {}))
+    heard = []
+
+    def listen(sender, key, val):
+        heard.append((sender, key, val))
+    for mapping in (fast.place, fast.thing, fast.portal):
+        mapping.connect(listen)
+    fast.add_places_from(places, color='red')
+    fast.add_things_from(things)
+    fast.add_portals_from(portals, symmetrical=True)
+    assert [sender for (sender, key, val) in heard] \
+        == [fast.place, fast.thing, fast.place, fast.portal]
+    assert heard[-1][2][1, 'home'] == {'length': 3}
+
+    def dump(char):
+        def stats(ent):
+            return {k: v for (k, v) in ent.items() if k != 'character'}
+        return (
+            {k: stats(v) for (k, v) in char.place.items()},
+            {k: stats(v) for (k, v) in char.thing.items()},
+            {(o, d): stats(char.portal[o][d]) for (o, d) in char.edges}
+        )
+    assert dump(fast) == dump(slow)
+    assert fast.thing['hat'].location == fast.thing['cat']
+    assert [thing.name for thing in fast.place['home'].contents()] == ['cat']
+    assert fast.portal['home'][1]['is_mirror']
+    assert isinstance(fast.node[2], engy.thing_cls)
+    tick = engy.tick
+    with pytest.raises(WorldIntegrityError):
+        fast.add_things_from([('dog', 'home'), ('cat', 'yard')])
+    with pytest.raises(WorldIntegrityError):
+        fast.add_things_from([('dog', 'nowhere')])
+    assert engy.tick == tick
+    assert 'dog' not in fast.node
+
+
+def test_set_node_stat_column_none(engy):
+    """Make sure a ``None`` is refused before anything is written"""
+    char = engy.new_character('column')
+    char.add_places_from(['a', 'b', 'c'])
+    with pytest.raises(ValueError):
+        char.set_node_stat_column('height', ['a', 'b', 'c'], [1, None, 3])
+    assert 'height' not in char.place['a']
+    char.set_node_stat_column('height', ['a', 'b', 'c'], [1, 2, 3])
+    assert char.place['c']['height'] == 3
+
+
+def test_set_node_stat_column_mismatch(engy):
+    """Make sure bad columns are refused before anything is written"""
+    char = engy.new_character('column')
+    char.add_places_from(['a', 'b', 'c'])
+    with pytest.raises(ValueError):
+        char.set_node_stat_column('height', ['a', 'b', 'c'], [1, 2])
+    with pytest.raises(ValueError):
+        char.set_node_stat_column('height', ['a', 'b'], [1, 2, 3])
+    with pytest.raises(KeyError):
+        char.set_node_stat_column('height', ['a', 'nope'], [1, 2])
+    assert 'height' not in char.place['a']
+    assert 'nope' not in char.node
@@ -178,4 +178,75 @@ def test_portal_rule(engy):
     assert 'run' not in port
     engy.next_turn()
     assert btt == engy._btt()
-    assert port['run']
\ No newline at end of file
+    assert port['run']
+
+
+def test_shared_node_rulebook(engy):
+    """Test that nodes using another node's rulebook follow its rules"""
+    char = engy.new_character('char')
+    one = char.new_place('one')
+    two = char.new_place('two')
+    three = char.new_place('three')
+
+    @one.rule(always=True)
+    def yes(node):
+        node['run'] = True
+
+    two.rulebook = one.rulebook
+    engy.next_turn()
+    assert one['run']
+    assert two['run']
+    assert 'run' not in three
+
+
+def test_branch_inherits_handled_rules(engy):
+    """Test that branching partway through a turn doesn't rerun rules"""
+    char = engy.new_character('who')
+
+    @char.rule(always=True)
+    def count(char):
+        char.stat['count'] = char.stat.get('count', 0) + 1
+
+    engy.next_turn()
+    assert char.stat['count'] == 1
+    cache = engy._character_rules_handled_cache
+    branch, turn, tick = engy._btt()
+    rulebook = cache.get_rulebook('who', branch, turn, tick)
+    engy.branch = 'child'
+    assert 'count' in cache.retrieve('who', rulebook, 'child', turn)
+    assert not cache.unhandled_rulebook_rules('who', rulebook, 'child', turn, tick)
+    engy.next_turn()  # finishes the turn in the new branch
+    assert char.stat['count'] == 1
+
+
+def test_memoized_trigger(engy):
+    """Test that memoized triggers only run again when what they read changes"""
+    char = engy.new_character('char')
+    place = char.new_place('place')
+    place['hungry'] = False
+
+    @engy.rule
+    def eat(node):
+        node['ate'] = node.get('ate', 0) + 1
+
+    @engy.memoize_trigger
+    @eat.trigger
+    def hungry(node):
+        node.engine.hungry_checks = getattr(
+            node.engine, 'hungry_checks', 0) + 1
+        return node['hungry']
+
+    engy.rulebook['eaters'] = [eat]
+    place.rulebook = 'eaters'
+    engy.next_turn()
+    engy.next_turn()
+    engy.next_turn()
+    assert engy.hungry_checks == 1
+    assert 'ate' not in place
+    place['hungry'] = True
+    engy.next_turn()
+    assert engy.hungry_checks == 2
+    assert place['ate'] == 1
+    engy.next_turn()
+    assert engy.hungry_checks == 2
+    assert place['ate'] == 2
@@ -79,4 +79,31 @@ def test_user(someplace):
 def test_rulebook(someplace):
     assert someplace.rulebook.name == ('physical', 'someplace')
     someplace.rulebook = 'imadeitup'
-    assert someplace.rulebook.name == 'imadeitup'
\ No newline at end of file
+    assert someplace.rulebook.name == 'imadeitup'
+
+
+def test_get_raw(someplace):
+    someplace['inv'] = {'hat': 1}
+    someplace['hp'] = 5
+    thing = someplace.new_thing('cat', lives=[9])
+    there = someplace.character.new_place('there')
+    portal = someplace.character.new_portal(
+        'someplace', 'there', symmetrical=True, cost=2)
+    assert someplace.get_raw('inv') == someplace['inv'] == {'hat': 1}
+    with pytest.raises(TypeError):
+        someplace.get_raw('inv')['coat'] = 2
+    assert someplace.get_raw('hp') == 5
+    assert someplace.get_raw('name') == 'someplace'
+    assert someplace.get_raw('character') == 'physical'
+    assert thing.get_raw('location') == 'someplace'
+    assert thing.get_raw('lives') == (9,)
+    assert portal.get_raw('cost') == 2
+    assert portal.get_raw('destination') == 'there'
+    assert not portal.get_raw('is_mirror')
+    assert there.portal['someplace'].get_raw('cost') == 2
+    assert someplace.character.stat.get_raw('name') == 'physical'
+    with pytest.raises(KeyError):
+        someplace.get_raw('nothing')
+    # the wrapped value still writes through
+    someplace['inv']['coat'] = 2
+    assert someplace.get_raw('inv') == {'hat': 1, 'coat': 2}
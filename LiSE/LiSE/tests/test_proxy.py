@@ -67,6 +67,27 @@ class SetStorageTest(ProxyTest, allegedb.tests.test_all.SetStorageTest):
     pass
 
 
+class ProxyEntityTest(ProxyTest):
+    def test_slots_and_signal(self):
+        char = self.engine.new_character('physical')
+        char.add_place('here', hp=1)
+        char.add_thing('it', 'here')
+        char.add_portal('here', 'here')
+        here = char.place['here']
+        for proxy in (here, char.thing['it'], char.portal['here']['here']):
+            self.assertFalse(hasattr(proxy, '__dict__'))
+        got = []
+
+        def listen(sender, key, value):
+            got.append((key, value))
+        here.connect(listen)
+        here['hp'] = 2
+        self.assertEqual(got, [('hp', 2)])
+        here.disconnect(listen)
+        here['hp'] = 3
+        self.assertEqual(got, [('hp', 2)])
+
+
 @pytest.fixture(scope='function', params=[
     # lambda eng: kobold.inittest(eng, shrubberies=20, kobold_sprint_chance=.9),
     college.install,
@@ -0,0 +1,38 @@
+import pytest
+
+from allegedb import ReadOnlyError
+from LiSE import Engine
+
+
+def test_readonly(clean, tmp_path):
+    dbpath = str(tmp_path / 'world.db')
+    with Engine(dbpath) as eng:
+        char = eng.new_character('physical')
+        home = char.new_place('home')
+        work = char.new_place('work')
+        cat = home.new_thing('cat')
+        char.stat['day'] = 0
+        eng.next_turn()
+        cat.location = work
+        char.stat['day'] = 1
+        eng.next_turn()
+    eng = Engine(dbpath, readonly=True)
+    assert '_things_cache' in eng._lazy_caches
+    char = eng.character['physical']
+    assert char.stat['day'] == 1
+    assert char.thing['cat'].location.name == 'work'
+    assert '_things_cache' not in eng._lazy_caches
+    assert set(char.place['work'].content) == {'cat'}
+    eng.turn = 0
+    assert char.stat['day'] == 0
+    assert set(char.place['home'].content) == {'cat'}
+    with pytest.raises(ReadOnlyError):
+        char.stat['day'] = 2
+    with pytest.raises(ReadOnlyError):
+        eng.new_character('other')
+    with pytest.raises(ReadOnlyError):
+        eng.next_turn()
+    eng.close()
+    with Engine(dbpath) as eng:
+        assert eng.turn == 2
+        assert eng.character['physical'].stat['day'] == 1
@@ -0,0 +1,29 @@
+import os
+
+from LiSE import Engine
+from LiSE.run import main, run, PHASES
+
+
+def test_run(clean, tmp_path):
+    dbpath = str(tmp_path / 'world.db')
+    with Engine(dbpath, commit_modulus=2) as eng:
+        char = eng.new_character('physical')
+        char.stat['count'] = 0
+
+        @char.rule(always=True)
+        def count(char):
+            char.stat['count'] += 1
+        stats = run(eng, 4)
+        assert stats['turns'] == 4
+        assert stats['rules_fired'] == 4
+        assert set(stats['phases']) == set(PHASES)
+        # two by the commit modulus, one at the end
+        assert stats['phases']['commit'][0] == 3
+        assert eng._phase_times is None
+    proffile = str(tmp_path / 'run.prof')
+    stats = main([dbpath, '-n', '3', '--profile', proffile])
+    assert stats['rules_fired'] == 3
+    assert os.path.getsize(proffile)
+    with Engine(dbpath) as eng:
+        assert eng.turn == 7
+        assert eng.character['physical'].stat['count'] == 7
@@ -0,0 +1,238 @@
+import asyncio
+import json
+
+import pytest
+
+from LiSE.server import LiSEServer, LiSEClient, CommandError, columnar
+from LiSE.server.loadtest import load_test
+
+
+def make_world(eng):
+    char = eng.new_character('physical')
+    home = char.new_place('home')
+    home.two_way(char.new_place('work'), distance=3)
+    home.new_thing('cat', lives=9)
+    eng.new_character('other').new_place('elsewhere')
+
+
+def test_server(clean, tmp_path):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    async def run():
+        server = LiSEServer(str(tmp_path / 'world.db'), setup=make_world)
+        host, port = await server.start()
+        try:
+            alice = await LiSEClient().connect(host, port)
+            bob = await LiSEClient().connect(host, port)
+            delta = await alice.call('get_char_deltas', chars='all')
+            assert delta['physical']['nodes'] == {
+                'home': True, 'work': True, 'cat': True}
+            assert delta['physical']['node_val']['cat'] == {
+                'lives': 9, 'location': 'home'}
+            assert delta['physical']['edge_val']['home']['work'] \
+                == {'distance': 3}
+            # bob has his own cursor, so he gets everything too
+            assert await bob.call('get_char_deltas', chars='all') == delta
+            assert await alice.call('get_char_deltas', chars='all') == {}
+            # replies are matched up by ID, however they're interleaved
+            calls = [
+                alice.call(
+                    'set_node_stat', char='physical', node='cat',
+                    k='lives', v=8),
+                alice.call('get_thing_location', char='physical', thing='cat'),
+                alice.call('characters'),
+                alice.call('next_turn'),
+                bob.call('node_stat_copy', char='physical', node='work')
+            ]
+            results = await asyncio.gather(*calls)
+            assert results[1] == 'home'
+            assert results[2] == ['physical', 'other']
+            assert results[4] == {}
+            # the new turn is published as soon as it starts
+            assert await alice.call('get_btt') == (
+                alice.branch, 1, alice.tick)
+            assert await alice.call('get_char_deltas', chars='all') == {
+                'physical': {'node_val': {'cat': {'lives': 8}}}}
+            assert await bob.call('get_char_deltas', chars=['physical']) == {
+                'physical': {'node_val': {'cat': {'lives': 8}}}}
+            with pytest.raises(CommandError):
+                await bob.call('_real')
+            with pytest.raises(CommandError):
+                await bob.call('node_stat_copy', char='physical', node='nope')
+            await alice.close()
+            await bob.close()
+            stats = await load_test(server, clients=5, turns=2)
+            assert stats['polls'] >= 5
+            assert stats['polls_with_changes'] >= 5
+        finally:
+            await server.close()
+    try:
+        loop.run_until_complete(run())
+    finally:
+        loop.close()
+
+
+def test_push(clean, tmp_path):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    async def run():
+        server = LiSEServer(
+            str(tmp_path / 'world.db'), setup=make_world)
+        host, port = await server.start()
+        sse_host, sse_port = await server.start_sse()
+        try:
+            driver = await LiSEClient().connect(host, port)
+            listener = await LiSEClient().connect(host, port)
+            await listener.subscribe(['physical'], columnar=True)
+            reader, writer = await asyncio.open_connection(sse_host, sse_port)
+            writer.write(
+                b'GET /deltas?chars=physical HTTP/1.1\r\nHost: x\r\n\r\n')
+            assert (await reader.readline()).startswith(b'HTTP/1.1 200')
+            while (await reader.readline()).strip():
+                pass
+            sent = []
+            unblock = asyncio.Event()
+
+            async def slow_send(message):
+                sent.append(message)
+                await unblock.wait()
+            slow = server.subscribe(slow_send, encoding='json')
+            for lives in (8, 7, 6):
+                await driver.call(
+                    'set_node_stat', char='physical', node='cat',
+                    k='lives', v=lives)
+                await driver.call(
+                    'set_character_stat', char='other', k='lives', v=lives)
+                await driver.call('next_turn')
+            for lives in (8, 7, 6):
+                push = await listener.pushed.get()
+                assert push['turn'] == 9 - lives
+                assert push['delta'] == {'physical': {
+                    'node_val': {'lives': [['cat'], [lives]]}}}
+                assert await reader.readline() == b'event: delta\n'
+                data = await reader.readline()
+                assert data.startswith(b'data: ')
+                assert json.loads(data[6:].decode())['delta'] == {
+                    'physical': {'node_val': {'cat': {'lives': lives}}}}
+                assert await reader.readline() == b'\n'
+            # the slow one got the first turn, then waited
+            assert len(sent) == 1
+            unblock.set()
+            while len(sent) < 2:
+                await asyncio.sleep(0.01)
+            # the other two turns were coalesced into one message
+            coalesced = json.loads(sent[1])
+            assert coalesced['turn'] == 3
+            assert coalesced['delta'] == {
+                'physical': {'node_val': {'cat': {'lives': 6}}},
+                'other': {'lives': 6}
+            }
+            assert slow.sent == 2
+            assert slow.coalesced == 1
+            slow.cancel()
+            writer.close()
+            await listener.close()
+            await driver.close()
+            stats = await load_test(server, clients=5, turns=2, push=True)
+            assert stats['polls_with_changes'] >= 5
+        finally:
+            await server.close()
+    try:
+        loop.run_until_complete(run())
+    finally:
+        loop.close()
+
+
+def test_sse_tuple_names(clean, tmp_path):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    def make_grid(eng):
+        eng.new_character('grid').grid_2d_graph(2, 2)
+
+    async def run():
+        server = LiSEServer(str(tmp_path / 'world.db'), setup=make_grid)
+        host, port = await server.start()
+        sse_host, sse_port = await server.start_sse()
+        try:
+            driver = await LiSEClient().connect(host, port)
+            reader, writer = await asyncio.open_connection(sse_host, sse_port)
+            writer.write(b'GET /deltas?chars=grid HTTP/1.1\r\n\r\n')
+            assert (await reader.readline()).startswith(b'HTTP/1.1 200')
+            while (await reader.readline()).strip():
+                pass
+            await driver.call(
+                'set_node_stat', char='grid', node=(0, 1), k='height', v=5)
+            await driver.call('next_turn')
+            # nothing comes at all if the delta can't be encoded
+            assert await asyncio.wait_for(reader.readline(), 10) \
+                == b'event: delta\n'
+            data = await reader.readline()
+            assert json.loads(data[6:].decode())['delta'] == {
+                'grid': {'node_val': [[[0, 1], {'height': 5}]]}}
+            writer.close()
+            await driver.close()
+        finally:
+            await server.close()
+    try:
+        loop.run_until_complete(run())
+    finally:
+        loop.close()
+
+
+def test_read_own_writes(clean, tmp_path):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    async def run():
+        server = LiSEServer(str(tmp_path / 'world.db'), setup=make_world)
+        host, port = await server.start()
+        try:
+            alice = await LiSEClient().connect(host, port)
+            bob = await LiSEClient().connect(host, port)
+            await alice.call(
+                'set_node_stat', char='physical', node='work', k='open',
+                v=True)
+            assert await alice.call(
+                'node_stat_copy', char='physical', node='work'
+            ) == {'open': True}
+            # even if she doesn't wait for the write
+            alice.send(
+                'set_node_stat', char='physical', node='work', k='open',
+                v=False)
+            assert await alice.call(
+                'node_stat_copy', char='physical', node='work'
+            ) == {'open': False}
+            # bob still reads the view, which hasn't changed
+            assert await bob.call(
+                'node_stat_copy', char='physical', node='work') == {}
+            await alice.call('next_turn')
+            assert await bob.call(
+                'node_stat_copy', char='physical', node='work'
+            ) == {'open': False}
+            await alice.close()
+            await bob.close()
+        finally:
+            await server.close()
+    try:
+        loop.run_until_complete(run())
+    finally:
+        loop.close()
+
+
+def test_columnar():
+    assert columnar({
+        'stat': 1,
+        'nodes': {'a': True, 'b': False},
+        'edges': {'a': {'c': True}},
+        'node_val': {'a': {'x': 1, 'y': 2}, 'c': {'x': 3}},
+        'edge_val': {'a': {'c': {'w': 4}}}
+    }) == {
+        'stat': 1,
+        'nodes': [['a', 'b'], [True, False]],
+        'edges': [['a'], ['c'], [True]],
+        'node_val': {'x': [['a', 'c'], [1, 3]], 'y': [['a'], [2]]},
+        'edge_val': {'w': [['a'], ['c'], [4]]}
+    }
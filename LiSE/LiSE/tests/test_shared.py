@@ -0,0 +1,43 @@
+from LiSE import Engine
+from LiSE.shared import SharedWorld
+
+
+def test_shared(clean, tmp_path):
+    dbpath = str(tmp_path / 'world.db')
+    pubpath = str(tmp_path / 'world.shared')
+    with Engine(dbpath, publish=pubpath) as eng:
+        char = eng.new_character('physical')
+        home = char.new_place('home')
+        work = char.new_place('work')
+        home.two_way(work, distance=3)
+        cat = home.new_thing('cat', lives=9)
+        char.stat['favorite'] = work
+        eng.universal['pet'] = cat
+        eng.next_turn()
+        eng.commit()
+        world = SharedWorld(pubpath)
+        assert (world.branch, world.turn) == ('trunk', 1)
+        state = world.character['physical']
+        assert state.thing['cat']['location'] == 'home'
+        assert state.thing['cat']['lives'] == 9
+        assert state.portal['home']['work']['distance'] == 3
+        assert state.stat['favorite'] == ('physical', 'work')
+        assert world.universal['pet'] == ('physical', 'cat')
+        cat.location = work
+        eng.next_turn()
+        # nothing's committed yet
+        assert not world.refresh()
+        eng.commit()
+        # still the old turn until refreshed
+        assert world.turn == 1
+        assert state.thing['cat']['location'] == 'home'
+        assert world.refresh()
+        assert world.turn == 2
+        assert world.character['physical'].thing['cat']['location'] \
+            == 'work'
+        fac = world.facade('physical')
+        assert set(fac.node) == {'home', 'work', 'cat'}
+        assert fac.portal['work']['home']
+        fac.thing['cat']['lives'] = 8
+        assert world.character['physical'].thing['cat']['lives'] == 9
+        world.close()
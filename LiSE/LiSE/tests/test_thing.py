@@ -44,3 +44,32 @@ def test_travel(engy):
     engy.turn = 14
     assert thing1.location == phys.place[7, 7]
     assert thing2.location == phys.place[0, 7]
+
+
+def test_shortest_path_cache(engy):
+    import networkx as nx
+    phys = engy.new_character('physical', nx.grid_2d_graph(6, 6))
+    for orig, dest in phys.edges:
+        phys.portal[orig][dest]['cost'] = orig[0] + dest[1] + 1
+    phys.new_place('island')
+    pairs = [((0, 0), (5, 5)), ((0, 0), (3, 2)), ((4, 1), (5, 5)),
+             ((2, 5), (5, 5)), ((1, 1), (0, 4))] * 3
+    for weight in (None, 'cost'):
+        for orig, dest in pairs:
+            path = phys.place[orig].shortest_path(dest, weight)
+            assert path[0] == orig and path[-1] == dest
+            assert phys.place[orig].shortest_path_length(dest, weight) \
+                == nx.shortest_path_length(phys, orig, dest, weight)
+            assert sum(
+                phys.portal[a][b].get(weight, 1)
+                for (a, b) in zip(path, path[1:])
+            ) == nx.shortest_path_length(phys, orig, dest, weight)
+    assert not phys.place[0, 0].path_exists('island')
+    before = phys.place[0, 0].shortest_path_length((5, 5), 'cost')
+    for orig, dest in phys.edges:
+        phys.portal[orig][dest]['cost'] = 1
+    assert phys.place[0, 0].shortest_path_length((5, 5), 'cost') \
+        == 10 < before
+    phys.add_portal('island', (0, 0))
+    phys.add_portal((0, 0), 'island')
+    assert phys.place[5, 5].path_exists('island')
@@ -122,6 +122,12 @@ class Thing(Node):
         except KeyError:
             return super().__getitem__(key)
 
+    def get_raw(self, key):
+        try:
+            return self._getitem_dispatch[key](self)
+        except KeyError:
+            return super().get_raw(key)
+
     def __setitem__(self, key, value):
         """Set ``key``=``value`` for the present game-time."""
         try:
@@ -273,6 +279,9 @@ class Thing(Node):
         destn = dest.name if hasattr(dest, 'name') else dest
         if destn == self.location.name:
             raise ValueError("I'm already at {}".format(destn))
-        graph = self.character if graph is None else graph
-        path = nx.shortest_path(graph, self["location"], destn, weight)
+        if graph is None:
+            path = self.engine._shortest_path_cache.path(
+                self.character, self["location"], destn, weight)
+        else:
+            path = nx.shortest_path(graph, self["location"], destn, weight)
         return self.follow_path(path, weight)
\ No newline at end of file
@@ -0,0 +1,99 @@
+# This file is part of LiSE, a framework for life simulation games.
+# Copyright (c) Zachary Spector, public@zacharyspector.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""Try out possible futures of a character without touching the world.
+
+Each candidate is a sequence of actions, which are functions taking a
+:class:`LiSE.character.Facade`. They're run on a private copy of a
+facade of the character, which is then scored by a function you
+supply. The facade is pickled once per worker process, and each
+candidate gets a cheap :meth:`LiSE.character.Facade.copy` of it.
+
+Actions and the scoring function are run in other processes, so they
+need to be picklable, meaning defined at the top level of some module.
+Pass ``processes=0`` to run everything in this process instead, which
+lifts that restriction.
+
+The facades in worker processes aren't connected to any engine. They
+have all the character's stats, places, things, and portals, but
+nothing else.
+
+"""
+from concurrent.futures import ProcessPoolExecutor
+from os import cpu_count
+import pickle
+
+from .character import Facade
+
+_base_facade = None
+_score = None
+
+
+def _init_worker(facade, score):
+    global _base_facade, _score
+    if isinstance(facade, bytes):
+        facade = pickle.loads(facade)
+    _base_facade = facade
+    _score = score
+
+
+def _try_candidate(candidate):
+    facade = _base_facade.copy()
+    for action in candidate:
+        action(facade)
+    return _score(facade)
+
+
+def what_if(character, candidates, score, processes=None):
+    """Score what would happen to ``character`` after each of the
+    ``candidates``, best first
+
+    Returns a list of pairs of ``(score, candidate)``, sorted by score
+    from highest to lowest. Candidates with equal scores keep the order
+    you gave them in.
+
+    ``processes`` is how many worker processes to use, by default one
+    per CPU, or none at all if there's only one CPU. If it's ``0``,
+    everything runs in this process.
+
+    """
+    candidates = list(candidates)
+    if not candidates:
+        return []
+    base = Facade(character)
+    if processes is None:
+        processes = cpu_count() or 1
+        if processes == 1:
+            processes = 0
+    processes = min(processes, len(candidates))
+    if processes == 0:
+        _init_worker(base, score)
+        try:
+            scores = list(map(_try_candidate, candidates))
+        finally:
+            _init_worker(None, None)
+    else:
+        with ProcessPoolExecutor(
+                processes, initializer=_init_worker,
+                initargs=(pickle.dumps(base), score)
+        ) as pool:
+            scores = list(pool.map(
+                _try_candidate, candidates,
+                chunksize=max(1, len(candidates) // (processes * 4))
+            ))
+    ranked = sorted(
+        range(len(candidates)), key=scores.__getitem__, reverse=True
+    )
+    return [(scores[i], candidates[i]) for i in ranked]
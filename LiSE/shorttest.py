@@ -1,11 +1,11 @@
 from LiSE.examples.college import install
 from LiSE.engine import Engine
+from LiSE.run import run, report
 
 def test():
     eng = Engine(":memory:")
     install(eng)
-    for i in range(24):
-        eng.next_tick()
+    report(run(eng, 24))
 
 
 if __name__ == '__main__':
@@ -14,7 +14,9 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """The main interface to the allegedb ORM, and some supporting functions and classes"""
+from bisect import bisect_left
 from contextlib import ContextDecorator, contextmanager
+from itertools import chain
 from weakref import WeakValueDictionary
 
 from blinker import Signal
@@ -30,13 +32,17 @@ from .graph import (
     GraphsMapping
 )
 from .query import QueryEngine, TimeError
-from .window import HistoryError
+from .window import HistoryError, WindowDict
 
 
 class GraphNameError(KeyError):
     """For errors involving graphs' names"""
 
 
+class ReadOnlyError(ValueError):
+    """For attempts to change a world that was opened read-only"""
+
+
 class PlanningContext(ContextDecorator):
     """A context manager for 'hypothetical' edits.
 
@@ -75,7 +81,6 @@ class PlanningContext(ContextDecorator):
             orm._forward = False
         orm._plans[myid] = branch, turn, tick
         orm._plans_uncommitted.append((myid, branch, turn, tick))
-        orm._branches_plans[branch].add(myid)
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
@@ -197,6 +202,8 @@ class TimeSignalDescriptor:
             ):
                 branches[branch_now] = parent, turn_start, tick_start, turn_now, tick_now
         else:
+            if e._readonly:
+                raise ReadOnlyError("Can't make branches in read-only mode")
             tick_now = tick_then
             branches[branch_now] = (
                 branch_then, turn_now, tick_now, turn_now, tick_now
@@ -219,6 +226,31 @@ class TimeSignalDescriptor:
         )
 
 
+class LazyCache(object):
+    """Attribute for a cache that, in read-only mode, is only loaded from
+    the database when first used
+
+    The ORM keeps the cache and a function to load it in
+    ``_lazy_caches`` until then. After, the cache is in the instance's
+    ``__dict__``, which takes precedence over me, so there's no
+    overhead, and none at all when the ORM isn't read-only.
+
+    """
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, inst, cls):
+        if inst is None:
+            return self
+        try:
+            cache, load = inst._lazy_caches.pop(self.name)
+        except KeyError:
+            raise AttributeError(self.name)
+        inst.__dict__[self.name] = cache
+        load(cache)
+        return cache
+
+
 def setgraphval(delta, graph, key, val):
     """Change a delta to say that a graph stat was set to a certain value"""
     delta.setdefault(graph, {})[key] = val
@@ -285,6 +317,12 @@ class ORM(object):
     illegal_graph_names = ['global']
     illegal_node_names = ['nodes', 'node_val', 'edges', 'edge_val']
     time = TimeSignalDescriptor()
+    # only loaded when first used, in read-only mode
+    _graph_val_cache = LazyCache('_graph_val_cache')
+    _nodes_cache = LazyCache('_nodes_cache')
+    _edges_cache = LazyCache('_edges_cache')
+    _node_val_cache = LazyCache('_node_val_cache')
+    _edge_val_cache = LazyCache('_edge_val_cache')
 
     def _make_node(self, graph, node):
         return self.node_cls(graph, node)
@@ -354,8 +392,10 @@ class ORM(object):
         if self._no_kc:
             raise ValueError("Already in a batch")
         self._no_kc = True
-        yield
-        self._no_kc = False
+        try:
+            yield
+        finally:
+            self._no_kc = False
 
     def get_delta(self, branch, turn_from, tick_from, turn_to, tick_to):
         """Get a dictionary describing changes to all graphs.
@@ -368,6 +408,8 @@ class ORM(object):
 
         """
         from functools import partial
+        if self._readonly:
+            raise ReadOnlyError("Deltas aren't kept in read-only mode")
         if turn_from == turn_to:
             return self.get_turn_delta(branch, turn_from, tick_from, tick_to)
         delta = {}
@@ -421,6 +463,8 @@ class ORM(object):
         :arg tick_from: Starting tick; defaults to 0
 
         """
+        if self._readonly:
+            raise ReadOnlyError("Deltas aren't kept in read-only mode")
         branch = branch or self.branch
         turn = turn or self.turn
         tick_to = tick_to or self.tick
@@ -501,7 +545,7 @@ class ORM(object):
 
     def _init_caches(self):
         from collections import defaultdict
-        from .cache import Cache, NodesCache, EdgesCache
+        from .cache import Cache, NodesCache, EdgesCache, PickyDefaultDict
         self._where_cached = defaultdict(list)
         self._node_objs = node_objs = WeakValueDictionary()
         self._get_node_stuff = (node_objs, self._node_exists, self._make_node)
@@ -519,8 +563,10 @@ class ORM(object):
         """Tick on which a (branch, turn) ends, even if it hasn't been simulated"""
         self._graph_objs = {}
         self._plans = {}
-        self._branches_plans = defaultdict(set)
-        self._plan_ticks = defaultdict(lambda: defaultdict(list))
+        self._branches_plans = PickyDefaultDict(WindowDict)
+        """Plans with ticks in each turn of a branch"""
+        self._plan_ticks = PickyDefaultDict(WindowDict)
+        """Sorted lists of the ticks in each turn of a plan"""
         self._time_plan = {}
         self._plans_uncommitted = []
         self._plan_ticks_uncommitted = []
@@ -544,7 +590,12 @@ class ORM(object):
             dbstring,
             alchemy=True,
             connect_args={},
-            validate=False
+            validate=False,
+            storage_profile=None,
+            codec=None,
+            intern_keys=None,
+            archive=None,
+            readonly=False
     ):
         """Make a SQLAlchemy engine if possible, else a sqlite3 connection. In
         either case, begin a transaction.
@@ -556,11 +607,33 @@ class ORM(object):
         :arg connect_args: Dictionary of keyword arguments to be used for the database
         connection.
         :arg validate: Whether to perform an integrity test on the data.
+        :arg storage_profile: Name of a preset of SQLite settings, one of
+        ``'durable'``, ``'fast'``, or ``'bulk-load'``. See
+        :attr:`allegedb.query.QueryEngine.storage_profiles`.
+        :arg codec: How to store keys and values in the database, by
+        default ``'repr'``. See :mod:`allegedb.codec`. A database has to
+        be opened with the codec it was made with.
+        :arg intern_keys: Whether a new database should store the names of
+        graphs, nodes, and keys as integer IDs. This makes the database
+        smaller and quicker to load. Existing databases keep doing what they
+        did.
+        :arg archive: Somewhere to load old history from, in addition to the
+        database. See :class:`allegedb.query.QueryEngine`.
+        :arg readonly: Open a SQLite database file for reading only. It
+        starts up quickly, and many processes can read the same file at
+        once, as long as none writes to it. Caches are only loaded when
+        first used, and there are no plans or deltas. Trying to change
+        anything raises :class:`ReadOnlyError`.
 
         """
+        self._readonly = readonly
+        self._lazy_caches = {}
+        """In read-only mode, caches that haven't been loaded yet, with functions to load them"""
         self._planning = False
         self._forward = False
         self._no_kc = False
+        self._reads = None
+        """When this is a set, caches put ``(cache, entity)`` pairs in it as they're read"""
         # in case this is the first startup
         self._obranch = 'trunk'
         self._otick = self._oturn = 0
@@ -570,18 +643,21 @@ class ORM(object):
         if not hasattr(self, 'query'):
             self.query = self.query_engine_cls(
                 dbstring, connect_args, alchemy,
-                getattr(self, 'pack', None), getattr(self, 'unpack', None)
+                getattr(self, 'pack', None), getattr(self, 'unpack', None),
+                storage_profile=storage_profile, codec=codec,
+                intern_keys=intern_keys, archive=archive, readonly=readonly
             )
-        self._edge_val_cache.setdb = self.query.edge_val_set
-        self._edge_val_cache.deldb = self.query.edge_val_del_time
-        self._node_val_cache.setdb = self.query.node_val_set
-        self._node_val_cache.deldb = self.query.node_val_del_time
-        self._edges_cache.setdb = self.query.exist_edge
-        self._edges_cache.deldb = self.query.edges_del_time
-        self._nodes_cache.setdb = self.query.exist_node
-        self._nodes_cache.deldb = self.query.nodes_del_time
-        self._graph_val_cache.setdb = self.query.graph_val_set
-        self._graph_val_cache.deldb = self.query.graph_val_del_time
+        if not readonly:
+            self._edge_val_cache.setdb = self.query.edge_val_set
+            self._edge_val_cache.deldb = self.query.edge_val_del_time
+            self._node_val_cache.setdb = self.query.node_val_set
+            self._node_val_cache.deldb = self.query.node_val_del_time
+            self._edges_cache.setdb = self.query.exist_edge
+            self._edges_cache.deldb = self.query.edges_del_time
+            self._nodes_cache.setdb = self.query.exist_node
+            self._nodes_cache.deldb = self.query.nodes_del_time
+            self._graph_val_cache.setdb = self.query.graph_val_set
+            self._graph_val_cache.deldb = self.query.graph_val_del_time
         self.query.initdb()
         self._obranch = self.query.get_branch()
         self._oturn = self.query.get_turn()
@@ -594,8 +670,26 @@ class ORM(object):
             self._turn_end_plan[branch, turn] = plan_end_tick
         if 'trunk' not in self._branches:
             self._branches['trunk'] = None, 0, 0, 0, 0
-        self._load_graphs()
-        self._init_load(validate=validate)
+        if readonly:
+            # graph objects may keep references to caches, so defer
+            # loading those before making any
+            self._init_load(validate=validate)
+            self._load_graphs()
+        else:
+            self._load_graphs()
+            self._init_load(validate=validate)
+            self._index_planned()
+
+    def _load_cache(self, name, load):
+        """Call ``load`` on the cache I keep at the attribute ``name``
+
+        In read-only mode, wait until the cache is first used.
+
+        """
+        if self._readonly:
+            self._lazy_caches[name] = (self.__dict__.pop(name), load)
+        else:
+            load(getattr(self, name))
 
     def _upd_branch_parentage(self, parent, child):
         self._childbranch[parent].add(child)
@@ -607,35 +701,34 @@ class ORM(object):
     def _init_load(self, validate=False):
         if not hasattr(self, 'graph'):
             self.graph = GraphsMapping(self)
-        noderows = [
+        q = self.query
+        load = self._load_cache
+        load('_nodes_cache', lambda cache: cache.load([
             (graph, node, branch, turn, tick, ex if ex else None)
             for (graph, node, branch, turn, tick, ex)
-            in self.query.nodes_dump()
-        ]
-        self._nodes_cache.load(noderows)
-        edgerows = [
+            in q.nodes_dump()
+        ]))
+        load('_edges_cache', lambda cache: cache.load([
             (graph, orig, dest, idx, branch, turn, tick, ex if ex else None)
             for (graph, orig, dest, idx, branch, turn, tick, ex)
-            in self.query.edges_dump()
-        ]
-        self._edges_cache.load(edgerows)
-        self._graph_val_cache.load(self.query.graph_val_dump())
-        self._node_val_cache.load(self.query.node_val_dump())
-        self._edge_val_cache.load(self.query.edge_val_dump())
+            in q.edges_dump()
+        ]))
+        load('_graph_val_cache', lambda cache: cache.load(q.graph_val_dump()))
+        load('_node_val_cache', lambda cache: cache.load(q.node_val_dump()))
+        load('_edge_val_cache', lambda cache: cache.load(q.edge_val_dump()))
+        if self._readonly:
+            self._last_plan = -1
+            return
         last_plan = -1
         plans = self._plans
-        branches_plans = self._branches_plans
         for plan, branch, turn, tick in self.query.plans_dump():
             plans[plan] = branch, turn, tick
-            branches_plans[branch].add(plan)
             if plan > last_plan:
                 last_plan = plan
         self._last_plan = last_plan
-        plan_ticks = self._plan_ticks
-        time_plan = self._time_plan
+        add_plan_tick = self._add_plan_tick
         for plan, turn, tick in self.query.plan_ticks_dump():
-            plan_ticks[plan][turn].append(tick)
-            time_plan[plans[plan][0], turn, tick] = plan
+            add_plan_tick(plan, plans[plan][0], turn, tick)
 
     def __enter__(self):
         """Enable the use of the ``with`` keyword"""
@@ -688,6 +781,8 @@ class ORM(object):
                     )
                 )
         branch_is_new = v not in self._branches
+        if branch_is_new and self._readonly:
+            raise ReadOnlyError("Can't make branches in read-only mode")
         if branch_is_new:
             # assumes the present turn in the parent branch has
             # been finalized.
@@ -700,31 +795,83 @@ class ORM(object):
         if branch_is_new:
             self._copy_plans(curbranch, curturn, curtick)
 
+    def _add_plan_tick(self, plan, branch, turn, tick):
+        """Record that the plan changes something at the given time"""
+        plan_ticks = self._plan_ticks[plan]
+        if turn in plan_ticks:
+            ticks = plan_ticks[turn]
+            if not ticks or tick > ticks[-1]:
+                ticks.append(tick)
+            else:
+                ticks.insert(bisect_left(ticks, tick), tick)
+        else:
+            plan_ticks[turn] = [tick]
+        branch_plans = self._branches_plans[branch]
+        if turn in branch_plans:
+            branch_plans[turn].add(plan)
+        else:
+            branch_plans[turn] = {plan}
+        self._time_plan[branch, turn, tick] = plan
+
+    def _index_planned(self):
+        """Tell the caches which of their keys have plans for the future"""
+        where_cached = self._where_cached
+        for branch, turn, tick in self._time_plan:
+            if (branch, turn, tick) not in where_cached:
+                continue
+            for cache in where_cached[branch, turn, tick]:
+                parent, entity, key = cache.time_entity[branch, turn, tick]
+                cache.planned[branch][parent + (entity, key)].add((turn, tick))
+
+    def _iter_plan_ticks_after(self, plan, turn, tick):
+        """Iterate over ``(turn, tick)`` in the plan at or after the given time"""
+        plan_ticks = self._plan_ticks[plan]
+        if not plan_ticks:
+            return
+        todo = []
+        if turn in plan_ticks:
+            ticks = plan_ticks[turn]
+            todo.extend((turn, tck) for tck in ticks[bisect_left(ticks, tick):])
+        for trn, ticks in plan_ticks.future(turn).items():
+            todo.extend((trn, tck) for tck in ticks)
+        yield from todo
+
+    def _iter_branch_plans_after(self, branch, turn):
+        """Iterate over IDs of plans with ticks in or after the turn, in order"""
+        branch_plans = self._branches_plans[branch]
+        if not branch_plans:
+            return
+        plan_ids = set()
+        if turn in branch_plans:
+            plan_ids.update(branch_plans[turn])
+        for turn_plan_ids in branch_plans.future(turn).values():
+            plan_ids.update(turn_plan_ids)
+        yield from sorted(plan_ids)
+
     def _copy_plans(self, branch_from, turn_from, tick_from):
         """Collect all plans that are active at the given time and copy them to the current branch"""
-        plan_ticks = self._plan_ticks
         plan_ticks_uncommitted = self._plan_ticks_uncommitted
-        time_plan = self._time_plan
+        plans_uncommitted = self._plans_uncommitted
         plans = self._plans
         branch = self.branch
         where_cached = self._where_cached
-        last_plan = self._last_plan
         turn_end_plan = self._turn_end_plan
-        for plan_id in self._branches_plans[branch_from]:
-            _, start_turn, start_tick = plans[plan_id]
-            if start_turn > turn_from or (start_turn == turn_from and start_tick > tick_from):
-                continue
-            incremented = False
-            for turn, ticks in list(plan_ticks[plan_id].items()):
-                if turn < turn_from:
+        add_plan_tick = self._add_plan_tick
+        iter_plan_ticks_after = self._iter_plan_ticks_after
+        # the new branch has no keycache yet, so don't bother updating it
+        no_kc = self._no_kc
+        self._no_kc = True
+        try:
+            for plan_id in list(self._iter_branch_plans_after(branch_from, turn_from)):
+                _, start_turn, start_tick = plans[plan_id]
+                if start_turn > turn_from or (start_turn == turn_from and start_tick > tick_from):
                     continue
-                for tick in ticks:
-                    if turn == turn_from and tick < tick_from:
-                        continue
-                    if not incremented:
-                        self._last_plan = last_plan = last_plan + 1
-                        incremented = True
+                last_plan = None
+                for turn, tick in list(iter_plan_ticks_after(plan_id, turn_from, tick_from)):
+                    if last_plan is None:
+                        self._last_plan = last_plan = self._last_plan + 1
                         plans[last_plan] = branch, turn, tick
+                        plans_uncommitted.append((last_plan, branch, turn, tick))
                     for cache in where_cached[branch_from, turn, tick]:
                         data = cache.settings[branch_from][turn][tick]
                         value = data[-1]
@@ -733,10 +880,11 @@ class ORM(object):
                         if hasattr(cache, 'setdb'):
                             cache.setdb(*args)
                         cache.store(*args, planning=True)
-                        plan_ticks[last_plan][turn].append(tick)
-                        plan_ticks_uncommitted.append((last_plan, turn, tick))
-                        time_plan[branch, turn, tick] = last_plan
-                        turn_end_plan[branch, turn] = tick
+                    add_plan_tick(last_plan, branch, turn, tick)
+                    plan_ticks_uncommitted.append((last_plan, turn, tick))
+                    turn_end_plan[branch, turn] = tick
+        finally:
+            self._no_kc = no_kc
 
     def delete_plan(self, plan):
         """Delete the portion of a plan that has yet to occur.
@@ -745,15 +893,11 @@ class ORM(object):
 
         """
         branch, turn, tick = self._btt()
-        to_delete = []
+        to_delete = list(self._iter_plan_ticks_after(plan, turn, tick))
+        if not to_delete:
+            return
         plan_ticks = self._plan_ticks[plan]
-        for trn, tcks in plan_ticks.items():  # might improve performance to use a WindowDict for plan_ticks
-            if turn == trn:
-                for tck in tcks:
-                    if tck >= tick:
-                        to_delete.append((trn, tck))
-            elif trn > turn:
-                to_delete.extend((trn, tck) for tck in tcks)
+        branch_plans = self._branches_plans[branch]
         # Delete stuff that happened at contradicted times, and then delete the times from the plan
         where_cached = self._where_cached
         time_plan = self._time_plan
@@ -763,9 +907,15 @@ class ORM(object):
                 if hasattr(cache, 'deldb'):
                     cache.deldb(branch, trn, tck)
             del where_cached[branch, trn, tck]
-            plan_ticks[trn].remove(tck)
-            if not plan_ticks[trn]:
+            ticks = plan_ticks[trn]
+            ticks.remove(tck)
+            if not ticks:
                 del plan_ticks[trn]
+                if trn in branch_plans:
+                    turn_plans = branch_plans[trn]
+                    turn_plans.discard(plan)
+                    if not turn_plans:
+                        del branch_plans[trn]
             del time_plan[branch, trn, tck]
 
     # easier to override things this way
@@ -855,6 +1005,8 @@ class ORM(object):
 
         """
         from .cache import HistoryError
+        if self._readonly:
+            raise ReadOnlyError("Can't change anything in read-only mode")
         branch, turn, tick = self._btt()
         tick += 1
         if (branch, turn) in self._turn_end_plan:
@@ -877,13 +1029,13 @@ class ORM(object):
                 "You're in the past. Go to turn {}, tick {} to change things".format(turn_end, tick_end)
             )
         if self._planning:
-            if (turn, tick) in self._plan_ticks[self._last_plan]:
+            plan_ticks = self._plan_ticks[self._last_plan]
+            if turn in plan_ticks and tick in plan_ticks[turn]:
                 raise HistoryError(
                     "Trying to make a plan at {}, but that time already happened".format((branch, turn, tick))
                 )
-            self._plan_ticks[self._last_plan][turn].append(tick)
+            self._add_plan_tick(self._last_plan, branch, turn, tick)
             self._plan_ticks_uncommitted.append((self._last_plan, turn, tick))
-            self._time_plan[branch, turn, tick] = self._last_plan
         self._otick = tick
         return branch, turn, tick
 
@@ -892,7 +1044,11 @@ class ORM(object):
 
         Also saves the current branch, turn, and tick.
 
+        Does nothing in read-only mode.
+
         """
+        if self._readonly:
+            return
         self.query.globl['branch'] = self._obranch
         self.query.globl['turn'] = self._oturn
         self.query.globl['tick'] = self._otick
@@ -917,6 +1073,8 @@ class ORM(object):
         self.query.close()
 
     def _init_graph(self, name, type_s='Graph'):
+        if self._readonly:
+            raise ReadOnlyError("Can't make graphs in read-only mode")
         if self.query.have_graph(name):
             raise GraphNameError("Already have a graph by that name")
         if name in self.illegal_graph_names:
@@ -1006,6 +1164,8 @@ class ORM(object):
         :arg name: name of an existing graph
 
         """
+        if self._readonly:
+            raise ReadOnlyError("Can't delete graphs in read-only mode")
         # make sure the graph exists before deleting anything
         self.get_graph(name)
         self.query.del_graph(name)
@@ -1100,3 +1260,89 @@ class ORM(object):
         self._edges_cache.store(
             character, orig, dest, idx, branch, turn, tick, exist
         )
+
+    def _claim_ticks(self, n):
+        """Claim the next ``n`` ticks, as if by calling :meth:`_nbtt` that
+        many times
+
+        Return the branch, turn, and the first of the ticks. The branch
+        and turn end on the last of them, as though it's already been
+        written. Not available while planning.
+
+        """
+        if self._planning:
+            raise ValueError("Can't claim ticks in bulk while planning")
+        branch, turn, tick = self._nbtt()
+        end = tick + n - 1
+        self._turn_end_plan[branch, turn] = self._otick = end
+        parent, turn_start, tick_start, _, _ = self._branches[branch]
+        self._branches[branch] = parent, turn_start, tick_start, turn, end
+        self._turn_end[branch, turn] = end
+        return branch, turn, tick
+
+    def _bulk_import(self, graph, nodes=(), edges=()):
+        """Create lots of nodes and edges in ``graph`` at once, with their stats
+
+        ``nodes`` is an iterable of pairs of a node and a dictionary of
+        its stats. ``edges`` is an iterable of triples of an origin, a
+        destination, and a dictionary of the edge's stats. The nodes at
+        either end of each edge need to exist already, or be in ``nodes``.
+
+        Every write gets its own tick, same as if you'd made them one by
+        one, but the ticks are claimed all at once, the caches are filled
+        without maintaining their keycaches or sending a signal for each
+        write, and the database gets one insert per table.
+
+        Not available while planning.
+
+        """
+        nodes = list(nodes)
+        edges = list(edges)
+        n = len(nodes) + len(edges)
+        for stats in chain(
+                (stats for (_, stats) in nodes),
+                (stats for (_, _, stats) in edges)
+        ):
+            if any(v is None for v in stats.values()):
+                raise ValueError(
+                    "allegedb uses None to indicate that a key's been deleted"
+                )
+            n += len(stats)
+        if not n:
+            return
+        branch, turn, tick = self._claim_ticks(n)
+        end = tick + n - 1
+        node_rows = []
+        node_val_rows = []
+        edge_rows = []
+        edge_val_rows = []
+        for node, stats in nodes:
+            node_rows.append((graph, node, branch, turn, tick, True))
+            tick += 1
+            for key, value in stats.items():
+                node_val_rows.append(
+                    (graph, node, key, branch, turn, tick, value))
+                tick += 1
+        for orig, dest, stats in edges:
+            edge_rows.append((graph, orig, dest, 0, branch, turn, tick, True))
+            tick += 1
+            for key, value in stats.items():
+                edge_val_rows.append(
+                    (graph, orig, dest, 0, key, branch, turn, tick, value))
+                tick += 1
+        assert tick == end + 1
+        for cache, rows in (
+                (self._nodes_cache, node_rows),
+                (self._node_val_cache, node_val_rows),
+                (self._edges_cache, edge_rows),
+                (self._edge_val_cache, edge_val_rows)
+        ):
+            if not rows:
+                continue
+            store = cache._store
+            for row in rows:
+                store(*row, planning=False, loading=True)
+            cache.send(cache, branch=branch, turn=turn, tick=end,
+                       action='load')
+        self.query.bulk_insert(node_rows, node_val_rows, edge_rows,
+                               edge_val_rows)
@@ -35,8 +35,10 @@ from sqlalchemy import (
     MetaData,
     ForeignKey,
     select,
+    exists,
     func,
 )
+from sqlalchemy.sql.ddl import CreateTable
 
 
 BaseColumn = Column
@@ -161,6 +163,11 @@ def tables_for_meta(meta):
         Column('turn', INT),
         Column('tick', INT)
     )
+    Table(
+        'interned', meta,
+        Column('id', INT, primary_key=True),
+        Column('packed', TEXT)
+    )
     Table(
         'plan_ticks', meta,
         Column('plan_id', INT, primary_key=True),
@@ -175,7 +182,23 @@ def tables_for_meta(meta):
 
 
 def indices_for_table_dict(table):
-    return {}
+    """Return a dictionary of ``Index`` on the time columns of the tables
+    that have them, keyed by table name
+
+    Each index is named after its table, with ``_time`` on the end.
+
+    Tables whose primary key already starts with the time don't get one.
+    Nor do those with no time columns at all.
+
+    """
+    r = {}
+    for (name, t) in table.items():
+        if not {'branch', 'turn', 'tick'}.issubset(t.c.keys()):
+            continue
+        if [c.name for c in t.primary_key][:3] == ['branch', 'turn', 'tick']:
+            continue
+        r[name] = Index(name + '_time', t.c.branch, t.c.turn, t.c.tick)
+    return r
 
 
 def queries_for_table_dict(table):
@@ -320,9 +343,68 @@ def queries_for_table_dict(table):
         r[t.name + '_insert'] = t.insert().values(tuple(bindparam(cname) for cname in t.c.keys()))
         r[t.name + '_count'] = select([func.COUNT()]).select_from(t)
         r[t.name + '_del'] = t.delete().where(and_(*[c == bindparam(c.name) for c in t.primary_key]))
+    for (name, keycols) in (
+            ('nodes', ('graph', 'node')),
+            ('edges', ('graph', 'orig', 'dest', 'idx')),
+            ('graph_val', ('graph', 'key')),
+            ('node_val', ('graph', 'node', 'key')),
+            ('edge_val', ('graph', 'orig', 'dest', 'idx', 'key'))
+    ):
+        r.update(cleanup_queries(table[name], keycols))
     return r
 
 
+def cleanup_queries(t, keycols):
+    """Return queries to delete history from ``t`` in bulk
+
+    The history to delete is described in a temporary table, with the
+    columns ``keycols`` identifying an entity, then ``branch``, ``turn``,
+    and ``tick``. Everything about that entity in that branch, from that
+    time on, gets deleted.
+
+    Also return queries to get the last turn in a branch, and the last
+    tick in a turn, that ``t`` has anything for.
+
+    """
+    cleanup = Table(
+        t.name + '_cleanup', MetaData(),
+        *[Column(c, t.c[c].type, primary_key=True)
+          for c in keycols + ('branch',)],
+        Column('turn', INT),
+        Column('tick', INT),
+        prefixes=['TEMPORARY']
+    )
+    return {
+        'create_' + cleanup.name: CreateTable(cleanup),
+        cleanup.name + '_insert': cleanup.insert().values(
+            tuple(bindparam(cname) for cname in cleanup.c.keys())
+        ),
+        'del_{}_after_cleanup'.format(t.name): t.delete().where(and_(
+            *[t.c[c].in_(select([cleanup.c[c]]))
+              for c in keycols + ('branch',)],
+            t.c.turn >= select([func.min(cleanup.c.turn)]).as_scalar(),
+            exists().where(and_(
+                *[cleanup.c[c] == t.c[c] for c in keycols + ('branch',)],
+                or_(
+                    t.c.turn > cleanup.c.turn,
+                    and_(
+                        t.c.turn == cleanup.c.turn,
+                        t.c.tick >= cleanup.c.tick
+                    )
+                )
+            ))
+        )),
+        cleanup.name + '_clear': cleanup.delete(),
+        t.name + '_last_turn': select([func.max(t.c.turn)]).where(
+            t.c.branch == bindparam('branch')
+        ),
+        t.name + '_last_tick': select([func.max(t.c.tick)]).where(and_(
+            t.c.branch == bindparam('branch'),
+            t.c.turn == bindparam('turn')
+        ))
+    }
+
+
 def compile_sql(dialect, meta):
     from sqlalchemy.sql.ddl import CreateTable, CreateIndex
     r = {}
@@ -355,7 +437,7 @@ class Alchemist(object):
                 return self.conn.execute(statement, **dict(zip(statement.positiontup, largs)))
             elif largs:
                 raise TypeError("{} is a DDL query, I think".format(k))
-            return self.conn.execute(statement)
+            return self.conn.execute(statement.statement)
         def manycaller(k, *largs):
             statement = self.sql[k]
             return self.conn.execute(statement, *(dict(zip(statement.positiontup, larg)) for larg in largs))
@@ -214,16 +214,30 @@ class Cache(Signal):
         self.presettings = PickyDefaultDict(SettingsTurnDict)
         """The values prior to ``entity[key] = value`` operations performed on some turn"""
         self.time_entity = {}
+        self.planned = StructuredDefaultDict(1, set)
+        """Times that plans set each entity's keys, keyed by branch.
+
+        Only keys in here can have any planned future to contradict.
+
+        """
         self._kc_lru = OrderedDict()
+        self.journal = not getattr(db, '_readonly', False)
+        """Whether to keep track of what changed when, for deltas and plans.
+
+        Nothing changes in read-only mode, so there's no need.
+
+        """
         self._store_stuff = (
             self.parents, self.branches, self.keys, db.delete_plan,
             db._time_plan, self._iter_future_contradictions,
             db._branches, db._turn_end, self._store_journal,
-            self.time_entity, db._where_cached, self.keycache
+            self.time_entity, db._where_cached, self.keycache,
+            self.planned, self.journal
         )
         self._remove_stuff = (
             self.time_entity, self.parents, self.branches, self.keys,
-            self.settings, self.presettings, self._remove_keycache, self.send
+            self.settings, self.presettings, self._remove_keycache, self.send,
+            self.planned
         )
         self._truncate_stuff = (
             self.parents, self.branches, self.keys, self.settings, self.presettings,
@@ -470,13 +484,26 @@ class Cache(Signal):
         self._store(*args, planning=planning, loading=loading, contra=contra)
         if not db._no_kc:
             self._update_keycache(*args, forward=forward)
-        self.send(self, key=args[-5], branch=args[-4], turn=args[-3], tick=args[-2], value=args[-1], action='store')
+        self.send(
+            self, entity=args[:-5], key=args[-5], branch=args[-4], turn=args[-3], tick=args[-2],
+            value=args[-1], action='store'
+        )
 
     def remove(self, branch, turn, tick):
         """Delete all data from a specific tick"""
-        time_entity, parents, branches, keys, settings, presettings, remove_keycache, send = self._remove_stuff
+        (
+            time_entity, parents, branches, keys, settings, presettings,
+            remove_keycache, send, planned
+        ) = self._remove_stuff
         parent, entity, key = time_entity[branch, turn, tick]
         branchkey = parent + (entity, key)
+        if branch in planned:
+            branch_planned = planned[branch]
+            if branchkey in branch_planned:
+                planned_times = branch_planned[branchkey]
+                planned_times.discard((turn, tick))
+                if not planned_times:
+                    del branch_planned[branchkey]
         keykey = parent + (entity,)
         if parent in parents:
             parentt = parents[parent]
@@ -630,7 +657,8 @@ class Cache(Signal):
             self_parents, self_branches, self_keys, delete_plan,
             time_plan, self_iter_future_contradictions,
             db_branches, db_turn_end, self_store_journal,
-            self_time_entity, db_where_cached, keycache
+            self_time_entity, db_where_cached, keycache, self_planned,
+            journal
         ) = self._store_stuff
         if parent:
             parentity = self_parents[parent][entity]
@@ -657,20 +685,27 @@ class Cache(Signal):
                         tick, turn, branch
                     )
                 )
-        if contra:
-            contras = list(self_iter_future_contradictions(entity, key, turns, branch, turn, tick, value))
-            if contras:
+        branch_planned = self_planned[branch]
+        if journal and contra and parent + (entity, key) in branch_planned:
+            contradicted = set()
+            for contra_turn, contra_tick in self_iter_future_contradictions(
+                    entity, key, turns, branch, turn, tick, value
+            ):
+                contradicted.add(time_plan.get((branch, contra_turn, contra_tick)))
+            if contradicted:
                 self.shallowest = OrderedDict()
-            for contra_turn, contra_tick in contras:
-                if (branch, contra_turn, contra_tick) in time_plan:  # could've been deleted in this very loop
-                    delete_plan(time_plan[branch, contra_turn, contra_tick])
+                contradicted.discard(None)
+                # each plan only needs deleting once, however many of its ticks got contradicted
+                for plan in sorted(contradicted):
+                    delete_plan(plan)
         if not turns:
             branches[branch] = turns
         if not loading and not planning:
             parbranch, turn_start, tick_start, turn_end, tick_end = self.db._branches[branch]
             db_branches[branch] = parbranch, turn_start, tick_start, turn, tick
             db_turn_end[branch, turn] = tick
-        self_store_journal(*args)
+        if journal:
+            self_store_journal(*args)
         self.shallowest[parent + (entity, key, branch, turn, tick)] = value
         shallowest = self.shallowest
         while len(shallowest) > KEYCACHE_MAXSIZE:
@@ -683,10 +718,13 @@ class Cache(Signal):
             new = FuturistWindowDict()
             new[tick] = value
             turns[turn] = new
-        self_time_entity[branch, turn, tick] = parent, entity, key
-        where_cached = db_where_cached[args[-4:-1]]
-        if self not in where_cached:
-            where_cached.append(self)
+        if journal:
+            self_time_entity[branch, turn, tick] = parent, entity, key
+            if planning:
+                branch_planned[parent + (entity, key)].add((turn, tick))
+            where_cached = db_where_cached[args[-4:-1]]
+            if self not in where_cached:
+                where_cached.append(self)
         # if we're editing the past, have to invalidate the keycache
         keycache_key = parent + (entity, branch)
         if keycache_key in keycache:
@@ -772,6 +810,9 @@ class Cache(Signal):
         the entity that the key is in.
 
         """
+        reads = self.db._reads
+        if reads is not None:
+            reads.add((self, args[:-3]))
         ret = self._base_retrieve(args)
         if ret is None:
             raise HistoryError("Set, then deleted", deleted=True)
@@ -779,6 +820,12 @@ class Cache(Signal):
             raise ret
         return ret
 
+    def _record_read(self, entity):
+        """Note that something about ``entity`` was read, if the ORM wants to know"""
+        reads = self.db._reads
+        if reads is not None:
+            reads.add((self, entity))
+
     def iter_entities_or_keys(self, *args, forward=None):
         """Iterate over the keys an entity has, if you specify an entity.
 
@@ -790,6 +837,7 @@ class Cache(Signal):
             forward = self.db._forward
         entity = args[:-3]
         branch, turn, tick = args[-3:]
+        self._record_read(entity)
         if self.db._no_kc:
             yield from self._get_adds_dels(self.keys[entity], branch, turn, tick)[0]
             return
@@ -806,6 +854,7 @@ class Cache(Signal):
             forward = self.db._forward
         entity = args[:-3]
         branch, turn, tick = args[-3:]
+        self._record_read(entity)
         if self.db._no_kc:
             return len(self._get_adds_dels(self.keys[entity], branch, turn, tick)[0])
         return len(self._get_keycache(entity, branch, turn, tick, forward=forward))
@@ -921,6 +970,7 @@ class EdgesCache(Cache):
 
     def iter_successors(self, graph, orig, branch, turn, tick, *, forward=None):
         """Iterate over successors of a given origin node at a given time."""
+        self._record_read((graph, orig))
         if self.db._no_kc:
             yield from self._adds_dels_sucpred(self.successors[graph, orig], branch, turn, tick)[0]
             return
@@ -930,6 +980,7 @@ class EdgesCache(Cache):
 
     def iter_predecessors(self, graph, dest, branch, turn, tick, *, forward=None):
         """Iterate over predecessors to a given destination node at a given time."""
+        self._record_read((graph,))
         if self.db._no_kc:
             yield from self._adds_dels_sucpred(self.predecessors[graph, dest], branch, turn, tick)[0]
             return
@@ -939,6 +990,7 @@ class EdgesCache(Cache):
 
     def count_successors(self, graph, orig, branch, turn, tick, *, forward=None):
         """Return the number of successors to a given origin node at a given time."""
+        self._record_read((graph, orig))
         if self.db._no_kc:
             return len(self._adds_dels_sucpred(self.successors[graph, orig], branch, turn, tick)[0])
         if forward is None:
@@ -947,6 +999,7 @@ class EdgesCache(Cache):
 
     def count_predecessors(self, graph, dest, branch, turn, tick, *, forward=None):
         """Return the number of predecessors from a given destination node at a given time."""
+        self._record_read((graph,))
         if self.db._no_kc:
             return len(self._adds_dels_sucpred(self.predecessors[graph, dest], branch, turn, tick)[0])
         if forward is None:
@@ -960,6 +1013,7 @@ class EdgesCache(Cache):
         particular edge.
 
         """
+        self._record_read((graph, orig, dest))
         if forward is None:
             forward = self.db._forward
         return dest in self._get_destcache(graph, orig, branch, turn, tick, forward=forward)
@@ -971,6 +1025,7 @@ class EdgesCache(Cache):
         particular edge.
 
         """
+        self._record_read((graph, orig, dest))
         if forward is None:
             forward = self.db._forward
         return orig in self._get_origcache(graph, dest, branch, turn, tick, forward=forward)
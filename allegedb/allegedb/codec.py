@@ -0,0 +1,162 @@
+# This file is part of allegedb, an object relational mapper for graphs.
+# Copyright (c) Zachary Spector. public@zacharyspector.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""Ways to turn keys and values into something the database can store.
+
+A codec is a pair of functions, ``pack`` and ``unpack``. ``pack`` has
+to give the same result for equal keys every time, because the
+database compares the packed keys, not the originals.
+
+Pick one by name with :func:`get_codec`. Data packed with one codec
+can't be read with another, so a database has to stick with the codec
+it was made with.
+
+``'repr'``
+    Python literals, read back with :func:`ast.literal_eval`. Slow to
+    load, but anything that :func:`repr` round-trips will work, and
+    you can read the database by eye. This is the default.
+``'msgpack'``
+    msgpack, with tuples, sets, and frozensets as the same extension
+    types that LiSE uses. Ints have to fit in 64 bits. Needs the
+    ``msgpack`` package.
+``'tagged'``
+    One tag byte followed by a compact binary representation of
+    ``None``, booleans, ints, floats, strings, and bytes. Anything else
+    falls back to ``repr``, and has the same limitations.
+
+"""
+from ast import literal_eval
+from collections import namedtuple
+from functools import partial
+from struct import Struct
+
+Codec = namedtuple('Codec', ['pack', 'unpack'])
+
+
+def repr_codec():
+    return Codec(repr, literal_eval)
+
+
+MSGPACK_TUPLE = 0x00
+MSGPACK_FROZENSET = 0x01
+MSGPACK_SET = 0x02
+
+
+def msgpack_codec():
+    import msgpack
+
+    def pack_handler(obj):
+        typ = type(obj)
+        if typ is tuple:
+            return msgpack.ExtType(MSGPACK_TUPLE, packer(list(obj)))
+        if typ is frozenset:
+            return msgpack.ExtType(MSGPACK_FROZENSET, packer(list(obj)))
+        if typ is set:
+            return msgpack.ExtType(MSGPACK_SET, packer(list(obj)))
+        raise TypeError("Can't pack {}".format(typ))
+
+    handlers = {
+        MSGPACK_TUPLE: lambda data: tuple(unpacker(data)),
+        MSGPACK_FROZENSET: lambda data: frozenset(unpacker(data)),
+        MSGPACK_SET: lambda data: set(unpacker(data))
+    }
+
+    def unpack_handler(code, data):
+        if code in handlers:
+            return handlers[code](data)
+        return msgpack.ExtType(code, data)
+
+    packer = partial(
+        msgpack.packb,
+        default=pack_handler, strict_types=True, use_bin_type=True
+    )
+    unpacker = partial(
+        msgpack.unpackb,
+        ext_hook=unpack_handler, raw=False, strict_map_key=False
+    )
+    return Codec(packer, unpacker)
+
+
+def tagged_codec():
+    # tag, format, and the range of ints that fit in it
+    int_structs = [
+        (b'b', Struct('>b'), -1 << 7, 1 << 7),
+        (b'h', Struct('>h'), -1 << 15, 1 << 15),
+        (b'i', Struct('>i'), -1 << 31, 1 << 31),
+        (b'q', Struct('>q'), -1 << 63, 1 << 63)
+    ]
+    double = Struct('>d')
+    constants = {None: b'N', True: b'T', False: b'F'}
+
+    def pack(obj):
+        typ = type(obj)
+        if typ is str:
+            return b's' + obj.encode('utf-8')
+        if typ is int:
+            for (tag, struct, low, high) in int_structs:
+                if low <= obj < high:
+                    return tag + struct.pack(obj)
+            return b'I' + str(obj).encode('ascii')
+        if typ is float:
+            return b'd' + double.pack(obj)
+        if obj is None or typ is bool:
+            return constants[obj]
+        if typ is bytes:
+            return b'y' + obj
+        return b'r' + repr(obj).encode('utf-8')
+
+    unpackers = {
+        ord('s'): lambda b: b[1:].decode('utf-8'),
+        ord('d'): lambda b: double.unpack_from(b, 1)[0],
+        ord('I'): lambda b: int(b[1:]),
+        ord('y'): lambda b: b[1:],
+        ord('r'): lambda b: literal_eval(b[1:].decode('utf-8')),
+        ord('N'): lambda b: None,
+        ord('T'): lambda b: True,
+        ord('F'): lambda b: False
+    }
+    for (tag, struct, low, high) in int_structs:
+        unpackers[tag[0]] = partial(
+            lambda unpack_from, b: unpack_from(b, 1)[0], struct.unpack_from
+        )
+
+    def unpack(b):
+        return unpackers[b[0]](b)
+
+    return Codec(pack, unpack)
+
+
+codecs = {
+    'repr': repr_codec,
+    'msgpack': msgpack_codec,
+    'tagged': tagged_codec
+}
+
+
+def get_codec(codec):
+    """Return a :class:`Codec` for ``codec``
+
+    ``codec`` may be the name of one of the built-in codecs, or
+    anything with ``pack`` and ``unpack`` attributes, which is
+    returned unchanged.
+
+    """
+    if codec is None:
+        codec = 'repr'
+    if isinstance(codec, str):
+        if codec not in codecs:
+            raise ValueError("Unknown codec: {}".format(codec))
+        return codecs[codec]()
+    return codec
@@ -17,7 +17,13 @@
 import networkx
 from networkx.exception import NetworkXError
 from collections import defaultdict, MutableMapping
-from .wrap import MutableMappingUnwrapper
+from functools import partial
+from types import MappingProxyType
+
+from .wrap import MutableMappingUnwrapper, DictWrapper, ListWrapper, SetWrapper
+
+_wrappers = {list: ListWrapper, dict: DictWrapper, set: SetWrapper}
+
 
 class EntityCollisionError(ValueError):
     """For when there's a discrepancy between the kind of entity you're creating and the one by the same name"""
@@ -131,24 +137,46 @@ class AbstractEntityMapping(AllegedMapping):
     def _del_cache(self, key, branch, turn, tick):
         self._set_cache(key, branch, turn, tick, None)
 
-    def __getitem__(self, key):
-        """If key is 'graph', return myself as a dict, else get the present
-        value of the key and return that
+    def get_raw(self, key):
+        """Get the present value of the key without wrapping it
+
+        This is faster than ``self[key]`` when the value is a list, dict,
+        or set. You can't change what you get: dicts come as read-only
+        views of what's in the cache, lists as tuples, and sets as
+        frozensets.
 
         """
-        def wrapval(v):
-            from functools import partial
-            from .wrap import DictWrapper, ListWrapper, SetWrapper
-            if isinstance(v, list):
-                return ListWrapper(partial(self._get_cache_now, key), partial(self._set_cache_now, key), self, key)
-            elif isinstance(v, dict):
-                return DictWrapper(partial(self._get_cache_now, key), partial(self._set_cache_now, key), self, key)
-            elif isinstance(v, set):
-                return SetWrapper(partial(self._get_cache_now, key), partial(self._set_cache_now, key), self, key)
-            else:
-                return v
+        value = self._get_cache_now(key)
+        if isinstance(value, dict):
+            return MappingProxyType(value)
+        if isinstance(value, list):
+            return tuple(value)
+        if isinstance(value, set):
+            return frozenset(value)
+        return value
+
+    def __getitem__(self, key):
+        """Get the present value of the key
 
-        return wrapval(self._get_cache_now(key))
+        Lists, dicts, and sets are wrapped, so that changing them
+        changes the value stored here. Use :meth:`get_raw` if you only
+        want to read them.
+
+        """
+        ret = self._get_cache_now(key)
+        wrapper = _wrappers.get(type(ret))
+        if wrapper is None:
+            if not isinstance(ret, (list, dict, set)):
+                return ret
+            wrapper = next(
+                wrp for (typ, wrp) in _wrappers.items()
+                if isinstance(ret, typ)
+            )
+        return wrapper(
+            partial(self._get_cache_now, key),
+            partial(self._set_cache_now, key),
+            self, key
+        )
 
     def __contains__(self, item):
         return self._cache_contains(item, *self.db._btt())
@@ -218,6 +246,11 @@ class GraphMapping(AbstractEntityMapping):
             return self.graph.name
         return super().__getitem__(item)
 
+    def get_raw(self, item):
+        if item == 'name':
+            return self.graph.name
+        return super().get_raw(item)
+
     def __setitem__(self, key, value):
         if key == 'name':
             raise KeyError("name cannot be changed after creation")
@@ -1228,14 +1261,23 @@ class Graph(networkx.Graph):
         self.db = db
         if name not in self.db._graph_objs:
             self.db._graph_objs[name] = self
-        self.clear()
+        if not db._readonly:
+            self.clear()
         if data is not None:
             data = data.copy()
             if isinstance(data, dict) and 'name' in data:
                 del data['name']
             if hasattr(data, 'graph') and 'name' in data.graph:
                 del data.graph['name']
-            convert_to_networkx_graph(data, create_using=self)
+            if (
+                isinstance(data, networkx.Graph) and
+                not data.is_multigraph() and
+                not self.is_multigraph() and
+                not self.db._planning
+            ):
+                self._import_networkx(data)
+            else:
+                convert_to_networkx_graph(data, create_using=self)
         self.graph.update(attr)
 
     @property
@@ -1327,6 +1369,61 @@ class Graph(networkx.Graph):
         self.node.clear()
         self.graph.clear()
 
+    def snapshot(self, node_stats=(), edge_stats=()):
+        """Return a :class:`allegedb.snapshot.GraphSnapshot` of me as I am now
+
+        The snapshot has the values of the named node and edge stats in
+        columns. Its ``view`` is a frozen NetworkX copy of me, built the
+        first time you ask for it, and much faster to run algorithms on
+        than I am.
+
+        If I haven't changed since the last snapshot with the same stats,
+        you get that one again.
+
+        """
+        from .snapshot import GraphSnapshot
+        try:
+            snapshots = self._snapshots
+        except AttributeError:
+            snapshots = self._snapshots = {}
+        key = (tuple(node_stats), tuple(edge_stats))
+        snap = snapshots.get(key)
+        if snap is None or snap.db is not self.db \
+                or snap.name != self.name or not snap.is_current():
+            snap = snapshots[key] = GraphSnapshot(
+                self, node_stats, edge_stats)
+        return snap
+
+    def _import_networkx(self, g):
+        """Copy the nodes, edges, and stats of a networkx graph into me
+
+        Everything goes into the database at once, rather than one
+        write at a time. ``g`` mustn't be a multigraph.
+
+        """
+        nodes = [(node, dict(stats)) for (node, stats) in g.nodes.items()]
+        if self.is_directed():
+            edges = [
+                (orig, dest, dict(stats))
+                for (orig, dests) in g.adj.items()
+                for (dest, stats) in dests.items()
+            ]
+        else:
+            # stored the same way as in GraphSuccessorsMapping
+            ordered = {}
+            for orig, dests in g.adj.items():
+                for dest, stats in dests.items():
+                    if dest < orig:
+                        ordered[dest, orig] = stats
+                    else:
+                        ordered[orig, dest] = stats
+            edges = [
+                (orig, dest, dict(stats))
+                for ((orig, dest), stats) in ordered.items()
+            ]
+        self.db._bulk_import(self.name, nodes, edges)
+        self.graph.update(g.graph)
+
     def add_node(self, node_for_adding, **attr):
         if node_for_adding not in self._succ:
             self._succ[node_for_adding] = self.adjlist_inner_dict_factory()
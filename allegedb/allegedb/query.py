@@ -20,7 +20,10 @@ doesn't pollute the other files so much.
 """
 import os
 from collections import MutableMapping
+from itertools import chain
+from urllib.parse import quote
 from sqlite3 import IntegrityError as sqliteIntegError
+from allegedb.codec import get_codec
 try:
     # python 2
     import wrap
@@ -87,10 +90,45 @@ class QueryEngine(object):
 
     """
     path = os.path.dirname(__file__)
+    storage_profiles = {
+        'durable': {
+            'journal_mode': 'wal',
+            'synchronous': 'full'
+        },
+        'fast': {
+            'page_size': 8192,
+            'journal_mode': 'wal',
+            'synchronous': 'normal',
+            'temp_store': 'memory',
+            'cache_size': -65536,
+            'mmap_size': 268435456
+        },
+        'bulk-load': {
+            'page_size': 8192,
+            'journal_mode': 'memory',
+            'synchronous': 'off',
+            'temp_store': 'memory',
+            'cache_size': -262144,
+            'mmap_size': 268435456
+        }
+    }
+    """SQLite pragmas to apply for each storage profile, in order.
+
+    ``durable`` survives power loss at every commit. ``fast`` may lose
+    the last few commits on power loss, but never corrupts the
+    database. ``bulk-load`` is for building a world from scratch, and
+    a crash while it's in effect can corrupt the database.
+
+    ``page_size`` only takes effect on a new database.
+
+    """
+    readonly_mmap = 1 << 30
+    """How many bytes of the database to memory-map in read-only mode"""
 
     def __init__(
             self, dbstring, connect_args, alchemy,
-            pack=None, unpack=None
+            pack=None, unpack=None, storage_profile=None, codec=None,
+            intern_keys=None, archive=None, readonly=False
     ):
         """If ``alchemy`` is True and ``dbstring`` is a legit database URI,
         instantiate an Alchemist and start a transaction with
@@ -100,8 +138,57 @@ class QueryEngine(object):
         object in place of ``dbstring`` if you wish. I'll still create
         my own transaction though.
 
+        ``storage_profile`` is the name of one of my
+        ``storage_profiles``. By default, SQLite's own defaults are
+        left alone.
+
+        ``codec`` is how to store keys and values: the name of one of
+        the codecs in :mod:`allegedb.codec`, or an object with ``pack``
+        and ``unpack`` methods. ``pack`` and ``unpack``, if supplied,
+        take precedence.
+
+        If ``intern_keys`` is True, a new database will store the names
+        of graphs, nodes, and keys as small integers, looked up in the
+        ``interned`` table, and each distinct name is only unpacked
+        once. Leave it ``None`` to do whatever the database already
+        does.
+
+        ``archive`` holds history that's been moved out of the
+        database. It needs a ``tables`` attribute, naming the tables it
+        has rows for, and a method ``rows(table)`` returning them in
+        the same form as the database would, in chronological order
+        within each branch. When I dump one of those tables, the
+        archived rows come first. :class:`LiSE.archive.Archive` is one.
+
+        With ``readonly``, open a SQLite database file that nothing is
+        writing to, without locking it, and memory-map it, so that any
+        number of processes can read it at once. I won't make any
+        tables, and I won't commit.
+
         """
         dbstring = dbstring or 'sqlite:///:memory:'
+        self.readonly = readonly
+        if readonly:
+            if storage_profile is not None:
+                raise ValueError("Storage profiles are for writing")
+            if not isinstance(dbstring, str):
+                raise TypeError("Read-only mode needs the path to a database")
+            path = dbstring[len('sqlite:///'):] \
+                if dbstring.startswith('sqlite:///') else dbstring
+            if path in ('', ':memory:') or '://' in path:
+                raise ValueError(
+                    "Read-only mode only works on SQLite database files"
+                )
+            if not os.path.exists(path):
+                raise FileNotFoundError(path)
+            from sqlite3 import connect
+            dbstring = connect(
+                'file:{}?mode=ro&immutable=1'.format(quote(path)),
+                uri=True, **connect_args
+            )
+            dbstring.execute('PRAGMA mmap_size={}'.format(self.readonly_mmap))
+            # the precompiled queries start up faster than SQLAlchemy
+            alchemy = False
 
         def alchem_init(dbstring, connect_args):
             from sqlalchemy import create_engine
@@ -146,10 +233,41 @@ class QueryEngine(object):
         self._nodes2set = []
         self._edges2set = []
         self._btts = set()
-        if unpack is None:
-            from ast import literal_eval as unpack
-        self.pack = pack or repr
-        self.unpack = unpack
+        self._branch_ends = {}
+        self._flush_ends = None
+        self._cleanup_tables = set()
+        codec = get_codec(codec)
+        self.pack = pack or codec.pack
+        self.unpack = unpack or codec.unpack
+        self.pack_key = self.find_key = self.pack
+        self.unpack_key = self.unpack
+        self._intern_keys = intern_keys
+        self._interned2set = []
+        self.archive = archive
+        self._archived_dumps = {
+            table + '_dump': table for table in archive.tables
+        } if archive is not None else {}
+        if storage_profile is not None:
+            self.set_storage_profile(storage_profile)
+
+    def set_storage_profile(self, profile):
+        """Commit, then apply the pragmas of one of my ``storage_profiles``
+
+        Does nothing to databases other than SQLite.
+
+        """
+        pragmas = self.storage_profiles[profile]
+        self.commit()
+        if hasattr(self, 'alchemist'):
+            if self.engine.dialect.name != 'sqlite':
+                return
+            execute = self.alchemist.conn.execute
+        else:
+            execute = self.connection.execute
+        for (k, v) in pragmas.items():
+            execute('PRAGMA {}={}'.format(k, v))
+        if hasattr(self, 'alchemist'):
+            self.transaction = self.alchemist.conn.begin()
 
     def sql(self, stringname, *args, **kwargs):
         """Wrapper for the various prewritten or compiled SQL calls.
@@ -160,6 +278,14 @@ class QueryEngine(object):
         parameters to the query.
 
         """
+        if stringname in self._archived_dumps:
+            return chain(
+                self.archive.rows(self._archived_dumps[stringname]),
+                self._sql(stringname, *args, **kwargs)
+            )
+        return self._sql(stringname, *args, **kwargs)
+
+    def _sql(self, stringname, *args, **kwargs):
         if hasattr(self, 'alchemist'):
             return getattr(self.alchemist, stringname)(*args, **kwargs)
         else:
@@ -184,17 +310,19 @@ class QueryEngine(object):
 
     def have_graph(self, graph):
         """Return whether I have a graph by this name."""
-        graph = self.pack(graph)
+        graph = self.find_key(graph)
+        if graph is None:
+            return False
         return bool(self.sql('graphs_named', graph).fetchone()[0])
 
     def new_graph(self, graph, typ):
         """Declare a new graph by this name of this type."""
-        graph = self.pack(graph)
+        graph = self.pack_key(graph)
         return self.sql('new_graph', graph, typ)
 
     def del_graph(self, graph):
         """Delete all records to do with the graph"""
-        g = self.pack(graph)
+        g = self.pack_key(graph)
         self.sql('del_edge_val_graph', g)
         self.sql('del_node_val_graph', g)
         self.sql('del_edge_val_graph', g)
@@ -204,7 +332,9 @@ class QueryEngine(object):
 
     def graph_type(self, graph):
         """What type of graph is this?"""
-        graph = self.pack(graph)
+        graph = self.find_key(graph)
+        if graph is None:
+            return None
         return self.sql('graph_type', graph).fetchone()[0]
 
     def have_branch(self, branch):
@@ -301,10 +431,11 @@ class QueryEngine(object):
         """Yield the entire contents of the graph_val table."""
         self._flush_graph_val()
         unpack = self.unpack
+        unpack_key = self.unpack_key
         for (graph, key, branch, turn, tick, value) in self.sql('graph_val_dump'):
             yield (
-                unpack(graph),
-                unpack(key),
+                unpack_key(graph),
+                unpack_key(key),
                 branch,
                 turn,
                 tick,
@@ -315,20 +446,7 @@ class QueryEngine(object):
         """Send all new and changed graph values to the database."""
         if not self._graphvals2set:
             return
-        delafter = {}
-        for graph, key, branch, turn, tick, value in self._graphvals2set:
-            if (graph, key, branch) in delafter:
-                delafter[graph, key, branch] = min((
-                    (turn, tick),
-                    delafter[graph, key, branch]
-                ))
-            else:
-                delafter[graph, key, branch] = (turn, tick)
-        self.sqlmany(
-            'del_graph_val_after',
-            *((graph, key, branch, turn, turn, tick)
-              for ((graph, key, branch), (turn, tick)) in delafter.items())
-        )
+        self._cleanup_after('graph_val', self._graphvals2set, 2)
         self.sqlmany('graph_val_insert', *self._graphvals2set)
         self._graphvals2set = []
 
@@ -336,7 +454,8 @@ class QueryEngine(object):
         if (branch, turn, tick) in self._btts:
             raise TimeError
         self._btts.add((branch, turn, tick))
-        graph, key, value = map(self.pack, (graph, key, value))
+        pack_key = self.pack_key
+        graph, key, value = pack_key(graph), pack_key(key), self.pack(value)
         self._graphvals2set.append((graph, key, branch, turn, tick, value))
 
     def graph_val_del_time(self, branch, turn, tick):
@@ -346,21 +465,12 @@ class QueryEngine(object):
 
     def graphs_types(self):
         for (graph, typ) in self.sql('graphs_types'):
-            yield (self.unpack(graph), typ)
+            yield (self.unpack_key(graph), typ)
 
     def _flush_nodes(self):
         if not self._nodes2set:
             return
-        # delete history that is to be overwritten due to paradox
-        cleanups = {}
-        for graph, node, branch, turn, tick, extant in self._nodes2set:
-            if (graph, node, branch) in cleanups:
-                cleanups[graph, node, branch] = min((
-                    (turn, tick), cleanups[graph, node, branch]
-                ))
-            else:
-                cleanups[graph, node, branch] = (turn, tick)
-        self.sqlmany('del_nodes_after', *(k + (turn, turn, tick) for k, (turn, tick) in cleanups.items()))
+        self._cleanup_after('nodes', self._nodes2set, 2)
         self.sqlmany('nodes_insert', *self._nodes2set)
         self._nodes2set = []
 
@@ -373,7 +483,7 @@ class QueryEngine(object):
         if (branch, turn, tick) in self._btts:
             raise TimeError
         self._btts.add((branch, turn, tick))
-        self._nodes2set.append((self.pack(graph), self.pack(node), branch, turn, tick, extant))
+        self._nodes2set.append((self.pack_key(graph), self.pack_key(node), branch, turn, tick, extant))
 
     def nodes_del_time(self, branch, turn, tick):
         self._flush_nodes()
@@ -383,11 +493,11 @@ class QueryEngine(object):
     def nodes_dump(self):
         """Dump the entire contents of the nodes table."""
         self._flush_nodes()
-        unpack = self.unpack
+        unpack_key = self.unpack_key
         for (graph, node, branch, turn,tick, extant) in self.sql('nodes_dump'):
             yield (
-                unpack(graph),
-                unpack(node),
+                unpack_key(graph),
+                unpack_key(node),
                 branch,
                 turn,
                 tick,
@@ -398,13 +508,14 @@ class QueryEngine(object):
         """Yield the entire contents of the node_val table."""
         self._flush_node_val()
         unpack = self.unpack
+        unpack_key = self.unpack_key
         for (
                 graph, node, key, branch, turn, tick, value
         ) in self.sql('node_val_dump'):
             yield (
-                unpack(graph),
-                unpack(node),
-                unpack(key),
+                unpack_key(graph),
+                unpack_key(node),
+                unpack_key(key),
                 branch,
                 turn,
                 tick,
@@ -414,22 +525,7 @@ class QueryEngine(object):
     def _flush_node_val(self):
         if not self._nodevals2set:
             return
-        delafter = {}
-        for graph, node, key, branch, turn, tick, value in self._nodevals2set:
-            if (graph, node, key, branch) in delafter:
-                delafter[graph, node, key, branch] = min((
-                    (turn, tick),
-                    delafter[graph, node, key, branch]
-                ))
-            else:
-                delafter[graph, node, key, branch] = (turn, tick)
-        if delafter:
-            self.sqlmany(
-                'del_node_val_after',
-                *((graph, node, key, branch, turn, turn, tick)
-                  for ((graph, node, key, branch), (turn, tick)) in
-                  delafter.items())
-            )
+        self._cleanup_after('node_val', self._nodevals2set, 3)
         self.sqlmany('node_val_insert', *self._nodevals2set)
         self._nodevals2set = []
 
@@ -438,7 +534,8 @@ class QueryEngine(object):
         if (branch, turn, tick) in self._btts:
             raise TimeError
         self._btts.add((branch, turn, tick))
-        graph, node, key, value = map(self.pack, (graph, node, key, value))
+        graph, node, key = map(self.pack_key, (graph, node, key))
+        value = self.pack(value)
         self._nodevals2set.append((graph, node, key, branch, turn, tick, value))
 
     def node_val_del_time(self, branch, turn, tick):
@@ -449,14 +546,14 @@ class QueryEngine(object):
     def edges_dump(self):
         """Dump the entire contents of the edges table."""
         self._flush_edges()
-        unpack = self.unpack
+        unpack_key = self.unpack_key
         for (
                 graph, orig, dest, idx, branch, turn, tick, extant
         ) in self.sql('edges_dump'):
             yield (
-                unpack(graph),
-                unpack(orig),
-                unpack(dest),
+                unpack_key(graph),
+                unpack_key(orig),
+                unpack_key(dest),
                 idx,
                 branch,
                 turn,
@@ -467,23 +564,7 @@ class QueryEngine(object):
     def _flush_edges(self):
         if not self._edges2set:
             return
-        delafter = {}
-        for graph, orig, dest, idx, branch, turn, tick, extant in self._edges2set:
-            key = graph, orig, dest, idx, branch
-            if key in delafter:
-                delafter[key] = min((
-                    (turn, tick),
-                    delafter[key]
-                ))
-            else:
-                delafter[key] = (turn, tick)
-        if delafter:
-            self.sqlmany(
-                'del_edges_after',
-                *((graph, orig, dest, idx, branch, turn, turn, tick)
-                  for ((graph, orig, dest, idx, branch), (turn, tick)) in
-                  delafter.items())
-            )
+        self._cleanup_after('edges', self._edges2set, 4)
         self.sqlmany('edges_insert', *self._edges2set)
         self._edges2set = []
 
@@ -492,7 +573,7 @@ class QueryEngine(object):
         if (branch, turn, tick) in self._btts:
             raise TimeError
         self._btts.add((branch, turn, tick))
-        graph, orig, dest = map(self.pack, (graph, orig, dest))
+        graph, orig, dest = map(self.pack_key, (graph, orig, dest))
         self._edges2set.append((graph, orig, dest, idx, branch, turn, tick, extant))
 
     def edges_del_time(self, branch, turn, tick):
@@ -504,15 +585,16 @@ class QueryEngine(object):
         """Yield the entire contents of the edge_val table."""
         self._flush_edge_val()
         unpack = self.unpack
+        unpack_key = self.unpack_key
         for (
                 graph, orig, dest, idx, key, branch, turn, tick, value
         ) in self.sql('edge_val_dump'):
             yield (
-                unpack(graph),
-                unpack(orig),
-                unpack(dest),
+                unpack_key(graph),
+                unpack_key(orig),
+                unpack_key(dest),
                 idx,
-                unpack(key),
+                unpack_key(key),
                 branch,
                 turn,
                 tick,
@@ -522,21 +604,7 @@ class QueryEngine(object):
     def _flush_edge_val(self):
         if not self._edgevals2set:
             return
-        delafter = {}
-        for graph, orig, dest, idx, key, branch, turn, tick, value in self._edgevals2set:
-            dkey = graph, orig, dest, idx, key, branch
-            if dkey in delafter:
-                delafter[dkey] = min((
-                    (turn, tick), delafter[dkey]
-                ))
-            else:
-                delafter[dkey] = (turn, tick)
-        self.sqlmany(
-            'del_edge_val_after',
-            *((graph, orig, dest, idx, key, branch, turn, turn, tick)
-              for ((graph, orig, dest, idx, key, branch), (turn, tick))
-              in delafter.items())
-        )
+        self._cleanup_after('edge_val', self._edgevals2set, 5)
         self.sqlmany('edge_val_insert', *self._edgevals2set)
         self._edgevals2set = []
 
@@ -545,7 +613,8 @@ class QueryEngine(object):
         if (branch, turn, tick) in self._btts:
             raise TimeError
         self._btts.add((branch, turn, tick))
-        graph, orig, dest, key, value = map(self.pack, (graph, orig, dest, key, value))
+        graph, orig, dest, key = map(self.pack_key, (graph, orig, dest, key))
+        value = self.pack(value)
         self._edgevals2set.append(
             (graph, orig, dest, idx, key, branch, turn, tick, value)
         )
@@ -575,12 +644,17 @@ class QueryEngine(object):
 
     def initdb(self):
         """Create tables and indices as needed."""
+        if self.readonly:
+            self._init_interned()
+            return
         if hasattr(self, 'alchemist'):
             self.alchemist.meta.create_all(self.engine)
             if 'branch' not in self.globl:
                 self.globl['branch'] = 'trunk'
             if 'rev' not in self.globl:
                 self.globl['rev'] = 0
+            self.init_indices()
+            self._init_interned()
             return
         from sqlite3 import OperationalError
         cursor = self.connection.cursor()
@@ -605,23 +679,249 @@ class QueryEngine(object):
             'edges',
             'edge_val',
             'plans',
-            'plan_ticks'
+            'plan_ticks',
+            'interned'
         ):
             try:
                 cursor.execute('SELECT * FROM ' + table + ';')
             except OperationalError:
                 cursor.execute(strings['create_' + table])
+        self.init_indices()
+        self._init_interned()
+
+    def init_indices(self):
+        """Create the time indices for any tables that exist, but lack them
+
+        SQLAlchemy makes them along with new tables, but not for tables
+        that were already there, so databases made before the indices
+        existed get them here.
+
+        """
+        if hasattr(self, 'alchemist'):
+            from sqlalchemy import inspect
+            inspector = inspect(self.alchemist.conn)
+            tables = set(inspector.get_table_names())
+            indices = {
+                index['name'] for table in tables
+                for index in inspector.get_indexes(table)
+            }
+            keys = self.alchemist.sql.keys()
+        else:
+            tables = set()
+            indices = set()
+            for (typ, name) in self.connection.execute(
+                    "SELECT type, name FROM sqlite_master;"
+            ).fetchall():
+                if typ == 'table':
+                    tables.add(name)
+                elif typ == 'index':
+                    indices.add(name)
+            keys = self.strings.keys()
+        for k in keys:
+            if not k.startswith('index_'):
+                continue
+            table = k[len('index_'):]
+            if table in tables and table + '_time' not in indices:
+                self._sql(k)
+
+    def _init_interned(self):
+        """Decide whether to intern keys, and load the interned ones if so
+
+        Whether a database interns its keys is decided when it's made,
+        and can't be changed after.
+
+        """
+        stored = 'intern_keys' in self.globl and self.globl['intern_keys']
+        wanted = self._intern_keys
+        if wanted and not stored:
+            for _ in self.sql('graphs_types'):
+                raise ValueError(
+                    "Can't intern keys in a database that already has "
+                    "data without them"
+                )
+            self.globl['intern_keys'] = stored = True
+        elif wanted is False and stored:
+            raise ValueError("This database interns its keys")
+        if not stored:
+            return
+        pack = self.pack
+        unpack = self.unpack
+        key_ids = {}
+        keys = {}
+        todo = self._interned2set
+        for (ident, packed) in self.sql('interned_dump'):
+            ident = str(ident)
+            key_ids[packed] = ident
+            keys[ident] = unpack(packed)
+
+        def pack_key(obj):
+            packed = pack(obj)
+            if packed in key_ids:
+                return key_ids[packed]
+            n = len(key_ids)
+            ident = key_ids[packed] = str(n)
+            keys[ident] = obj
+            todo.append((n, packed))
+            return ident
+
+        def find_key(obj):
+            # like pack_key, but never makes a new ID
+            return key_ids.get(pack(obj))
+
+        self.pack_key = pack_key
+        self.find_key = find_key
+        self.unpack_key = keys.__getitem__
+
+    def _flush_interned(self):
+        if not self._interned2set:
+            return
+        self.sqlmany('interned_insert', *self._interned2set)
+        # pack_key holds on to this list, so don't replace it
+        self._interned2set.clear()
+
+    def _branch_end(self, branch):
+        """Return the last ``(turn, tick)`` in the branch that the database
+        might have anything for, or ``None`` if it has nothing
+
+        This is only looked up once per branch. After that, it's kept
+        up to date as rows are written.
+
+        """
+        if branch in self._branch_ends:
+            return self._branch_ends[branch]
+        end = None
+        for table in ('nodes', 'edges', 'graph_val', 'node_val', 'edge_val'):
+            (turn,) = self.sql(table + '_last_turn', branch).fetchone()
+            if turn is None or (end is not None and turn < end[0]):
+                continue
+            (tick,) = self.sql(table + '_last_tick', branch, turn).fetchone()
+            if end is None or (turn, tick) > end:
+                end = (turn, tick)
+        self._branch_ends[branch] = end
+        return end
+
+    def _cleanup_after(self, table, rows, keylen):
+        """Delete the history in ``table`` that ``rows`` will overwrite
+
+        The first ``keylen`` fields of each row identify an entity, and
+        the next three are its branch, turn, and tick. Everything about
+        that entity in that branch, from that time on, is deleted.
+
+        When all the rows are later than anything the database has for
+        their branches, as they are during ordinary simulation, there's
+        nothing to delete, and the database isn't touched. Otherwise,
+        the entities to clean up are put in a temporary table and
+        deleted in one query.
+
+        During :meth:`flush`, the branch ends aren't moved until every
+        table is written, so rows in one table don't look like they're
+        in the past of rows in another.
+
+        """
+        if self._flush_ends is None:
+            ends = self._branch_ends
+        else:
+            ends = self._flush_ends
+        earliest = {}
+        for row in rows:
+            branch = row[keylen]
+            time = row[keylen+1:keylen+3]
+            end = self._branch_end(branch)
+            if end is not None and time <= end:
+                entity = row[:keylen+1]
+                if entity not in earliest or time < earliest[entity]:
+                    earliest[entity] = time
+        for row in rows:
+            branch = row[keylen]
+            time = row[keylen+1:keylen+3]
+            if ends.get(branch) is None or time > ends[branch]:
+                ends[branch] = time
+        if not earliest:
+            return
+        if table not in self._cleanup_tables:
+            self.sql('create_{}_cleanup'.format(table))
+            self._cleanup_tables.add(table)
+        self.sqlmany(
+            table + '_cleanup_insert',
+            *(entity + time for (entity, time) in earliest.items())
+        )
+        self.sql('del_{}_after_cleanup'.format(table))
+        self.sql(table + '_cleanup_clear')
 
     def flush(self):
         """Put all pending changes into the SQL transaction."""
-        self._flush_nodes()
-        self._flush_edges()
-        self._flush_graph_val()
-        self._flush_node_val()
-        self._flush_edge_val()
+        self._flush_interned()
+        # look up the ends of the branches before writing anything to them
+        for rows, keylen in (
+                (self._nodes2set, 2),
+                (self._edges2set, 4),
+                (self._graphvals2set, 2),
+                (self._nodevals2set, 3),
+                (self._edgevals2set, 5)
+        ):
+            for branch in {row[keylen] for row in rows}:
+                self._branch_end(branch)
+        self._flush_ends = {}
+        try:
+            self._flush_nodes()
+            self._flush_edges()
+            self._flush_graph_val()
+            self._flush_node_val()
+            self._flush_edge_val()
+        finally:
+            ends = self._branch_ends
+            for branch, time in self._flush_ends.items():
+                if ends.get(branch) is None or time > ends[branch]:
+                    ends[branch] = time
+            self._flush_ends = None
+
+    def bulk_insert(self, nodes=(), node_vals=(), edges=(), edge_vals=()):
+        """Insert lots of new records at once, one query per table
+
+        Each argument is a list of rows, with the same fields as the
+        arguments to :meth:`exist_node`, :meth:`node_val_set`,
+        :meth:`exist_edge`, and :meth:`edge_val_set` respectively.
+
+        All the rows have to be later than anything else in their
+        branch, so there's no history to clean up after them.
+
+        """
+        self.flush()
+        btts = self._btts
+        pack = self.pack
+        pack_key = self.pack_key
+        for rows, query, times, keys, values in (
+                (nodes, 'nodes_insert', slice(2, 5), (0, 1), ()),
+                (node_vals, 'node_val_insert', slice(3, 6), (0, 1, 2), (6,)),
+                (edges, 'edges_insert', slice(4, 7), (0, 1, 2), ()),
+                (edge_vals, 'edge_val_insert', slice(5, 8), (0, 1, 2, 4),
+                 (8,))
+        ):
+            if not rows:
+                continue
+            records = []
+            for row in rows:
+                btt = row[times]
+                if btt in btts:
+                    raise TimeError
+                btts.add(btt)
+                (branch, turn, tick) = btt
+                end = self._branch_end(branch)
+                if end is None or (turn, tick) > end:
+                    self._branch_ends[branch] = (turn, tick)
+                record = list(row)
+                for i in keys:
+                    record[i] = pack_key(record[i])
+                for i in values:
+                    record[i] = pack(record[i])
+                records.append(tuple(record))
+            self.sqlmany(query, *records)
+        self._flush_interned()
 
     def commit(self):
         """Commit the transaction"""
+        if self.readonly:
+            return
         self.flush()
         if hasattr(self, 'transaction') and self.transaction.is_active:
             self.transaction.commit()
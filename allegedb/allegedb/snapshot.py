@@ -0,0 +1,359 @@
+# This file is part of allegedb, an object relational mapper for versioned graphs.
+# Copyright (C) Zachary Spector. public@zacharyspector.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""Frozen copies of a graph's adjacency at one moment, for fast graph algorithms
+
+The adjacency is kept in compressed sparse row form: the successors of
+the node at index ``i`` are ``indices[indptr[i]:indptr[i+1]]``. Selected
+node and edge stats are kept as columns aligned with the nodes and with
+``indices`` respectively. These are NumPy arrays when NumPy is installed,
+tuples otherwise. Each column has a mask of which nodes or edges have
+the stat at all, so a stat set to NaN isn't mistaken for a missing one.
+
+To select nodes or edges by one of those stats, pass a test to
+:meth:`GraphSnapshot.nodes_where` or :meth:`GraphSnapshot.edges_where`.
+With NumPy, the test gets a whole column at once, so it can be something
+like ``lambda col: col > 0.5``.
+
+"""
+from collections import OrderedDict
+from numbers import Real
+import networkx
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+_int64_range = range(-2 ** 63, 2 ** 63)
+
+
+def _column(values, present):
+    """Make a column out of a list of stat values
+
+    ``present`` says which of the ``values`` are really there. If every
+    value present is an integer, the column holds 64-bit integers, with
+    0 for the missing ones; if they're all real numbers, floats, with
+    NaN for the missing ones. Otherwise it holds objects, with ``None``.
+
+    """
+    if numpy is None:
+        return tuple(values)
+    there = [v for (v, p) in zip(values, present) if p]
+    if all(isinstance(v, int) and not isinstance(v, bool)
+           and v in _int64_range for v in there):
+        col = numpy.array(
+            [v if p else 0 for (v, p) in zip(values, present)],
+            dtype=numpy.int64)
+    elif all(isinstance(v, Real) and not isinstance(v, bool) for v in there):
+        col = numpy.array(
+            [v if p else numpy.nan for (v, p) in zip(values, present)],
+            dtype=float)
+    else:
+        col = numpy.empty(len(values), dtype=object)
+        col[:] = values
+    # snapshots are shared, so nobody gets to change them
+    col.flags.writeable = False
+    return col
+
+
+def _mask(present):
+    if numpy is None:
+        return tuple(present)
+    mask = numpy.array(present, dtype=bool)
+    mask.flags.writeable = False
+    return mask
+
+
+def _where(keys, column, present, test):
+    """Return the keys whose values in ``column`` pass ``test``
+
+    If ``column`` is a NumPy array, ``test`` gets all of it, and should
+    return an array of booleans. Should that not work, ``test`` is called
+    on the values one at a time. Values that aren't ``present`` never
+    pass.
+
+    """
+    if numpy is not None:
+        try:
+            with numpy.errstate(invalid='ignore'):
+                mask = numpy.asarray(test(column), dtype=bool)
+        except (TypeError, ValueError):
+            mask = None
+        if mask is not None and mask.shape == column.shape:
+            return [keys[i] for i in numpy.flatnonzero(mask & present)]
+    return [
+        key for (key, v, p) in zip(keys, column, present)
+        if p and test(v)
+    ]
+
+
+def _values(column):
+    """Return the values in ``column`` as plain Python objects"""
+    if hasattr(column, 'tolist'):
+        return column.tolist()
+    return column
+
+
+def _index_array(values):
+    if numpy is None:
+        return tuple(values)
+    return numpy.array(values, dtype=numpy.int64)
+
+
+class GraphSnapshot(object):
+    """An immutable copy of a graph's nodes, edges, and some of their stats
+
+    Made by :meth:`allegedb.graph.Graph.snapshot`. It describes the graph
+    at the time it was made. Use :meth:`is_current` to find out whether
+    that's still how the graph looks.
+
+    """
+    def __init__(self, graph, node_stats=(), edge_stats=()):
+        if graph.is_multigraph():
+            raise TypeError("Can't snapshot multigraphs")
+        db = self.db = graph.db
+        name = self.name = graph.name
+        self.directed = graph.is_directed()
+        self.node_stat_names = node_stats = tuple(node_stats)
+        self.edge_stat_names = edge_stats = tuple(edge_stats)
+        self.time = branch, turn, tick = db._btt()
+        self._stale = False
+        parent, turn_start, tick_start, turn_end, tick_end \
+            = db._branches[branch]
+        caches = (
+            db._nodes_cache, db._edges_cache,
+            db._node_val_cache, db._edge_val_cache
+        )
+        # History that exists past the present, or that's planned, changes
+        # the graph without sending any signal. If there's none, I'm good
+        # for as long as my caches don't tell me otherwise.
+        self._at_end = (turn, tick) >= (turn_end, tick_end) and not any(
+            planned[0] == name
+            for cache in caches if branch in cache.planned
+            for planned in cache.planned[branch]
+        )
+        for cache in caches:
+            cache.connect(self._invalidate)
+
+        nodes = self.nodes = tuple(
+            db._nodes_cache.iter_entities(name, branch, turn, tick))
+        index = self.index = {node: i for (i, node) in enumerate(nodes)}
+        edges_cache = db._edges_cache
+        # each successor comes with the (orig, dest) its edge is stored under,
+        # which is the same both ways in undirected graphs
+        succs = [[] for _ in nodes]
+        for i, orig in enumerate(nodes):
+            for dest in edges_cache.iter_successors(
+                    name, orig, branch, turn, tick):
+                if dest not in index:
+                    continue
+                j = index[dest]
+                succs[i].append((j, (orig, dest)))
+                if not self.directed and j != i:
+                    succs[j].append((i, (orig, dest)))
+        indptr = [0]
+        indices = []
+        edges = []
+        for dests in succs:
+            for j, edge_key in dests:
+                indices.append(j)
+                edges.append(edge_key)
+            indptr.append(len(indices))
+        self.indptr = _index_array(indptr)
+        self.indices = _index_array(indices)
+        self.edges = tuple(edges)
+        """The ``(orig, dest)`` of each edge, in the same order as
+        ``indices``. In undirected graphs, each edge appears twice, both
+        times the way it's stored.
+
+        """
+
+        node_retrieve = db._node_val_cache.retrieve
+        self.node_stats = stats = {}
+        self.node_present = masks = {}
+        """Which nodes have each of the ``node_stats``, in a column of
+        booleans
+
+        """
+        for stat in node_stats:
+            values = []
+            present = []
+            for node in nodes:
+                try:
+                    values.append(
+                        node_retrieve(name, node, stat, branch, turn, tick))
+                    present.append(True)
+                except KeyError:
+                    values.append(None)
+                    present.append(False)
+            stats[stat] = _column(values, present)
+            masks[stat] = _mask(present)
+        edge_retrieve = db._edge_val_cache.retrieve
+        self.edge_stats = stats = {}
+        self.edge_present = masks = {}
+        """Which edges have each of the ``edge_stats``, like
+        ``node_present``
+
+        """
+        for stat in edge_stats:
+            values = []
+            present = []
+            for orig, dest in edges:
+                try:
+                    values.append(edge_retrieve(
+                        name, orig, dest, 0, stat, branch, turn, tick))
+                    present.append(True)
+                except KeyError:
+                    values.append(None)
+                    present.append(False)
+            stats[stat] = _column(values, present)
+            masks[stat] = _mask(present)
+        self._view = None
+
+    def __repr__(self):
+        return "<GraphSnapshot of {} at {}>".format(self.name, self.time)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __contains__(self, node):
+        return node in self.index
+
+    def __iter__(self):
+        return iter(self.nodes)
+
+    def _invalidate(self, cache, *, action, entity=None, key=None, **kwargs):
+        if action != 'store':
+            self._stale = True
+            return
+        if not entity or entity[0] != self.name:
+            return
+        db = self.db
+        if cache is db._node_val_cache:
+            if key in self.node_stat_names:
+                self._stale = True
+        elif cache is db._edge_val_cache:
+            if key in self.edge_stat_names:
+                self._stale = True
+        else:
+            self._stale = True
+
+    def is_current(self):
+        """Return whether the graph still looks like it did when I was made"""
+        if self._stale:
+            return False
+        branch, turn, tick = self.db._btt()
+        then_branch, then_turn, then_tick = self.time
+        if branch != then_branch:
+            return False
+        if (turn, tick) == (then_turn, then_tick):
+            return True
+        return self._at_end and (turn, tick) > (then_turn, then_tick)
+
+    def nodes_where(self, stat, test):
+        """Return a list of the nodes whose ``stat`` passes ``test``
+
+        ``stat`` has to be one of the ``node_stats`` I was made with.
+        Nodes that lack the stat are left out.
+
+        """
+        return _where(
+            self.nodes, self.node_stats[stat], self.node_present[stat], test)
+
+    def edges_where(self, stat, test):
+        """Return a list of ``(orig, dest)`` for edges whose ``stat`` passes
+        ``test``
+
+        ``stat`` has to be one of the ``edge_stats`` I was made with.
+        Edges that lack the stat are left out. In undirected graphs,
+        each edge is listed once.
+
+        """
+        ret = _where(
+            self.edges, self.edge_stats[stat], self.edge_present[stat], test)
+        if self.directed:
+            return ret
+        return list(OrderedDict.fromkeys(ret))
+
+    def successors(self, node):
+        """Iterate over the nodes that ``node`` has edges leading to"""
+        i = self.index[node]
+        nodes = self.nodes
+        for j in self.indices[self.indptr[i]:self.indptr[i+1]]:
+            yield nodes[j]
+
+    def edge_stat(self, orig, dest, stat):
+        """Return the value of a stat of the edge from ``orig`` to ``dest``
+
+        It has to be one of the ``edge_stats`` I was made with.
+        Return ``None`` if the edge lacks the stat.
+
+        """
+        i = self.index[orig]
+        j = self.index[dest]
+        start, end = self.indptr[i], self.indptr[i+1]
+        for k in range(start, end):
+            if self.indices[k] == j:
+                break
+        else:
+            raise KeyError("No edge {}->{}".format(orig, dest))
+        if not self.edge_present[stat][k]:
+            return None
+        v = self.edge_stats[stat][k]
+        if numpy is not None and isinstance(v, numpy.generic):
+            return v.item()
+        return v
+
+    @property
+    def view(self):
+        """A frozen NetworkX graph with the same nodes, edges, and stats
+
+        Pass this to NetworkX algorithms. It's a whole new graph, not a
+        view of my arrays, so the first time you ask for it, it takes
+        time and memory in proportion to my nodes and edges. After
+        that, you get the same one.
+
+        """
+        if self._view is not None:
+            return self._view
+        g = networkx.DiGraph() if self.directed else networkx.Graph()
+        g.graph['name'] = self.name
+        nodes = self.nodes
+        node_stats = [
+            (stat, _values(col), self.node_present[stat])
+            for (stat, col) in self.node_stats.items()
+        ]
+        for i, node in enumerate(nodes):
+            attrs = {}
+            for stat, col, present in node_stats:
+                if present[i]:
+                    attrs[stat] = col[i]
+            g.add_node(node, **attrs)
+        indptr = self.indptr
+        indices = self.indices
+        edge_stats = [
+            (stat, _values(col), self.edge_present[stat])
+            for (stat, col) in self.edge_stats.items()
+        ]
+        for i, orig in enumerate(nodes):
+            for k in range(indptr[i], indptr[i+1]):
+                attrs = {}
+                for stat, col, present in edge_stats:
+                    if present[k]:
+                        attrs[stat] = col[k]
+                g.add_edge(orig, nodes[indices[k]], **attrs)
+        self._view = networkx.freeze(g)
+        return self._view
@@ -164,3 +164,45 @@ def test_save_load_plan():
         orm.turn = 0  # end of turn
         assert 2 not in g2.edge[1]
     os.remove('test_save_load_plan.db')
+
+
+def test_branch_mid_plan(orm):
+    g = orm.new_graph('graph')
+    g.add_node(0)
+    for i in range(1, 4):
+        orm.turn = 0
+        with orm.plan():
+            for turn in range(1, 5):
+                orm.turn = turn
+                g.add_node((i, turn))
+                g.graph[i] = turn
+    orm.turn = 2
+    orm.branch = 'b'
+    orm.turn = 4
+    for i in range(1, 4):
+        for turn in range(1, 5):
+            assert (i, turn) in g.node
+    orm.turn = 2
+    g.graph[1] = 'contradiction'  # only for the copy of the first plan
+    orm.turn = 4
+    assert (1, 3) not in g.node
+    assert (1, 4) not in g.node
+    assert (2, 4) in g.node
+    assert (3, 4) in g.node
+    orm.branch = 'trunk'
+    assert (1, 4) in g.node
+
+
+def test_planned_index(orm):
+    g = orm.new_graph('graph')
+    planned = orm._graph_val_cache.planned
+    g.graph['unplanned'] = 0
+    with orm.plan():
+        orm.turn = 1
+        g.graph['planned'] = 1
+    assert ('graph', 'planned') in planned['trunk']
+    assert ('graph', 'unplanned') not in planned['trunk']
+    orm.turn = 0
+    g.graph['planned'] = 0
+    assert ('graph', 'planned') not in planned['trunk']
+    assert 1 not in orm._graph_val_cache.branches['graph', 'planned']['trunk']
@@ -0,0 +1,53 @@
+import os
+import pytest
+from allegedb import ORM
+from allegedb.codec import get_codec
+
+
+values = [
+    None, True, False, 0, 1, -1, 127, -128, 128, 40000, -40000, 1 << 40,
+    0.5, -2.25, '', 'short', 'ünïcödé', b'\x00bytes', (1, 'two'), [1, 2.0],
+    {'a': (1,)}, {4}
+]
+
+
+@pytest.mark.parametrize('codec,extra', [
+    ('repr', [1 << 70, -(1 << 70)]),
+    ('msgpack', [frozenset({3})]),
+    ('tagged', [1 << 70, -(1 << 70)])
+])
+def test_round_trip(codec, extra):
+    codec = get_codec(codec)
+    for value in values + extra:
+        unpacked = codec.unpack(codec.pack(value))
+        assert unpacked == value
+        assert type(unpacked) is type(value)
+
+
+def test_tagged_is_compact():
+    pack = get_codec('tagged').pack
+    assert len(pack(5)) == 2
+    assert len(pack(1000)) == 3
+    assert len(pack(1.5)) == 9
+    assert len(pack('abc')) == 4
+
+
+@pytest.mark.parametrize('codec', ['msgpack', 'tagged'])
+def test_load(codec):
+    name = 'allegedb_codec_test.db'
+    if os.path.exists(name):
+        os.remove(name)
+    with ORM('sqlite:///' + name, codec=codec) as orm:
+        g = orm.new_digraph('g')
+        g.add_edge(0, 'one')
+        g.nodes[0]['float'] = 0.1
+        g.nodes['one']['tuple'] = (1, 'two')
+        g.edges[0, 'one']['big'] = 1 << 40
+        g.graph['bytes'] = b'\xff'
+    with ORM('sqlite:///' + name, codec=codec) as orm:
+        g = orm.graph['g']
+        assert g.nodes[0]['float'] == 0.1
+        assert g.nodes['one']['tuple'] == (1, 'two')
+        assert g.edges[0, 'one']['big'] == 1 << 40
+        assert g.graph['bytes'] == b'\xff'
+    os.remove(name)
@@ -1,6 +1,7 @@
 import pytest
 import os
-from allegedb import ORM
+import sqlite3
+from allegedb import ORM, ReadOnlyError
 import networkx as nx
 
 
@@ -49,4 +50,182 @@ def test_basic_load(db):
         assert set(graph.nodes.keys()) == set(alleged.nodes.keys()), "{}'s nodes are not the same after load".format(
             graph.name
         )
-        assert set(graph.edges) == set(alleged.edges), "{}'s edges are not the same after load".format(graph.name)
\ No newline at end of file
+        assert set(graph.edges) == set(alleged.edges), "{}'s edges are not the same after load".format(graph.name)
+
+
+@pytest.mark.parametrize('alchemy', [False, True])
+def test_storage_profile(alchemy):
+    name = 'allegedb_profile_test.db'
+    if os.path.exists(name):
+        os.remove(name)
+    with ORM(
+            'sqlite:///' + name, alchemy=alchemy, storage_profile='fast'
+    ) as orm:
+        orm.new_digraph('g').add_node(0)
+        if alchemy:
+            execute = orm.query.alchemist.conn.execute
+        else:
+            execute = orm.query.connection.execute
+        assert execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        indices = {name for (name,) in execute(
+            "SELECT name FROM sqlite_master WHERE type='index'"
+        ).fetchall()}
+        assert {'node_val_time', 'edge_val_time', 'nodes_time'} <= indices
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(name + suffix):
+            os.remove(name + suffix)
+
+
+@pytest.mark.parametrize('alchemy', [False, True])
+def test_indices_for_old_database(alchemy):
+    name = 'allegedb_indices_test.db'
+    if os.path.exists(name):
+        os.remove(name)
+    with ORM('sqlite:///' + name, alchemy=False) as orm:
+        orm.new_digraph('g').add_node(0)
+    conn = sqlite3.connect(name)
+    conn.execute('DROP INDEX node_val_time')
+    conn.close()
+    with ORM('sqlite:///' + name, alchemy=alchemy) as orm:
+        assert 'g' in orm.graph
+    conn = sqlite3.connect(name)
+    indices = {name for (name,) in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='index'"
+    ).fetchall()}
+    conn.close()
+    assert 'node_val_time' in indices
+    os.remove(name)
+
+
+@pytest.mark.parametrize('alchemy', [False, True])
+def test_overwrite_history(alchemy):
+    name = 'allegedb_overwrite_test.db'
+    if os.path.exists(name):
+        os.remove(name)
+    with ORM('sqlite:///' + name, alchemy=alchemy) as orm:
+        q = orm.query
+        q.new_graph('g', 'DiGraph')
+        for turn in range(5):
+            q.exist_node('g', turn, 'trunk', turn, 0, True)
+            q.node_val_set('g', 0, 'x', 'trunk', turn, 1, turn)
+            q.graph_val_set('g', 'y', 'trunk', turn, 2, turn)
+        q.commit()
+        # nothing in the database is later than these
+        q.node_val_set('g', 0, 'x', 'trunk', 5, 0, 5)
+        q.node_val_set('g', 0, 'x', 'trunk', 5, 1, 6)
+        q.commit()
+        # these overwrite everything after turn 2, tick 3
+        q.exist_node('g', 3, 'trunk', 2, 3, False)
+        q.node_val_set('g', 0, 'x', 'trunk', 2, 4, 'new')
+        q.commit()
+        assert [
+            (turn, tick, value) for (graph, node, key, branch, turn, tick, value)
+            in q.node_val_dump()
+        ] == [(0, 1, 0), (1, 1, 1), (2, 1, 2), (2, 4, 'new')]
+        assert [
+            (node, turn, tick, extant) for (graph, node, branch, turn, tick, extant)
+            in q.nodes_dump()
+        ] == [(0, 0, 0, True), (1, 1, 0, True), (2, 2, 0, True),
+              (3, 2, 3, False), (4, 4, 0, True)]
+        assert len(list(q.graph_val_dump())) == 5
+    os.remove(name)
+
+
+@pytest.mark.parametrize('alchemy', [False, True])
+def test_no_cleanup_going_forward(alchemy):
+    name = 'allegedb_forward_test.db'
+    if os.path.exists(name):
+        os.remove(name)
+    with ORM('sqlite:///' + name, alchemy=alchemy) as orm:
+        g = orm.new_digraph('g')
+        g.add_node(0)
+        orm.commit()
+        queries = []
+        sql = orm.query.sql
+
+        def spy(stringname, *args, **kwargs):
+            queries.append(stringname)
+            return sql(stringname, *args, **kwargs)
+        orm.query.sql = spy
+        for turn in range(1, 6):
+            orm.turn = turn
+            # written before the new node, but flushed after it
+            g.nodes[0]['x'] = turn
+            g.add_node(turn)
+            orm.commit()
+        assert not [q for q in queries if q.endswith('_after_cleanup')]
+    os.remove(name)
+
+@pytest.mark.parametrize('alchemy', [False, True])
+def test_intern_keys(alchemy):
+    name = 'allegedb_intern_test.db'
+    if os.path.exists(name):
+        os.remove(name)
+    with ORM('sqlite:///' + name, alchemy=alchemy, intern_keys=True) as orm:
+        g = orm.new_digraph('g')
+        g.add_edge('a', 'b', weight=1)
+        g.nodes['a']['name'] = 'a'
+        g.graph['nodes'] = ('a', 'b')
+        orm.turn = 1
+        g.nodes['a']['name'] = 'A'
+        orm.query.flush()
+        assert {
+            key for (graph, node, key, branch, turn, tick, value)
+            in orm.query.sql('node_val_dump')
+        } == {orm.query.pack_key('name')}
+        # looking up a graph that isn't there doesn't intern its name
+        assert not orm.query.have_graph('nowhere')
+        assert orm.query.graph_type('nowhere') is None
+        assert orm.query.find_key('nowhere') is None
+    with ORM('sqlite:///' + name, alchemy=alchemy) as orm:
+        g = orm.graph['g']
+        assert g.graph['nodes'] == ('a', 'b')
+        assert g.edges['a', 'b']['weight'] == 1
+        assert g.nodes['a']['name'] == 'A'
+        orm.turn = 0
+        assert g.nodes['a']['name'] == 'a'
+        # the same name is the same object, wherever it's used
+        assert g.nodes['a']['name'] is next(n for n in g.adj if n == 'a')
+    with pytest.raises(ValueError):
+        ORM('sqlite:///' + name, alchemy=alchemy, intern_keys=False)
+    os.remove(name)
+    with ORM('sqlite:///' + name, alchemy=alchemy) as orm:
+        orm.new_graph('g')
+    with pytest.raises(ValueError):
+        ORM('sqlite:///' + name, alchemy=alchemy, intern_keys=True)
+    os.remove(name)
+
+
+@pytest.mark.parametrize('alchemy', [False, True])
+def test_readonly(alchemy):
+    name = 'allegedb_readonly_test.db'
+    if os.path.exists(name):
+        os.remove(name)
+    with ORM('sqlite:///' + name, alchemy=alchemy) as orm:
+        g = orm.new_digraph('g')
+        g.add_edge('a', 'b', weight=1)
+        orm.turn = 1
+        g.edges['a', 'b']['weight'] = 2
+        g.add_node('c')
+    orm = ORM('sqlite:///' + name, alchemy=alchemy, readonly=True)
+    assert '_edge_val_cache' in orm._lazy_caches
+    g = orm.graph['g']
+    assert orm.turn == 1
+    assert g.edges['a', 'b']['weight'] == 2
+    assert '_edge_val_cache' not in orm._lazy_caches
+    assert '_node_val_cache' in orm._lazy_caches
+    assert 'c' in g.nodes
+    orm.turn = 0
+    assert g.edges['a', 'b']['weight'] == 1
+    assert 'c' not in g.nodes
+    orm.turn = 1
+    with pytest.raises(ReadOnlyError):
+        g.edges['a', 'b']['weight'] = 3
+    with pytest.raises(ReadOnlyError):
+        orm.new_graph('h')
+    with pytest.raises(ReadOnlyError):
+        orm.branch = 'other'
+    orm.close()
+    with ORM('sqlite:///' + name, alchemy=alchemy) as orm:
+        assert orm.graph['g'].edges['a', 'b']['weight'] == 2
+    os.remove(name)
@@ -0,0 +1,88 @@
+import pytest
+import networkx as nx
+import allegedb
+import allegedb.snapshot
+
+
+@pytest.fixture(scope='function')
+def orm():
+    with allegedb.ORM("sqlite:///:memory:") as it:
+        yield it
+
+
+def test_snapshot_digraph(orm):
+    g = orm.new_digraph('g', nx.grid_2d_graph(3, 3).to_directed())
+    for orig, dest in g.edges:
+        g.adj[orig][dest]['weight'] = orig[0] + dest[0]
+    g.node[0, 0]['height'] = 3
+    snap = g.snapshot(node_stats=['height'], edge_stats=['weight'])
+    assert len(snap) == 9
+    assert set(snap.successors((1, 1))) == {(0, 1), (2, 1), (1, 0), (1, 2)}
+    assert snap.edge_stat((1, 1), (2, 1), 'weight') == 3
+    assert snap.node_stats['height'][snap.index[0, 0]] == 3
+    view = snap.view
+    assert view.nodes[0, 0] == {'height': 3}
+    assert 'height' not in view.nodes[1, 1]
+    assert view.adj[(1, 1)][(2, 1)]['weight'] == 3
+    assert nx.shortest_path(view, (0, 0), (2, 2), weight='weight') \
+        == nx.shortest_path(g, (0, 0), (2, 2), weight='weight')
+    with pytest.raises(nx.NetworkXError):
+        view.add_node('nope')
+
+
+def test_snapshot_undirected(orm):
+    g = orm.new_graph('g')
+    g.add_edge(0, 1, weight=2)
+    g.add_edge(1, 2, weight=3)
+    snap = g.snapshot(edge_stats=['weight'])
+    assert set(snap.successors(1)) == {0, 2}
+    assert snap.edge_stat(2, 1, 'weight') == 3
+    assert sorted(snap.view.edges(data='weight')) \
+        == [(0, 1, 2), (1, 2, 3)]
+
+
+def test_snapshot_invalidation(orm):
+    g = orm.new_digraph('g')
+    g.add_edge(0, 1, weight=1)
+    snap = g.snapshot(edge_stats=['weight'])
+    assert g.snapshot(edge_stats=['weight']) is snap
+    g.node[0]['unrelated'] = True
+    g.adj[0][1]['unrelated'] = True
+    orm.new_digraph('other').add_node(0)
+    orm.turn = 1
+    assert snap.is_current()
+    assert g.snapshot(edge_stats=['weight']) is snap
+    g.adj[0][1]['weight'] = 2
+    assert not snap.is_current()
+    snap2 = g.snapshot(edge_stats=['weight'])
+    assert snap2.edge_stat(0, 1, 'weight') == 2
+    g.add_node(2)
+    assert not snap2.is_current()
+    snap3 = g.snapshot(edge_stats=['weight'])
+    assert 2 in snap3
+    orm.turn = 0
+    assert not snap3.is_current()
+    assert 2 not in g.snapshot()
+
+
+def test_snapshot_columns(orm):
+    g = orm.new_digraph('g')
+    g.add_nodes_from(range(4))
+    g.node[0]['n'] = 2 ** 60 + 1
+    g.node[1]['n'] = 3
+    g.node[0]['x'] = float('nan')
+    g.node[1]['x'] = 0.5
+    snap = g.snapshot(node_stats=['n', 'x'])
+    n = snap.node_stats['n']
+    assert int(n[snap.index[0]]) == 2 ** 60 + 1
+    assert list(snap.node_present['n']) == [True, True, False, False]
+    assert list(snap.node_present['x']) == [True, True, False, False]
+    assert snap.nodes_where('n', lambda col: col > 2) == [0, 1]
+    assert snap.nodes_where('x', lambda col: col != 0.5) == [0]
+    view = snap.view
+    assert view.nodes[0]['n'] == 2 ** 60 + 1
+    assert type(view.nodes[1]['n']) is int
+    assert view.nodes[0]['x'] != view.nodes[0]['x']  # NaN, not missing
+    assert 'x' not in view.nodes[2]
+    if allegedb.snapshot.numpy is not None:
+        assert n.dtype.kind == 'i'
@@ -19,6 +19,7 @@ setup(
     version = "0.15.2",
     packages = ["allegedb"],
     install_requires = ['networkx>=1.9<=2.4', 'blinker'],
+    extras_require = {'msgpack': ['msgpack']},
     author = "Zachary Spector",
     author_email = "zacharyspector@gmail.com",
     description = "A state container serving database-backed versions of the standard networkx graph classes.",